@@ -0,0 +1,184 @@
+"""Sequential extraction of ZIP archives while they are being downloaded.
+
+A ZIP file is usually read via its central directory at the end of the archive.
+Since every member is also preceded by a local file header, an archive can be
+extracted member by member from a stream of bytes instead, without storing the
+archive itself. This supports stored and deflated members, data descriptors and
+ZIP64 sizes, which covers the archives created by the PANGAEA download service.
+"""
+from pathlib import Path, PurePosixPath
+import struct
+import zlib
+
+LOCAL_FILE_HEADER = b"PK\x03\x04"
+DATA_DESCRIPTOR = b"PK\x07\x08"
+# signatures of the records following the last member
+CENTRAL_DIRECTORY_RECORDS = (b"PK\x01\x02", b"PK\x05\x05", b"PK\x05\x06", b"PK\x06\x06", b"PK\x06\x07")
+
+STORED = 0
+DEFLATED = 8
+
+
+class ZipStreamError(Exception):
+    """Raised if an archive cannot be extracted from a stream."""
+
+
+class _ByteStream:
+    """Buffered reader over an iterable of byte chunks."""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        # bytearray appends and deletes at the front in amortized constant time, unlike bytes concatenation
+        self._buffer = bytearray()
+
+    def _fill(self):
+        for chunk in self._chunks:
+            if chunk:
+                self._buffer += chunk
+                return True
+        return False
+
+    def read_some(self, size):
+        """Return up to size bytes, an empty bytes object at the end of the stream."""
+        if not self._buffer and not self._fill():
+            return b""
+        return self._take(size)
+
+    def read(self, size):
+        """Return exactly size bytes."""
+        while len(self._buffer) < size:
+            if not self._fill():
+                raise ZipStreamError("Unexpected end of ZIP stream")
+        return self._take(size)
+
+    def _take(self, size):
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
+
+    def unread(self, data):
+        self._buffer[:0] = data
+
+    def at_end(self):
+        return not self._buffer and not self._fill()
+
+
+def _member_path(target_dir, name):
+    """Return the extraction path of a member, discarding absolute paths and '..' components."""
+    parts = [part for part in PurePosixPath(name.replace("\\", "/")).parts if part not in ("/", "", ".", "..")]
+    if not parts:
+        return None
+    return Path(target_dir, *parts)
+
+
+def _zip64_sizes(extra, usize, csize):
+    """Read the 64 bit sizes from the ZIP64 extra field of a local file header."""
+    offset = 0
+    while offset + 4 <= len(extra):
+        header_id, data_size = struct.unpack_from("<HH", extra, offset)
+        offset += 4
+        if header_id == 0x0001:
+            data = extra[offset:offset + data_size]
+            position = 0
+            if usize == 0xFFFFFFFF:
+                usize = struct.unpack_from("<Q", data, position)[0]
+                position += 8
+            if csize == 0xFFFFFFFF:
+                csize = struct.unpack_from("<Q", data, position)[0]
+            return usize, csize, True
+        offset += data_size
+    return usize, csize, False
+
+
+def extract_stream(chunks, target_dir, chunk_size=1024 * 1024):
+    """Extract a ZIP archive given as an iterable of byte chunks into target_dir.
+
+    Members are written to disk as soon as their data arrives. Each file is written to a
+    ``.part`` file first, which is renamed after its CRC has been verified.
+
+    Parameters
+    ----------
+    chunks : iterable of bytes
+        The content of the archive, e.g. requests.Response.iter_content()
+    target_dir : Path
+        The directory the members are extracted to
+    chunk_size : int
+        Maximum number of bytes decompressed at once
+
+    Returns
+    -------
+        List of the paths of the extracted files
+    """
+    stream = _ByteStream(chunks)
+    extracted = []
+    while not stream.at_end():
+        signature = stream.read(4)
+        if signature in CENTRAL_DIRECTORY_RECORDS:
+            break
+        if signature != LOCAL_FILE_HEADER:
+            raise ZipStreamError(f"Invalid local file header signature {signature!r}")
+        (_, flags, method, _, _, crc, csize, usize,
+         name_len, extra_len) = struct.unpack("<HHHHHIIIHH", stream.read(26))
+        raw_name = stream.read(name_len)
+        name = raw_name.decode("utf-8" if flags & 0x800 else "cp437")
+        usize, csize, is_zip64 = _zip64_sizes(stream.read(extra_len), usize, csize)
+        if flags & 0x1:
+            raise ZipStreamError(f"Encrypted member {name} cannot be extracted")
+        has_descriptor = bool(flags & 0x8)
+        is_dir = name.endswith("/")
+        if method == STORED and has_descriptor and not is_dir:
+            raise ZipStreamError(f"Stored member {name} without sizes cannot be extracted from a stream")
+        if method not in (STORED, DEFLATED):
+            raise ZipStreamError(f"Unsupported compression method {method} of member {name}")
+
+        path = _member_path(target_dir, name)
+        if path is not None and is_dir:
+            path.mkdir(parents=True, exist_ok=True)
+        partpath = None
+        f = None
+        if path is not None and not is_dir:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            partpath = path.with_name(path.name + ".part")
+            f = open(partpath, "wb")
+        try:
+            checksum = 0
+            if method == STORED:
+                remaining = 0 if is_dir and has_descriptor else csize
+                while remaining:
+                    data = stream.read_some(min(remaining, chunk_size))
+                    if not data:
+                        raise ZipStreamError("Unexpected end of ZIP stream")
+                    remaining -= len(data)
+                    checksum = zlib.crc32(data, checksum)
+                    if f:
+                        f.write(data)
+            else:
+                decompressor = zlib.decompressobj(-15)
+                while not decompressor.eof:
+                    # inflate at most chunk_size bytes at once, highly compressed input is continued from its tail
+                    data = decompressor.unconsumed_tail or stream.read_some(chunk_size)
+                    if not data:
+                        raise ZipStreamError("Unexpected end of ZIP stream")
+                    data = decompressor.decompress(data, chunk_size)
+                    checksum = zlib.crc32(data, checksum)
+                    if f:
+                        f.write(data)
+                stream.unread(decompressor.unused_data)
+        finally:
+            if f:
+                f.close()
+
+        if has_descriptor:
+            descriptor_crc = stream.read(4)
+            if descriptor_crc == DATA_DESCRIPTOR:
+                descriptor_crc = stream.read(4)
+            crc = struct.unpack("<I", descriptor_crc)[0]
+            stream.read(16 if is_zip64 else 8)
+        if checksum != crc:
+            if partpath:
+                partpath.unlink(missing_ok=True)
+            raise ZipStreamError(f"CRC check failed for member {name}")
+        if partpath:
+            partpath.replace(path)
+            extracted.append(path)
+    return extracted
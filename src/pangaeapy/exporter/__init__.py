@@ -1,13 +1,22 @@
+from pangaeapy.exporter.pan_batch_exporter import PanBatchExporter, PanExportResult
 from pangaeapy.exporter.pan_dwca_exporter import PanDarwinCoreAchiveExporter
 from pangaeapy.exporter.pan_exporter import PanExporter
 from pangaeapy.exporter.pan_frictionless_exporter import PanFrictionlessExporter
 from pangaeapy.exporter.pan_netcdf_exporter import PanNetCDFExporter
 from pangaeapy.exporter.pan_panimport_exporter import PanPanImportExporter
+from pangaeapy.exporter.pan_parquet_exporter import PanParquetExporter
+from pangaeapy.exporter.pan_xarray_exporter import PanXarrayExporter
+from pangaeapy.exporter.pan_zarr_exporter import PanZarrExporter
 
 __all__ = [
+    "PanBatchExporter",
     "PanDarwinCoreAchiveExporter",
+    "PanExportResult",
     "PanExporter",
     "PanFrictionlessExporter",
     "PanNetCDFExporter",
     "PanPanImportExporter",
+    "PanParquetExporter",
+    "PanXarrayExporter",
+    "PanZarrExporter",
 ]
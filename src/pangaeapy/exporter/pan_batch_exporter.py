@@ -0,0 +1,205 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import logging
+import os
+from os.path import expanduser
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def export_netcdf(dataset, filelocation):
+    return dataset.to_netcdf(filelocation=filelocation, type='sdn', ondisk=True)
+
+
+def export_netcdf_ragged(dataset, filelocation):
+    return dataset.to_netcdf(filelocation=filelocation, type='ragged', ondisk=True)
+
+
+def export_dwca(dataset, filelocation):
+    return dataset.to_dwca(ondisk=True, filelocation=filelocation)
+
+
+def export_frictionless(dataset, filelocation):
+    return dataset.to_frictionless(filelocation=filelocation, ondisk=True)
+
+
+def export_parquet(dataset, filelocation):
+    return dataset.to_parquet(filelocation=filelocation)
+
+
+def export_zarr(dataset, filelocation):
+    return dataset.to_zarr(filelocation=filelocation)
+
+
+# export functions by format name, each writes one file (or store) into filelocation and returns its path
+EXPORTS = {
+    'netcdf': export_netcdf,
+    'netcdf_ragged': export_netcdf_ragged,
+    'dwca': export_dwca,
+    'frictionless': export_frictionless,
+    'parquet': export_parquet,
+    'zarr': export_zarr,
+}
+
+
+class PanExportResult:
+    """The outcome of exporting one dataset into one format.
+
+    Attributes
+    ----------
+    dataset : int or str
+        The dataset id
+    format : str
+        The export format, a key of EXPORTS
+    path : str
+        The created file or None if the export failed
+    seconds : float
+        Duration of the export
+    load_seconds : float
+        Duration of loading (or unpickling) the dataset, shared by all formats of the dataset
+    errors : list
+        The error messages of the export
+    logging : list
+        All log messages of the export
+    """
+    def __init__(self, dataset, format, path=None, seconds=0.0, load_seconds=0.0, errors=None, logging=None):
+        self.dataset = dataset
+        self.format = format
+        self.path = path
+        self.seconds = seconds
+        self.load_seconds = load_seconds
+        self.errors = errors or []
+        self.logging = logging or []
+
+    @property
+    def ok(self):
+        return self.path is not None and not self.errors
+
+    def as_dict(self):
+        return {'dataset': self.dataset, 'format': self.format, 'path': self.path, 'ok': self.ok,
+                'seconds': self.seconds, 'load_seconds': self.load_seconds, 'errors': self.errors}
+
+    def __repr__(self):
+        return f"PanExportResult({self.dataset!r}, {self.format!r}, ok={self.ok}, seconds={self.seconds:.3f})"
+
+
+def export_dataset(item, formats, filelocation, dataset_kwargs=None):
+    """Load a dataset and export it into several formats, each export working on its own view of the dataset.
+
+    Parameters
+    ----------
+    item : PanDataSet or int or str
+        A loaded dataset or the id / DOI of a dataset to load
+    formats : list
+        Keys of EXPORTS
+    filelocation : str
+        Directory of the exported files
+    dataset_kwargs : dict
+        Arguments of PanDataSet used to load the dataset
+
+    Returns
+    -------
+        List of PanExportResult, one per format
+    """
+    from pangaeapy.pandataset import PanDataSet
+    started = time.perf_counter()
+    try:
+        dataset = item if isinstance(item, PanDataSet) else PanDataSet(item, **(dataset_kwargs or {}))
+    except Exception as e:
+        load_seconds = time.perf_counter() - started
+        return [PanExportResult(item, fmt, load_seconds=load_seconds, errors=['Loading dataset failed: ' + str(e)])
+                for fmt in formats]
+    load_seconds = time.perf_counter() - started
+    # report the requested id or DOI if it could not be resolved
+    key = dataset.id if dataset.id is not None else item
+    results = []
+    for fmt in formats:
+        view = dataset.export_view()
+        started = time.perf_counter()
+        try:
+            ret = EXPORTS[fmt](view, filelocation)
+        except Exception as e:
+            ret = None
+            view.logging.append({'ERROR': 'Export failed: ' + str(e)})
+        path = ret if isinstance(ret, str) and os.path.exists(ret) else None
+        errors = [msg for entry in view.logging for level, msg in entry.items() if level == 'ERROR']
+        if path is None and not errors:
+            errors = ['Export did not create a file']
+        result = PanExportResult(key, fmt, path, time.perf_counter() - started, load_seconds, errors,
+                                 view.logging)
+        logger.debug("Exported %s as %s in %.3f s: %s", key, fmt, result.seconds, path)
+        results.append(result)
+    return results
+
+
+class PanBatchExporter:
+    """Exports many datasets into several formats in parallel processes.
+
+    Each dataset is loaded (or unpickled) once in a worker process and exported into all formats, every export
+    working on its own view of the dataset (see PanDataSet.export_view), so that the exports do not interfere.
+
+    Parameters
+    ----------
+    formats : list
+        Keys of EXPORTS
+    filelocation : str
+        Directory of the exported files, by default the directory pangaeapy_export in the home directory
+    max_workers : int
+        Number of worker processes, by default the number of CPUs. With 0, the datasets are exported in this process.
+    dataset_kwargs : dict
+        Arguments of PanDataSet used to load datasets given by id, e.g. enable_cache=True
+    """
+    def __init__(self, formats=('netcdf',), filelocation=None, max_workers=None, dataset_kwargs=None):
+        unknown = [fmt for fmt in formats if fmt not in EXPORTS]
+        if unknown:
+            raise ValueError(f"Unknown export format(s) {unknown}, choose from {list(EXPORTS)}")
+        self.formats = list(formats)
+        if filelocation is None:
+            filelocation = os.path.join(expanduser("~"), 'pangaeapy_export')
+        os.makedirs(filelocation, exist_ok=True)
+        self.filelocation = filelocation
+        self.max_workers = max_workers
+        self.dataset_kwargs = dataset_kwargs or {}
+
+    def iter_indexed_results(self, datasets):
+        """Export the datasets and yield (position of the dataset, results of the dataset) as soon as a dataset is finished."""
+        if self.max_workers == 0:
+            for index, item in enumerate(datasets):
+                yield index, export_dataset(item, self.formats, self.filelocation, self.dataset_kwargs)
+            return
+        with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(export_dataset, item, self.formats, self.filelocation, self.dataset_kwargs): (index, item)
+                       for index, item in enumerate(datasets)}
+            for future in as_completed(futures):
+                index, item = futures[future]
+                try:
+                    yield index, future.result()
+                except Exception as e:
+                    # the worker process failed, e.g. the dataset could not be pickled
+                    item = getattr(item, 'id', item)
+                    yield index, [PanExportResult(item, fmt, errors=['Export process failed: ' + str(e)]) for fmt in self.formats]
+
+    def iter_results(self, datasets):
+        """Export the datasets and yield the results of each dataset as soon as it is finished.
+
+        Parameters
+        ----------
+        datasets : iterable
+            Loaded PanDataSet objects or dataset ids / DOIs
+
+        Yields
+        ------
+            List of PanExportResult of one dataset, one per format
+        """
+        for index, results in self.iter_indexed_results(datasets):
+            yield results
+
+    def run(self, datasets):
+        """Export the datasets and return all results.
+
+        Returns
+        -------
+            List of PanExportResult ordered like the datasets and formats
+        """
+        finished = sorted(self.iter_indexed_results(datasets), key=lambda indexed: indexed[0])
+        return [result for index, results in finished for result in results]
@@ -2,12 +2,25 @@ import os
 import re
 import sys
 from collections import OrderedDict
+from functools import lru_cache
 
 import lxml.etree
 import lxml.etree as et
+import numpy as np
+import pandas as pd
 from pangaeapy.exporter.pan_exporter import PanExporter
-from zipfile import ZipFile
-from io import BytesIO
+from pangaeapy.exporter.pan_taxon_classifier import get_taxon_classifier
+from zipfile import ZipFile, ZIP_DEFLATED
+from io import BytesIO, StringIO, TextIOWrapper
+
+EML_XSLT = os.path.join(os.path.dirname(__file__), 'xslt', 'panmd2eml.xslt')
+
+
+@lru_cache(maxsize=None)
+def get_eml_transform():
+    """Return the panmd to EML XSLT transformation, compiled once per process."""
+    return et.XSLT(et.parse(EML_XSLT))
+
 
 class PanDarwinCoreAchiveExporter(PanExporter):
 
@@ -19,12 +32,10 @@ class PanDarwinCoreAchiveExporter(PanExporter):
         self.dwcfields = ['id', 'occurrenceID','modified', 'institutionCode', 'CollectionCode', 'datasetID', 'basisOfRecord', 'catalogNumber',
                      'recordedBy', 'eventDate', 'scientificName', 'phylum','kingdom', 'geodeticDatum', 'decimalLatitude',
                      'decimalLongitude', 'organismQuantity', 'organismQuantityType']
-        #http://vocab.nerc.ac.uk/collection/S11/current/
-        self.taxon_lifestages = ['adult','juvenile','larvae','eggs','nauplii','copepodites']
-        #http://vocab.nerc.ac.uk/collection/S10/current/
-        self.taxon_sex = ['male','female','hermaphrodite']
-        self.taxon_attributes = self.taxon_lifestages + self.taxon_sex
-        self.taxon_attributes.append('total')
+        self.classifier = get_taxon_classifier()
+        self.taxon_lifestages = list(self.classifier.lifestages)
+        self.taxon_sex = list(self.classifier.sex)
+        self.taxon_attributes = self.taxon_lifestages + self.taxon_sex + ['total']
         self.chronostrat_params = [21496, 21497, 21498, 20544, 21197]
         # XYZ zone
         self.biostrat_params = [4491, 15398, 15501, 20543, 21181, 85701, 51065, 57117, 57648, 86368, 89835, 121195,
@@ -33,87 +44,41 @@ class PanDarwinCoreAchiveExporter(PanExporter):
         self.absstrat_params = [2205, 5506, 6167, 6168, 6169, 6170, 70169, 102659, 130805, 145907]
         self.taxonomic_ontologies = [1,2]
         self.taxonomic_coverage = []
-        self.known_synonyms = {'Coccolithophoridae':'Coccolithophorida'}
+        self.known_synonyms = self.classifier.synonyms
+        self.date_format = '%Y-%m-%dT%H:%M:%S'
+        # number of data cells melted at once when writing the archive to disk
+        self.chunk_rows = 1000000
 
     def check_unit(self, unitexpr):
-        unitre = '^([#%])(?:\/((?:[0-9]+\s)?(?:[kdcm]?m{1,2}\*{2}[23]|m?l|k?g)))?(?:\/(d|m|y|a|ka|day|week|month|year){1})?$'
-        dimension = ''
-        istaxonrelated = False
-        if unitexpr:
-            if isinstance(unitexpr, str):
-                try:
-                    umatch = re.search(unitre, unitexpr)
-                    if umatch:
-                        uparts = filter(None, list(umatch.groups()))
-                        if umatch[1] is not None:
-                            istaxonrelated = True
-                            if umatch[1] == '#':
-                                dimension = 'individuals'
-                                if 'pollen' in str(self.pandataset.title).lower():
-                                    dimension = 'number of pollen'
-                            else:
-                                dimension = 'percentage'
-                            if umatch[2] is not None:
-                                if 'l' in umatch[2] or '**3' in umatch[2]:
-                                    dimension += ' per volume'
-                                elif 'g' in umatch[2]:
-                                    dimension += ' per mass'
-                                else:
-                                    dimension += ' per area'
-                            if umatch[3] is not None:
-                                if umatch[2] is not None:
-                                    dimension += ' and time'
-                                else:
-                                    dimension += ' per time'
-                except Exception as e:
-                    self.logging.append({'WARNING': 'Unit check failed: '+str(e)})
-        else:
-            dimension = 'relative abundance'
-            istaxonrelated =True
+        istaxonrelated, dimension = False, ''
+        try:
+            istaxonrelated, dimension = self.classifier.check_unit(unitexpr)
+            if dimension.startswith('individuals') and 'pollen' in str(self.pandataset.title).lower():
+                dimension = 'number of pollen' + dimension[len('individuals'):]
+        except Exception as e:
+            self.logging.append({'WARNING': 'Unit check failed: '+str(e)})
         return istaxonrelated, dimension
 
     def get_taxon_columns(self):
         taxoncolumns = OrderedDict()
-        taxon_attr_regex = r'(.*?)((?:,\s?)'+str('|(?:,\s?)'.join(self.taxon_attributes))+')$'
         for pkey, param in self.pandataset.params.items():
             # full match of taxon name with parameter only
             # TODO: extend to some adjectives e.g. juvenile, adult etc..
             try:
                 for term in param.terms:
-                    semantic_uri = ''
-                    name_parts = re.split(r',\s?',param.name)
-                    taxon_candidate = str(param.name)
-                    semantic_uri = term.get('semantic_uri')
-
-                    taxon_attribute = None
-                    if len(name_parts) == 2:
-                        if name_parts[1] in self.taxon_attributes:
-                            taxon_candidate = name_parts[0]
-                            taxon_attribute = name_parts[1]
-                    if taxon_candidate in self.known_synonyms:
-                        taxon_candidate = self.known_synonyms.get(taxon_candidate)
-
+                    taxon_candidate, test_taxon, taxon_attribute = self.classifier.split_name(param.name)
 
                     # add: #/m3 etc, %/m3 etc
                     is_valid_unit,  dimension = self.check_unit(param.unit)
 
-                    test_taxon = taxon_candidate
-
-                    if taxon_candidate.endswith(' sp.'):
-                        test_taxon  = taxon_candidate.replace(' sp.','').strip()
-                    if taxon_candidate.endswith(' spp.'):
-                        test_taxon  = taxon_candidate.replace(' spp.','').strip()
-
-                    if test_taxon .lower() == str(term.get('name')).lower() and is_valid_unit:
+                    if test_taxon == str(term.get('name')).lower() and is_valid_unit:
                         if term.get('classification'):
                             if 'Biological Classification' in term.get('classification'):
-                                phylum = ''
-                                for classtax in term.get('classification'):
-                                    #phyla list from worms
-                                    if classtax in ['Acanthocephala', 'Acidobacteria', 'Acritarcha', 'Actinobacteria', 'Amoebozoa', 'Annelida', 'Anthocerotophyta', 'Apusomonada', 'Apusozoa', 'Aquificae', 'Arthropoda', 'Aschelminthes', 'Ascomycota', 'Bacillariophyta', 'Bacteria incertae sedis', 'Bacteroidetes', 'Basidiomycota', 'Bigyra', 'Brachiopoda', 'Bryophyta', 'Bryozoa', 'Caldiserica', 'Cephalorhyncha', 'Cercozoa', 'Chaetognatha', 'Charophyta', 'Chlamydiae', 'Chlorarachniophyta', 'Chlorobi', 'Chloroflexi', 'Chlorophyta', 'Chloroplastida', 'Choanoflagellata', 'Choanozoa', 'Chordata', 'Chromeridophyta', 'Chrysomonada', 'Chrysophyta', 'Chytridiomycota', 'Ciliophora', 'Cnidaria', 'Coelenterata', 'Craspediophyta', 'Craspedophyta', 'Crenarchaeota', 'Cryptophyta', 'Ctenophora', 'Cyanobacteria', 'Cycliophora', 'Deferribacteres', 'Deinococcus-Thermus', 'Deuteromycota', 'Dicyemida', 'Dinomastigota', 'Dinophyta', 'Discomitochondria', 'Echinodermata', 'Ectoprocta', 'Elusimicrobia', 'Entoprocta', 'Euglenophyta', 'Euglenozoa', 'Eumycota', 'Euryarchaeota', 'Fibrobacteres', 'Firmicutes', 'Flagellates', 'Foraminifera', 'Fungi Imperfecti', 'Fusobacteria', 'Gastrotricha', 'Gemmatimonadetes', 'Glaucophyta', 'Glomeromycota', 'Gnathifera', 'Gnathostomulida', 'Granuloreticulosa', 'Haplosporidia', 'Haptomonada', 'Haptophyta', 'Heliozoa', 'Hemichordata', 'Hemimastigophora', 'Heterokontophyta', 'Kinorhyncha', 'Korarchaeota', 'Labyrinthulata', 'Lentisphaerae', 'Lophophorata', 'Loricifera', 'Loukozoa', 'Marchantiophyta', 'Mesozoa', 'Metamonada', 'Microspora', 'Microsporidia', 'Mollusca', 'Myxospora', 'Myzozoa', 'Nanoarchaeota', 'Nemata', 'Nematoda', 'Nematomorpha', 'Nemertea', 'Nemertina', 'Nemertini', 'Nitrospirae', 'Ochrophyta', 'Oomycota', 'Orthonectida', 'Pentastomida', 'Percolozoa', 'Phaeophycota', 'Phaeophyta', 'Phoronida', 'Picozoa', 'Placozoa', 'Planctomycetes', 'Plantae incertae sedis', 'Platyhelminthes', 'Pogonophora', 'Porifera', 'Prasinodermatophyta', 'Prasinophyta', 'Priapulida', 'Proteobacteria', 'Prymnesiophyta', 'Pseudofungi', 'Pteridophyta', 'Radiozoa', 'Rhizopoda', 'Rhodelphidia', 'Rhodophycota', 'Rhodophyta', 'Rhynchocoela', 'Rotatoria', 'Rotifera', 'Sarcomastigophora', 'Sipunculida', 'Solenopora', 'Spirochaetes', 'Sulcozoa', 'Synergistetes', 'Tardigrada', 'Tenericutes', 'Thaumarchaeota', 'Thermodesulfobacteria', 'Thermotogae', 'Tracheophyta', 'Verrucomicrobia', 'Xanthophyta', 'Xenacoelomorpha', 'Zygomycota']:
-                                        phylum = classtax
-                                kingdom = list({'Animalia', 'Archaea', 'Bacteria', 'Chromista', 'Fungi', 'Plantae', 'Protozoa',
-                                                'Viruses'} & set(term.get('classification')))[0]
+                                ranks = self.classifier.classify(tuple(term.get('classification')))
+                                if ranks is None:
+                                    self.logging.append({'WARNING': 'Failed to identify taxonomic information in parameter: '+str(pkey)})
+                                    break
+                                kingdom, phylum = ranks
                                 if kingdom not in self.taxonomic_coverage:
                                     self.taxonomic_coverage.append(kingdom)
                                 if phylum not in self.taxonomic_coverage:
@@ -157,11 +122,57 @@ class PanDarwinCoreAchiveExporter(PanExporter):
 
         return basisofrecord, geologicalcontextid
 
-    def get_dwca_data(self, taxoncolumns):
-        dwcdata = None
-        basisofrecord, geologicalcontextid = self.get_context_info()
-        selectedcolumns = []
-        geocolumns = self.pandataset.defaultparams
+    def get_taxon_lookup(self, taxoncolumns):
+        """Return a frame with the occurrence attributes of each taxon column, one row per column in order of taxoncolumns."""
+        lookup = pd.DataFrame({
+            'colno': [str(tc.get('colno')) for tc in taxoncolumns.values()],
+            'series': [str(tc.get('series')) for tc in taxoncolumns.values()],
+            'recordedBy': [tc.get('author').get('name') if tc.get('author') else None for tc in taxoncolumns.values()],
+            'scientificName': [tc.get('taxon') for tc in taxoncolumns.values()],
+            'phylum': [tc.get('phylum') for tc in taxoncolumns.values()],
+            'kingdom': [tc.get('kingdom') for tc in taxoncolumns.values()],
+            'organismQuantityType': [tc.get('dimension') for tc in taxoncolumns.values()],
+        })
+        if 'sex' in self.dwcfields:
+            lookup['sex'] = [tc.get('sex') for tc in taxoncolumns.values()]
+        if 'lifeStage' in self.dwcfields:
+            lookup['lifeStage'] = [tc.get('lifestage') for tc in taxoncolumns.values()]
+        return lookup
+
+    def get_occurrence_frame(self, geocolumns, taxoncolumns):
+        """Melt the taxon columns of the data into one row per occurrence.
+
+        Only positive quantities are kept; they are selected on the data array before any frame
+        is built, in the order of DataFrame.melt (column by column). The attributes of the taxon
+        columns are joined by taking the rows of the lookup frame by column code.
+
+        Returns
+        -------
+            DataFrame with the geocolumns, 'index', 'organismQuantity' and the columns of get_taxon_lookup()
+        """
+        data = self.pandataset.data
+        quantities = data[list(taxoncolumns.keys())]
+        if not all(pd.api.types.is_numeric_dtype(dtype) for dtype in quantities.dtypes):
+            quantities = quantities.apply(pd.to_numeric, errors='coerce')
+        values = quantities.to_numpy()
+        #exclude missing, zero and negative quantity values
+        with np.errstate(invalid='ignore'):
+            colcodes, rows = np.nonzero((values > 0).T)
+        geodata = data[[c for c in geocolumns if c in data.columns]]
+        for column in geodata.columns:
+            #format dates once per data row instead of once per occurrence
+            if pd.api.types.is_datetime64_any_dtype(geodata[column]):
+                geodata = geodata.assign(**{column: geodata[column].dt.strftime(self.date_format)})
+        occurrences = geodata.iloc[rows].reset_index(drop=True)
+        occurrences['index'] = data.index.to_numpy()[rows] + 1
+        occurrences['organismQuantity'] = values[rows, colcodes]
+        lookup = self.get_taxon_lookup(taxoncolumns)
+        taken = lookup.take(colcodes).reset_index(drop=True)
+        return pd.concat([occurrences, taken], axis=1)
+
+    def get_geocolumns(self):
+        """Return the columns describing the sampling location and time, and register the corresponding DwC fields."""
+        geocolumns = list(self.pandataset.defaultparams)
         if 'Depth water' in self.pandataset.data.columns:
             self.dwcfields.append('minimumDepthInMeters')
             geocolumns.append('Depth water')
@@ -175,70 +186,71 @@ class PanDarwinCoreAchiveExporter(PanExporter):
             if 'Sampling date' in self.pandataset.data.columns:
                 geocolumns.append('Date/Time')
                 self.pandataset.data.rename(columns={"Sampling date": "Date/Time"}, inplace = True)
-
-        if len(taxoncolumns) > 0:
-            try:
-                selectedcolumns.extend(geocolumns)
-                selectedcolumns.extend(taxoncolumns.keys())
-                taxonframe = self.pandataset.data[selectedcolumns]
-                taxonframe = taxonframe.reset_index()
-                geocolumns.append('index')
-                taxonframe = taxonframe.melt(id_vars=geocolumns, value_vars=list(taxoncolumns.keys()), var_name='Colname',
-                                             value_name='organismQuantity')
-
-                #exclude negative quantity values
-                try:
-                    taxonframe = taxonframe[taxonframe['organismQuantity']>0]
-                except:
-                    pass
-                #preserve the od occurence ids
-                taxonframe['index'] = taxonframe['index']+1
-                taxonframe['id'] = taxonframe['index'].astype(str) + '_' + taxonframe['Colname'].apply(
-                    lambda x: taxoncolumns.get(x).get('colno')).astype(str)
-                taxonframe['occurrenceID'] = taxonframe['id']
-                taxonframe['modified'] = self.pandataset.lastupdate
-                taxonframe['institutionCode'] = 'Pangaea'
-                doimatch = re.search('(10\.1594/PANGAEA\.[0-9]+)', self.pandataset.doi)
-                taxonframe['CollectionCode'] = 'doi:' + str(doimatch[1])
-                taxonframe['datasetID'] = self.pandataset.doi
-                taxonframe['basisOfRecord'] = basisofrecord
-                taxonframe['catalogNumber'] = taxonframe['Colname'].apply(
-                    lambda x: taxoncolumns.get(x).get('series')).astype(str) + '_' + taxonframe['index'].astype(str)
-                taxonframe['recordedBy'] = taxonframe['Colname'].apply(lambda x: None if not taxoncolumns.get(x).get('author') else taxoncolumns.get(x).get('author').get('name'))
-                taxonframe['scientificName'] = taxonframe['Colname'].apply(lambda x: taxoncolumns.get(x).get('taxon'))
-                taxonframe['geodeticDatum'] = 'WGS84'
-                taxonframe['phylum'] = taxonframe['Colname'].apply(lambda x: taxoncolumns.get(x).get('phylum'))
-                taxonframe['kingdom'] = taxonframe['Colname'].apply(lambda x: taxoncolumns.get(x).get('kingdom'))
-                #taxonframe['organismQuantityType'] = 'individuals (' + taxonframe['Colname'].apply(
-                #    lambda x: taxoncolumns.get(x).get('unit')).astype(str) + ')'
-                taxonframe['organismQuantityType'] = taxonframe['Colname'].apply(lambda x: taxoncolumns.get(x).get('dimension'))
-
-                try:
-                    if 'sex' in self.dwcfields:
-                        taxonframe['sex'] = taxonframe['Colname'].apply(lambda x: taxoncolumns.get(x).get('sex'))
-
-                    if 'lifeStage' in self.dwcfields:
-                        taxonframe['lifeStage'] = taxonframe['Colname'].apply(lambda x: taxoncolumns.get(x).get('lifestage'))
-                except Exception as e1:
-                    print(e1)
-                replace_dwcnames = {ck: cv  for (ck, cv) in self.dwcnames.items() if ck in taxonframe.columns}
-
-                taxonframe.rename(columns=replace_dwcnames, inplace=True)
-                if geologicalcontextid:
-                    taxonframe['geologicalContextID'] = geologicalcontextid
+        return geocolumns
+
+    def iter_dwca_frames(self, taxoncolumns, chunk_rows=None):
+        """Yield the DwC occurrence table in parts.
+
+        Parameters
+        ----------
+        taxoncolumns : dict
+            The result of get_taxon_columns()
+        chunk_rows : int
+            Approximate maximum number of data cells melted at once. The taxon columns are processed
+            in groups of chunk_rows // number of data rows columns, so that the parts follow the order
+            of the complete table. By default the table is yielded as one frame.
+        """
+        basisofrecord, geologicalcontextid = self.get_context_info()
+        geocolumns = self.get_geocolumns()
+        doimatch = re.search(r'(10\.1594/PANGAEA\.[0-9]+)', self.pandataset.doi)
+        columns = list(taxoncolumns.keys())
+        step = len(columns)
+        if chunk_rows:
+            step = max(1, chunk_rows // max(1, len(self.pandataset.data)))
+        for first in range(0, len(columns), step):
+            taxonframe = self.get_occurrence_frame(geocolumns, {c: taxoncolumns[c] for c in columns[first:first + step]})
+            #preserve the od occurence ids
+            index = taxonframe.pop('index')
+            index_str = index.astype(str)
+            taxonframe['id'] = index_str + '_' + taxonframe.pop('colno')
+            taxonframe['occurrenceID'] = taxonframe['id']
+            taxonframe['modified'] = self.pandataset.lastupdate
+            taxonframe['institutionCode'] = 'Pangaea'
+            taxonframe['CollectionCode'] = 'doi:' + str(doimatch[1])
+            taxonframe['datasetID'] = self.pandataset.doi
+            taxonframe['basisOfRecord'] = basisofrecord
+            taxonframe['catalogNumber'] = taxonframe.pop('series') + '_' + index_str
+            taxonframe['geodeticDatum'] = 'WGS84'
+            #taxonframe['organismQuantityType'] = 'individuals (' + taxonframe['Colname'].apply(
+            #    lambda x: taxoncolumns.get(x).get('unit')).astype(str) + ')'
+            replace_dwcnames = {ck: cv  for (ck, cv) in self.dwcnames.items() if ck in taxonframe.columns}
+
+            taxonframe.rename(columns=replace_dwcnames, inplace=True)
+            if geologicalcontextid:
+                taxonframe['geologicalContextID'] = geologicalcontextid
+                if 'geologicalContextID' not in self.dwcfields:
                     self.dwcfields.append('geologicalContextID')
-                #elevation_direction = self.set_elevation_column()
+            #elevation_direction = self.set_elevation_column()
 
-                self.dwcfields= [f for f in self.dwcfields if f in taxonframe.columns]
+            self.dwcfields= [f for f in self.dwcfields if f in taxonframe.columns]
 
-                taxonframe = taxonframe[self.dwcfields]
+            #if elevation_direction == 'neg' and 'minimumElevationInMeters' in taxonframe.columns:
+            #    taxonframe['minimumElevationInMeters'] = taxonframe['minimumElevationInMeters'] * -1
 
-                #if elevation_direction == 'neg' and 'minimumElevationInMeters' in taxonframe.columns:
-                #    taxonframe['minimumElevationInMeters'] = taxonframe['minimumElevationInMeters'] * -1
+            yield taxonframe[self.dwcfields]
 
-                taxonframe = taxonframe[taxonframe['organismQuantity'].notna()]
+    def write_dwca_data(self, textfile, taxoncolumns, chunk_rows=None):
+        """Write the DwC occurrence table as CSV to a text file object, part by part."""
+        for i, taxonframe in enumerate(self.iter_dwca_frames(taxoncolumns, chunk_rows)):
+            taxonframe.to_csv(textfile, header=(i == 0), index=False,sep='|',lineterminator='\n',date_format =self.date_format)
 
-                dwcdata = taxonframe.to_csv(index=False,sep='|',lineterminator='\n',date_format ='%Y-%m-%dT%H:%M:%S', encoding='utf-8')
+    def get_dwca_data(self, taxoncolumns):
+        dwcdata = None
+        if len(taxoncolumns) > 0:
+            try:
+                buffer = StringIO()
+                self.write_dwca_data(buffer, taxoncolumns)
+                dwcdata = buffer.getvalue()
 
             except Exception as e2:
                 exc_type, exc_obj, exc_tb = sys.exc_info()
@@ -280,10 +292,8 @@ class PanDarwinCoreAchiveExporter(PanExporter):
         ret = False
         if self.pandataset.metaxml:
             try:
-                eml_xslt = os.path.join(os.path.dirname(__file__), 'xslt', 'panmd2eml.xslt')
-                xslt = et.parse(eml_xslt)
                 panxml = et.fromstring(self.pandataset.metaxml.encode())
-                transform = et.XSLT(xslt)
+                transform = get_eml_transform()
                 emlxml = transform(panxml)
                 gbifcitation = emlxml.find("additionalMetadata/metadata/gbif/citation")
                 if gbifcitation is not None:
@@ -327,11 +337,66 @@ class PanDarwinCoreAchiveExporter(PanExporter):
 
         return hasTaxoncolumns and hasCoordinates
 
-    def create(self):
+    def get_file_path(self):
+        return os.path.join(self.filelocation,str('dwca_pangaea_'+str(self.pandataset.id)+'.zip'))
+
+    def write(self, taxoncolumns):
+        """Write the DwC-A Zip file directly into filelocation.
+
+        The occurrence table is streamed into the archive in parts of about chunk_rows data cells,
+        so neither the table nor the archive is held in memory. The archive is written to a
+        .part file which is renamed once it is complete.
+
+        Returns
+        -------
+            The path of the archive or False if it could not be written
+        """
+        path = self.get_file_path()
+        partpath = path + '.part'
+        errors = len([lg for lg in self.logging if 'ERROR' in lg])
+        try:
+            with ZipFile(partpath, 'w', compression=ZIP_DEFLATED) as zip_file:
+                with zip_file.open(str(self.pandataset.id)+'_data.tab', 'w', force_zip64=True) as data:
+                    with TextIOWrapper(data, encoding='utf-8', newline='') as textfile:
+                        self.write_dwca_data(textfile, taxoncolumns, self.chunk_rows)
+                # meta.xml lists the fields found while writing the table
+                meta = self.get_meta_xml()
+                eml = self.get_eml_xml()
+                if len([lg for lg in self.logging if 'ERROR' in lg]) > errors:
+                    raise ValueError('previous errors')
+                zip_file.writestr('meta.xml', meta)
+                zip_file.writestr('eml.xml', eml)
+            os.replace(partpath, path)
+            return path
+        except Exception as e:
+            self.logging.append({'ERROR':'DwC-A Zip file creation failed: '+str(e)})
+            if os.path.exists(partpath):
+                os.remove(partpath)
+            return False
+
+    def create(self, ondisk=False):
+        """Create the DwC-A Zip file.
+
+        Parameters
+        ----------
+        ondisk : bool
+            Stream the archive directly into filelocation instead of building it in memory,
+            which bounds the memory needed for datasets with many occurrences
+
+        Returns
+        -------
+            BytesIO holding the archive, the path of the archive written to disk or False on failure
+        """
         in_memory_zip = False
         if self.pandataset.id:
             try:
                 datacolumns = self.get_taxon_columns()
+                if ondisk:
+                    if len(datacolumns) > 0:
+                        self.file = self.write(datacolumns)
+                    else:
+                        self.logging.append({'ERROR': 'No taxonomic information identified in dataset, skipping DwC-A ASCII table generation'})
+                    return self.file or False
                 data = self.get_dwca_data(datacolumns)
                 meta = self.get_meta_xml()
                 eml = self.get_eml_xml()
@@ -340,7 +405,7 @@ class PanDarwinCoreAchiveExporter(PanExporter):
                     zip_file = ZipFile(in_memory_zip, 'w')
                     zip_file.writestr('meta.xml', meta)
                     zip_file.writestr('eml.xml', eml)
-                    zip_file.writestr(self.pandataset.id+'_data.tab', data)
+                    zip_file.writestr(str(self.pandataset.id)+'_data.tab', data)
                     zip_file.close()
                     in_memory_zip.seek(0)
                     self.file = in_memory_zip
@@ -354,16 +419,20 @@ class PanDarwinCoreAchiveExporter(PanExporter):
         return in_memory_zip
 
     def save(self):
+        if isinstance(self.file, str) and os.path.exists(self.file):
+            #written to disk by create()
+            self.logging.append({'INFO': 'Saved DwC-A Zip: ' + self.file})
+            return True
         if isinstance(self.file, BytesIO):
             try:
-                with open(os.path.join(self.filelocation,str('dwca_pangaea_'+str(self.pandataset.id)+'.zip')),'wb') as f:
+                with open(self.get_file_path(),'wb') as f:
                     #print(f.name)
                     f.write(self.file.getbuffer())
                     f.close()
-                    self.logging.append({'INFO': 'Saved DwC-A Zip: ' + os.path.join(self.filelocation,str('dwca_pangaea_'+str(self.pandataset.id)+'.zip'))})
+                    self.logging.append({'INFO': 'Saved DwC-A Zip: ' + self.get_file_path()})
                     return True
             except Exception as e:
                 self.logging.append({'ERROR': 'Could not save, DwC-A Zip: '+str(e)})
         else:
             self.logging.append({'ERROR':'Could not save, DwC-A Zip file is not a BytesIO'})
-            return False
\ No newline at end of file
+            return False
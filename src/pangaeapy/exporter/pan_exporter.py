@@ -1,10 +1,18 @@
 import os
+import re
 from os.path import expanduser
 
+from pangaeapy.mappings.pan_mapping_table import load_mapping_table
+
 class PanExporter:
     def __init__(self, pandataset, filelocation=None):
         self.module_dir = os.path.dirname(os.path.dirname(__file__))
-        self.pandataset=pandataset
+        #exports work on a view of the dataset (see PanDataSet.export_view), renaming or adding columns
+        #and parameters during an export does not change the dataset itself
+        export_view = getattr(type(pandataset), 'export_view', None)
+        self.pandataset = export_view(pandataset) if export_view is not None else pandataset
+        #the view logs to the dataset
+        self.pandataset.logging = pandataset.logging
         if filelocation == None:
             self.filelocation =os.path.join(expanduser("~"),'pangaeapy_export')
             try:
@@ -17,6 +25,32 @@ class PanExporter:
         self.logging = self.pandataset.logging
         #print(self.logging)
 
+    #synonyms (CF, SDN, EMODNET) of PANGAEA parameters by integer parameter id, loaded once per process
+    @property
+    def mapping(self):
+        return load_mapping_table()
+
+    @staticmethod
+    def get_array_name(column):
+        """Return a valid array name for a column, e.g. 'Date/Time' becomes 'Date_Time'."""
+        name = re.sub(r'[/\s]', '_', column)
+        return re.sub(r'[\[\]]', '', name)
+
+    def get_cf_attributes(self, p):
+        """Return the CF attributes of a parameter, standard names and units are taken from the mapping table."""
+        attrs = {'long_name': p.name}
+        entry = self.mapping.get(p.id)
+        if entry is not None:
+            if entry.cf_name:
+                attrs['standard_name'] = entry.cf_name
+                if entry.cf_unit:
+                    attrs['units'] = entry.cf_unit
+            if entry.sdn_id:
+                attrs['sdn_parameter_urn'] = entry.sdn_id
+                attrs['sdn_parameter_name'] = entry.sdn_name
+        attrs.setdefault('units', p.unit if p.unit is not None else '1')
+        return attrs
+
     #check if export is possible
     def verify(self):
         return True
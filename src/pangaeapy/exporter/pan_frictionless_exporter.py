@@ -1,32 +1,60 @@
-import shutil
-from io import BytesIO
-from zipfile import ZipFile
+from io import BytesIO, StringIO, TextIOWrapper
+from zipfile import ZipFile, ZIP_DEFLATED
 
 from pangaeapy.exporter.pan_exporter import PanExporter
+from pangaeapy.exporter.pan_parquet_exporter import PanParquetExporter
 import os
 import json
 class PanFrictionlessExporter(PanExporter):
 
+    def __init__(self, *args, **kwargs):
+        super(PanFrictionlessExporter, self).__init__(*args, **kwargs)
+        # number of data rows written to the ZIP at once
+        self.chunk_rows = 100000
+        # PANGAEA parameter types -> frictionless table schema types
+        self.typeconv = {'numeric': 'number', 'string': 'string', 'text': 'string', 'datetime': 'datetime'}
+        self.date_format = '%Y-%m-%dT%H:%M:%SZ'
+        self.schema = None
+
+    def get_file_path(self):
+        return os.path.join(self.filelocation,str('frictionless_pangaea_'+str(self.pandataset.id)+'.zip'))
+
+    def write_csv(self, textfile):
+        """Write the data as CSV to a text file object in parts of chunk_rows rows."""
+        data = self.pandataset.data
+        for first in range(0, max(len(data), 1), self.chunk_rows):
+            data.iloc[first:first + self.chunk_rows].to_csv(textfile, header=(first == 0), index=False,
+                                                            lineterminator='\n', date_format=self.date_format)
+
+    def write_parquet(self, stream):
+        """Write the data as Parquet to a binary file object, see PanParquetExporter. Requires pyarrow."""
+        PanParquetExporter(self.pandataset, filelocation=self.filelocation).write(stream)
+
     def get_csv(self):
         csv =''
         #print(self.pandataset.data.head())
         try:
-            csv = self.pandataset.data.to_csv(os.path.join(self.filelocation,+'data.csv'), index=False)
+            buffer = StringIO()
+            self.write_csv(buffer)
+            csv = buffer.getvalue()
         except Exception as e:
             self.logging.append({'ERROR': 'Frictionless CSV creation failed: '+str(e)})
 
         return csv
 
     def create_tableschema_json(self):
+        """Return the table schema of the data, built once from the parameters and reused by all resources."""
+        if self.schema is not None:
+            return self.schema
         schema = {'fields':[]}
-        typeconv={'numeric':'number'}
-        for k, p in self.pandataset.params.items():
+        for k in self.pandataset.data.columns:
+            p = self.pandataset.params.get(k)
+            if p is None:
+                schema['fields'].append({'name': k, 'type': 'any'})
+                continue
             field={'name':k,'title':p.name}
             #print(k, p.name, p.shortName)
-            pantype = p.type
-            if pantype in typeconv:
-                pantype = typeconv.get(pantype)
-            field['type']= pantype
+            field['type']= self.typeconv.get(p.type, 'any')
             panunit = p.unit
             if panunit:
                 field['unit'] = panunit
@@ -34,58 +62,102 @@ class PanFrictionlessExporter(PanExporter):
             if pancomment:
                 field['description'] = pancomment
             schema['fields'].append(field)
+        self.schema = schema
         return schema
 
-    def get_package_json(self):
+    def get_package_json(self, parquet=False):
         package = {'profile':'tabular-data-package'}
         panauthors = []
         try:
             for author in self.pandataset.authors:
-                panauthors.append({'title': author.firstname + ' ' + author.lastname, 'role': 'author'})
+                panauthors.append({'title': ' '.join(filter(None, [author.firstname, author.lastname])), 'role': 'author'})
             table_schema = self.create_tableschema_json()
 
             resources=  [{'profile':'tabular-data-resource',
-                          'path': self.pandataset.id + '_data.csv',
+                          'name': 'data',
+                          'path': str(self.pandataset.id) + '_data.csv',
+                          'format': 'csv',
+                          'mediatype': 'text/csv',
+                          'encoding': 'utf-8',
                           'schema':table_schema}]
+            if parquet:
+                resources.append({'name': 'data_parquet',
+                                  'path': str(self.pandataset.id) + '_data.parquet',
+                                  'format': 'parquet',
+                                  'mediatype': 'application/vnd.apache.parquet',
+                                  'schema': table_schema})
 
-            package['name'] = self.pandataset.id + '_metadata'
+            package['name'] = str(self.pandataset.id) + '_metadata'
             package['id'] = self.pandataset.doi
             package['title'] = self.pandataset.title
             if self.pandataset.abstract:
                 package['description'] = self.pandataset.abstract
             package['created'] = self.pandataset.date
             package['contributors'] = panauthors
-            package['licenses'] = [{'path':self.pandataset.licence.URI, 'name':self.pandataset.licence.label, 'title':self.pandataset.licence.name}]
+            if self.pandataset.licence:
+                package['licenses'] = [{'path':self.pandataset.licence.URI, 'name':self.pandataset.licence.label, 'title':self.pandataset.licence.name}]
             package['resources'] =resources
         except Exception as e:
             self.logging.append({'ERROR': 'Frictionless JSON creation failed: '+str(e)})
-        return json.dump(package)
+        return json.dumps(package, indent=2)
+
+    def create(self, ondisk=False, parquet=False):
+        """Create the frictionless data package ZIP.
+
+        The data are streamed into the ZIP in parts of chunk_rows rows, next to the package descriptor.
+
+        Parameters
+        ----------
+        ondisk : bool
+            Write the ZIP directly into filelocation instead of building it in memory
+        parquet : bool
+            Add the data as Parquet resource (requires pyarrow)
 
-    def create(self):
-        in_memory_zip = False
+        Returns
+        -------
+            BytesIO holding the ZIP, the path of the ZIP written to disk or False on failure
+        """
         ret = False
         if not self.pandataset.isCollection:
             if self.pandataset.loginstatus == 'unrestricted':
+                target = self.get_file_path() + '.part' if ondisk else BytesIO()
                 try:
-                    in_memory_zip = BytesIO()
-                    zip_file = ZipFile(in_memory_zip, 'w')
-                    package = self.get_package_json()
-                    csv = self.get_csv()
-                    zip_file.writestr(self.pandataset.id + '_data.csv', csv)
-                    zip_file.writestr(self.pandataset.id + '_metadata.json', package)
-                    self.logging.append({'SUCCESS': 'Frictionless in memory ZIP created'})
+                    with ZipFile(target, 'w', compression=ZIP_DEFLATED) as zip_file:
+                        with zip_file.open(str(self.pandataset.id) + '_data.csv', 'w', force_zip64=True) as data:
+                            with TextIOWrapper(data, encoding='utf-8', newline='') as textfile:
+                                self.write_csv(textfile)
+                        if parquet:
+                            with zip_file.open(str(self.pandataset.id) + '_data.parquet', 'w', force_zip64=True) as data:
+                                self.write_parquet(data)
+                        zip_file.writestr(str(self.pandataset.id) + '_metadata.json', self.get_package_json(parquet))
+                    if ondisk:
+                        os.replace(target, self.get_file_path())
+                        self.file = self.get_file_path()
+                        self.logging.append({'SUCCESS': 'Frictionless ZIP written to '+self.file})
+                    else:
+                        target.seek(0)
+                        self.file = target
+                        self.logging.append({'SUCCESS': 'Frictionless in memory ZIP created'})
+                    ret = self.file
+                except ImportError as e:
+                    self.logging.append({'ERROR': 'Frictionless Parquet resource requires pyarrow: '+str(e)})
                 except Exception as e:
-                    self.logging.append({'ERROR': 'Frictionless in memory Zip creation failed: '+str(e)})
+                    self.logging.append({'ERROR': 'Frictionless Zip creation failed: '+str(e)})
+                if not ret and ondisk and os.path.exists(target):
+                    os.remove(target)
             else:
                 self.logging.append({'ERROR': 'Dataset is protected'})
         else:
             self.logging.append({'ERROR':'Cannot export a collection type dataset to frictionless'})
-        return in_memory_zip
+        return ret
 
     def save(self):
+        if isinstance(self.file, str) and os.path.exists(self.file):
+            #written to disk by create()
+            return True
         if isinstance(self.file, BytesIO):
             try:
-                with open(os.path.join(self.filelocation,str('frictionless_pangaea_'+str(self.pandataset.id)+'.zip')),'wb') as f:
+                with open(self.get_file_path(),'wb') as f:
                     f.write(self.file.getbuffer())
                     f.close()
                     return True
@@ -93,4 +165,4 @@ class PanFrictionlessExporter(PanExporter):
                 self.logging.append({'ERROR': 'Could not save Frictionless Zip: '+str(e)})
         else:
             self.logging.append({'ERROR':'Could not save, Frictionless Zip file is not a BytesIO'})
-            return False
\ No newline at end of file
+            return False
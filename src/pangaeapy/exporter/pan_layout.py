@@ -0,0 +1,112 @@
+import numpy as np
+import pandas as pd
+
+
+class PanInstanceLayout:
+    """Layout of the rows of a data frame as a two-dimensional INSTANCE x MAXZ/MAXT array.
+
+    Each group of rows (e.g. each event) becomes one instance, its rows are placed in the
+    second dimension in their original order and shorter instances are padded.
+    The layout is computed once from the group codes and the position of each row within
+    its group, so that every column can be scattered into a preallocated array.
+    Rows without a group are left out, as in DataFrame.groupby().
+
+    Parameters
+    ----------
+    data : pd.DataFrame
+        The data, which is not changed
+    by : str
+        The column defining the instances, instances are ordered by its sorted values
+
+    Attributes
+    ----------
+    instances : pd.Index
+        The group values in the order of the instances
+    counts : np.ndarray
+        The number of rows of each instance
+    starts : np.ndarray
+        The offset of each instance in the contiguous order of the rows
+    order : np.ndarray
+        The row numbers of the data grouped by instance, see contiguous()
+    maxr : int
+        The maximum number of rows of an instance
+    shape : tuple
+        (number of instances, maxr)
+    """
+    def __init__(self, data, by='Event'):
+        codes, self.instances = pd.factorize(data[by], sort=True)
+        self.valid = codes >= 0
+        self.codes = codes[self.valid]
+        self.counts = np.bincount(self.codes, minlength=len(self.instances))
+        # position of each row within its instance, counted in the order of the rows
+        order = np.argsort(self.codes, kind='stable')
+        self.starts = (np.cumsum(self.counts) - self.counts).astype(np.intp)
+        positions = np.empty(len(self.codes), dtype=np.intp)
+        positions[order] = np.arange(len(self.codes)) - np.repeat(self.starts, self.counts)
+        self.positions = positions
+        self.order = np.flatnonzero(self.valid)[order]
+        self.maxr = int(self.counts.max()) if len(self.counts) else 0
+        self.shape = (len(self.instances), self.maxr)
+
+    def pad(self, values, fill_value=np.nan, dtype=None):
+        """Scatter the values of a column into an array of the layout's shape.
+
+        Parameters
+        ----------
+        values : array-like
+            One value per row of the data
+        fill_value : scalar
+            Value of the padding cells
+        dtype : dtype
+            Type of the array, by default the type of the values
+
+        Returns
+        -------
+            np.ndarray of shape self.shape
+        """
+        values = np.asarray(values)
+        padded = np.full(self.shape, fill_value, dtype=dtype or values.dtype)
+        padded[self.codes, self.positions] = values[self.valid]
+        return padded
+
+    def pad_block(self, values, start, stop, fill_value=np.nan, dtype=None):
+        """Scatter the values of the instances start to stop (exclusive) into an array of shape (stop - start, maxr).
+
+        Writing a variable block by block needs memory only for the block, not for the whole padded array.
+        """
+        values = np.asarray(values)
+        counts = self.counts[start:stop]
+        lo = self.starts[start] if start < len(self.starts) else 0
+        hi = lo + int(counts.sum())
+        padded = np.full((len(counts), self.maxr), fill_value, dtype=dtype or values.dtype)
+        codes = np.repeat(np.arange(len(counts)), counts)
+        positions = np.arange(hi - lo) - np.repeat(self.starts[start:stop] - lo, counts)
+        padded[codes, positions] = values[self.order[lo:hi]]
+        return padded
+
+    def pad_masked(self, values, dtype=None):
+        """Scatter the values of a column into a masked array of the layout's shape.
+
+        Padding cells and missing (NaN) values are masked, so that they are written as
+        fill values to a NetCDF variable.
+        """
+        values = np.asarray(values)
+        missing = pd.isna(values)
+        if missing.any():
+            values = np.where(missing, 0, values)
+        padded = self.pad(values, fill_value=0, dtype=dtype)
+        mask = np.ones(self.shape, dtype=bool)
+        mask[self.codes, self.positions] = missing[self.valid]
+        return np.ma.masked_array(padded, mask=mask)
+
+    def contiguous(self, values):
+        """Return the values of a column grouped by instance, each instance in its original row order.
+
+        This is the order of a CF contiguous ragged array, in which instance i occupies
+        the elements starts[i] to starts[i] + counts[i].
+        """
+        return np.asarray(values)[self.order]
+
+    def first(self, values):
+        """Return the value of the first row of each instance."""
+        return self.contiguous(values)[self.starts]
@@ -4,7 +4,6 @@ Created on Wed Sep  5 14:58:00 2018
 
 @author: Robert Huber 
 """
-import json
 import linecache
 
 from netCDF4 import date2num, Dataset,stringtochar
@@ -15,10 +14,20 @@ import sys
 import os
 
 from pangaeapy.exporter.pan_exporter import PanExporter
+from pangaeapy.exporter.pan_layout import PanInstanceLayout
+from pangaeapy.mappings.pan_mapping_table import load_mapping_table
 
 
 class PanNetCDFExporter(PanExporter):
     style = 'sdn'
+    layout = None
+    ondisk = None
+    #estimated size in bytes above which SDN and ragged files are written to disk if ondisk is not set
+    ondisk_threshold = 256 * 1024 ** 2
+    #number of values per chunk of a variable in files written to disk
+    chunk_elements = 2 ** 18
+    complevel = 4
+    partpath = None
     def PrintException(self):
         exc_type, exc_obj, tb = sys.exc_info()
         f = tb.tb_frame
@@ -46,22 +55,24 @@ class PanNetCDFExporter(PanExporter):
             self.logging.append({'ERROR': 'NetCDF main variables creation failed '+str(e)})
             #print('NetCDF main variables creation failed '+str(e))
                       
-    def setParameterSynonyms(self, mappingfile=['mappings','pan_mappings.json']):
+    def setParameterSynonyms(self, mappingfile=None):
         self.logging.append({'INFO': 'Trying to set synonyms and standard names'})
         #print('Trying to set synonyms and standard names')
-        with open(os.path.join(self.module_dir,*mappingfile), 'r') as mappingjson:
-            mapping = json.load(mappingjson)
-        #mapping=pd.read_csv(mappingfile,delimiter='\t',index_col='PANGAEA ID')
+        if mappingfile is None:
+            mapping = self.mapping
+        else:
+            mapping = load_mapping_table(os.path.join(self.module_dir,*mappingfile))
         for pacronym, param in self.pandataset.params.items():
-            if str(param.id) in mapping:
-                #print(str(param.id)+" "+mapping.get(str(param.id)).get('SDN P01 ID'))
-                cf_name=mapping.get(str(param.id)).get('CF standard name')
-                self.pandataset.params[pacronym].addSynonym('CF',cf_name,unit=mapping.get(str(param.id)).get('CF unit'))
-                self.pandataset.params[pacronym].addSynonym('SD',mapping.get(str(param.id)).get('SDN P01 Name'),id=mapping.get(str(param.id)).get('SDN P01 ID'),uri=mapping.get(str(param.id)).get('SDN P01 URI'),unit=mapping.get(str(param.id)).get('SDN Unit Name'), unit_id=mapping.get(str(param.id)).get('SDN Unit URN') )
+            entry = mapping.get(param.id)
+            if entry is not None:
+                param.addSynonym('CF',entry.cf_name,unit=entry.cf_unit)
+                param.addSynonym('SD',entry.sdn_name,id=entry.sdn_id,uri=entry.sdn_uri,unit=entry.sdn_unit, unit_id=entry.sdn_unit_id)
+                if entry.emodnet_name is not None:
+                    param.addSynonym('EMODNET',entry.emodnet_name)
         
     def cleanParameterNames(self):
         tempparams ={}
-        for pk, p in self.pandataset.params.items():
+        for pk, p in list(self.pandataset.params.items()):
             new_pk = re.sub(r'[/\s]', '_',pk)
             new_pk = re.sub(r'[\[\]]', '', new_pk)
             new_pk = re.sub(r'(?![a-zA-Z0-9_]|{MUTF8})([^\x00-\x1F/\x7F-\xFF]|{MUTF8})', '_', new_pk)
@@ -71,7 +82,7 @@ class PanNetCDFExporter(PanExporter):
         self.pandataset.data.columns = self.pandataset.data.columns.str.replace('(?![a-zA-Z0-9_]|{MUTF8})([^\x00-\x1F/\x7F-\xFF]|{MUTF8})', '_',regex=True)
 
     def setSDNQCVariable(self, ncvarName, dims):
-        ncVar = self.netcdf.createVariable(ncvarName, 'b', dims, fill_value='57')
+        ncVar = self.createVariable(ncvarName, 'b', dims, fill_value='57')
         ncVar.long_name = 'SeaDataNet quality flag'
         ncVar.flag_values = ', '.join(map(str, self.pandataset.quality_flag_replace.values()))
         ncVar.flag_meanings = ' '.join(self.pandataset.quality_flags.values())
@@ -85,10 +96,12 @@ class PanNetCDFExporter(PanExporter):
             self.pandataset.rename_column(nkey,nname)
 
     def setSDNVariablesAndValues(self, dims):
+        if self.layout is None:
+            self.layout = PanInstanceLayout(self.pandataset.data)
         eventCoords = self.pandataset.data.groupby(['Event']).min()
         self.cleanParameterNames()
         var_coordinates = [c for c in ['TIME','DEPTH','LATITUDE','LONGITUDE'] if c in set(self.pandataset.params.keys())]
-        crsVar = self.netcdf.createVariable('crs', 'i')
+        crsVar = self.createVariable('crs', 'i')
         crsVar.grid_mapping_name = "latitude_longitude"
         crsVar.epsg_code = "EPSG:4326"
         crsVar.semi_major_axis = 6378137.0
@@ -103,7 +116,7 @@ class PanNetCDFExporter(PanExporter):
                             if self.netcdf.featureType == 'profile':
                                 #if ncvarName in ['Latitude','Longitude','Date_Time']:
                                 if ncvarName in ['LATITUDE','LONGITUDE']:
-                                    ncVar = self.netcdf.createVariable(ncvarName, 'f4', ['INSTANCE'])
+                                    ncVar = self.createVariable(ncvarName, 'f4', ['INSTANCE'])
                                     if ncvarName == 'LATITUDE':
                                         ncQCVar = self.setSDNQCVariable('POSITION_SEADATANET_QC', ['INSTANCE'])
                                         ncQCVar[:] = [9] * eventCoords['LATITUDE'].size
@@ -124,7 +137,7 @@ class PanNetCDFExporter(PanExporter):
                                         ncVar.grid_mapping = "crs"
                                     ncVar[:]=eventCoords[ncvarName].values
                                 elif ncvarName == 'TIME':
-                                    ncVar = self.netcdf.createVariable(ncvarName, 'd', ['INSTANCE'])
+                                    ncVar = self.createVariable(ncvarName, 'd', ['INSTANCE'])
                                     ncVar[:]=date2num(eventCoords['TIME'].dt.to_pydatetime(),units=self.time_units,calendar='standard')
                                     ncQCVar = self.setSDNQCVariable('TIME_SEADATANET_QC', ['INSTANCE'])
                                     ncQCVar[:] = [9] * eventCoords['TIME'].size
@@ -136,14 +149,10 @@ class PanNetCDFExporter(PanExporter):
                                     ncVar.ancillary_variables = "TIME_SEADATANET_QC"
                                     ncVar.calendar = 'julian'
                                 else:
-                                    #make sure values to fill the nc var has the same shape (dimensions) as the variable
-                                    dimshape=[]
-                                    for dim in dims:
-                                        dimshape.append(self.netcdf.dimensions[dim].size)
                                     if ncvarName.endswith('_SEADATANET_QC'):
                                         ncVar = self.setSDNQCVariable(ncvarName, dims)
                                     else:
-                                        ncVar=self.netcdf.createVariable(ncvarName,'f4',dims)
+                                        ncVar=self.createVariable(ncvarName,'f4',dims)
                                         ncVar.coordinates = ' '.join(var_coordinates)
 
                                     if ncvarName == 'DEPTH':
@@ -152,14 +161,14 @@ class PanNetCDFExporter(PanExporter):
 
                                     if ncvarName+'_SEADATANET_QC' in self.pandataset.data.columns:
                                         ncVar.ancillary_variables =ncvarName+'_SEADATANET_QC'
-                                    ncValues = np.reshape(self.pandataset.data[ncvarName].values, dimshape)
-                                    ncVar[:] = ncValues
+                                    #scatter the values into the INSTANCE x MAXZ/MAXT layout, padding is masked
+                                    ncVar[:] = self.layout.pad_masked(self.pandataset.data[ncvarName].values)
                             elif self.netcdf.featureType=='timeSeries':
-                                ncVar=self.netcdf.createVariable(ncvarName,'f4',dims)
+                                ncVar=self.createVariable(ncvarName,'f4',dims)
                                 if ncvarName=='TIME':
-                                    ncVar[:]=date2num(self.pandataset.data[ncvarName].dt.to_pydatetime(),units=self.time_units,calendar='standard')
+                                    ncVar[:]=self.layout.pad_masked(self.dateValues(self.pandataset.data[ncvarName]))
                                 else:
-                                    ncVar[:]=self.pandataset.data[ncvarName].values
+                                    ncVar[:]=self.layout.pad_masked(self.pandataset.data[ncvarName].values)
                             else:
                                 self.logging.append({'ERROR':'NetCDF Feature type not supported'})
                                 break   
@@ -192,8 +201,92 @@ class PanNetCDFExporter(PanExporter):
                         self.PrintException()
                         continue
 
-    def create(self, style='pan'):
+    def dateValues(self, dates):
+        """Convert a datetime column to numbers in time_units, missing dates become NaN."""
+        values = np.full(len(dates), np.nan)
+        valid = dates.notna().to_numpy()
+        if valid.any():
+            values[valid] = date2num(dates[valid].dt.to_pydatetime(), units=self.time_units, calendar='standard')
+        return values
+
+    def getFilePath(self):
+        return os.path.join(self.filelocation,str('netcdf_'+str(self.style)+'_'+str(self.pandataset.id)+'.nc'))
+
+    def openNetCDF(self, cells):
+        """Open the NetCDF dataset for a SDN or ragged style export.
+
+        Small files are built in memory as NETCDF3_CLASSIC. With ondisk=True, or if ondisk is None and
+        the estimated size of the file exceeds ondisk_threshold, a chunked and compressed NETCDF4 file
+        is written directly into filelocation instead.
+
+        Parameters
+        ----------
+        cells : int
+            The number of values of a data variable
+        """
+        ondisk = self.ondisk
+        if ondisk is None:
+            ondisk = cells * len(self.pandataset.data.columns) * 4 > self.ondisk_threshold
+        if ondisk:
+            self.partpath = self.getFilePath()+'.part'
+            self.logging.append({'INFO':'Writing NetCDF4 file to '+self.partpath})
+            return Dataset(self.partpath, mode='w', format='NETCDF4')
+        self.partpath = None
+        return Dataset(str(self.pandataset.id)+'_'+str(self.style)+'.nc', mode='w', memory=1028, format='NETCDF3_CLASSIC')
+
+    def closeNetCDF(self):
+        """Close the NetCDF dataset, returns its content as memoryview or the path of the file written to disk."""
+        ret = self.netcdf.close()
+        if self.partpath is not None:
+            os.replace(self.partpath, self.getFilePath())
+            self.partpath = None
+            ret = self.getFilePath()
+        return ret
+
+    def discardNetCDF(self):
+        if self.netcdf is not None and self.netcdf.isopen():
+            self.netcdf.close()
+        if self.partpath is not None and os.path.exists(self.partpath):
+            os.remove(self.partpath)
+        self.partpath = None
+
+    def chunkShape(self, dims):
+        """Chunk shape of a variable: whole profiles / time series (and strings) of as many instances as fit into chunk_elements."""
+        sizes = [max(1, self.netcdf.dimensions[dim].size) for dim in dims]
+        if len(sizes) == 1:
+            return [min(sizes[0], self.chunk_elements)]
+        inner = int(np.prod(sizes[1:]))
+        if inner > self.chunk_elements:
+            #a single instance exceeds the chunk, split along the second dimension
+            return [1, max(1, self.chunk_elements // int(np.prod(sizes[2:])))] + sizes[2:]
+        return [max(1, min(sizes[0], self.chunk_elements // inner))] + sizes[1:]
+
+    def createVariable(self, ncvarName, datatype, dims=(), **kwargs):
+        """Create a variable in the current NetCDF dataset, compressed and chunked if it is written to disk."""
+        if self.partpath is not None and len(dims) > 0:
+            kwargs.setdefault('zlib', True)
+            kwargs.setdefault('complevel', self.complevel)
+            kwargs.setdefault('shuffle', True)
+            kwargs.setdefault('chunksizes', self.chunkShape(dims))
+        return self.netcdf.createVariable(ncvarName, datatype, dims, **kwargs)
+
+    def create(self, style='pan', ondisk=None):
+        """Create the NetCDF file.
+
+        Parameters
+        ----------
+        style : str
+            'sdn' (SeaDataNet), 'ragged' (CF contiguous ragged array) or 'pan' (PANGAEA style)
+        ondisk : bool
+            For 'sdn' and 'ragged': write a chunked and compressed NETCDF4 file directly into filelocation
+            instead of building a NETCDF3 file in memory. By default large files are written to disk.
+
+        Returns
+        -------
+            memoryview of the file created in memory, or the path of the file written to disk
+        """
         self.style = style
+        self.ondisk = ondisk
         ret = None
         if isinstance(self.pandataset.data, pd.DataFrame):
             self.cleanParameterNames()
@@ -204,7 +297,9 @@ class PanNetCDFExporter(PanExporter):
                     if style=='pan':
                         self.createPANNetCDF()
                     elif style=='sdn':
-                        self.createSDNNetCDF()                        
+                        self.createSDNNetCDF()
+                    elif style=='ragged':
+                        self.createRaggedNetCDF()
                 else:
                     self.logging.append({'ERROR': 'NetCDF Variable creation failed: Invalid Topotype (has to be profile, timeseries or series of profiles) but is: '+str(self.pandataset.topotype)})
             else:
@@ -213,13 +308,17 @@ class PanNetCDFExporter(PanExporter):
         return ret
 
     def save(self):
+        if isinstance(self.file, str) and os.path.exists(self.file):
+            #written to disk by create()
+            self.logging.append({'SUCCESS': 'Saved NetCDF at: ' + self.file})
+            return True
         if isinstance(self.file, memoryview):
             try:
-                with open(os.path.join(self.filelocation,str('netcdf_'+str(self.style)+'_'+str(self.pandataset.id)+'.nc')),'wb') as f:
+                with open(self.getFilePath(),'wb') as f:
                     #print(f.name)
                     f.write(self.file)
                     f.close()
-                    self.logging.append({'SUCCESS': 'Saved NetCDF at: ' + str(os.path.join(self.filelocation,str('netcdf_pangaea_'+str(self.pandataset.id)+'.nc')))})
+                    self.logging.append({'SUCCESS': 'Saved NetCDF at: ' + self.getFilePath()})
                     return True
             except Exception as e:
                 self.logging.append({'ERROR': 'Could not save, NetCDF: '+str(e)})
@@ -240,11 +339,13 @@ class PanNetCDFExporter(PanExporter):
         #print('SDN2');
         self.logging.append({'INFO':'Trying to create a SeaDataNet NetCDF file'})
         self.netcdf = None
-        #Determine the maximum number od data rows per event -> SDN's MAXZ, MAXT
-        maxr=self.pandataset.data.groupby('Event').size().max()
+        #Determine the position of each data row in the INSTANCE x MAXZ/MAXT layout
+        #and the maximum number of data rows per event -> SDN's MAXZ, MAXT
+        self.layout = PanInstanceLayout(self.pandataset.data)
+        maxr=self.layout.maxr
         try:
             #nc = Dataset(self.filelocation+'\\nc'+str(self.pandataset.id)+'_sdn.nc','w',format='NETCDF3_CLASSIC')
-            self.netcdf = Dataset(str(self.pandataset.id)+'_sdn.nc',mode = 'w', memory=1028,format='NETCDF3_CLASSIC')
+            self.netcdf = self.openNetCDF(self.layout.shape[0]*self.layout.maxr)
             self.netcdf.Conventions='SeaDataNet_1.0 CF-1.6'
             evfr=self.pandataset.getEventsAsFrame()
             MaxStrLen=dict()
@@ -268,23 +369,18 @@ class PanNetCDFExporter(PanExporter):
                 if 'STRING'+str(StrDimLen) not in self.netcdf.dimensions:
                     self.netcdf.createDimension('STRING'+str(StrDimLen), StrDimLen)
             #print(np.array(evfr['label']))
-            events=self.netcdf.createVariable('SDN_STATION', 'S1',(u'INSTANCE',u'STRING'+str(MaxStrLen['label'])))
+            events=self.createVariable('SDN_STATION', 'S1',(u'INSTANCE',u'STRING'+str(MaxStrLen['label'])))
             events.long_name='Event label'
             if 'campaign' in MaxStrLen:
                 campaign=str(MaxStrLen['campaign'])
-                campaigns=self.netcdf.createVariable('SDN_CRUISE', 'S1',(u'INSTANCE',u'STRING'+campaign))
+                campaigns=self.createVariable('SDN_CRUISE', 'S1',(u'INSTANCE',u'STRING'+campaign))
                 campaigns.long_name='Campaign label'
-            #Add empty rows to have the same number of rows per event
-            self.pandataset.data=pd.concat([
-                d.reset_index(drop=True).reindex(range(maxr))
-                for n, d in self.pandataset.data.groupby('Event')
-                ], ignore_index=True)
             events[:]=stringtochar(np.array(evfr['label'].tolist(),'S'+str(MaxStrLen['label'])))
             if 'campaign' in MaxStrLen:
                 campaigns[:]=stringtochar(np.array(evfr['campaign'].tolist(),'S'+str(MaxStrLen['campaign'])))
             
             #mandatory bottom depth
-            sdn_depth=self.netcdf.createVariable('SDN_BOT_DEPTH','f4',['INSTANCE'], fill_value=-999)
+            sdn_depth=self.createVariable('SDN_BOT_DEPTH','f4',['INSTANCE'], fill_value=-999)
             sdn_depth.standard_name ="sea_floor_depth_below_sea_surface"
             sdn_depth.units='meters'
             sdn_depth.long_name = "Bathymetric depth at "+self.netcdf.featureType+" measurement site"
@@ -294,14 +390,14 @@ class PanNetCDFExporter(PanExporter):
             sdn_depth.sdn_uom_name = "Metres"
             # ONLY IN MARINE ENVIRONMENT !!!!
             evfr['elevation']=evfr['elevation']*-1
-            evfr['elevation'].fillna(value=-999, inplace=True)
+            evfr['elevation']=evfr['elevation'].fillna(value=-999)
             sdn_depth[:]=evfr['elevation'].values
             #pangaeas EDMO code            
-            sdn_edmo_code=self.netcdf.createVariable('SDN_EDMO_CODE','int',['INSTANCE'])
+            sdn_edmo_code=self.createVariable('SDN_EDMO_CODE','i4',['INSTANCE'])
             sdn_edmo_code.long_name='European Directory of Marine Organisations code for the CDI partner'
             sdn_edmo_code[:]=[3234]*evcnt
             #the mandatory cdi id
-            sdn_cdi_id=self.netcdf.createVariable('SDN_LOCAL_CDI_ID','S1',(u'INSTANCE',u'STRING'+str(MaxStrLen['cdi_id'])))
+            sdn_cdi_id=self.createVariable('SDN_LOCAL_CDI_ID','S1',(u'INSTANCE',u'STRING'+str(MaxStrLen['cdi_id'])))
             if self.pandataset.topotype=='vertical profile' or self.pandataset.topotype=='profile series':
                 sdn_cdi_id.cf_role='profile_id'
             if self.pandataset.topotype=='time series':
@@ -311,17 +407,116 @@ class PanNetCDFExporter(PanExporter):
             sdn_cdi_id[:]=stringtochar(np.array(cdi_ids,'S'+str(MaxStrLen['cdi_id'])))
             
             self.setSDNVariablesAndValues(['INSTANCE',maxtype])
-            self.file = self.netcdf.close()
+            self.file = self.closeNetCDF()
 
             self.logging.append({'SUCCESS':'NetCDF creation successfully finished'})
         except Exception as e:                       
-            if self.netcdf is not None:
-                self.netcdf.close()
+            self.discardNetCDF()
             self.logging.append({'ERROR':'NetCDF creation failed'+str(e)})
             self.PrintException()
 
     
         
+    def setCFAttributes(self, ncVar, p):
+        if p.synonym.get('CF') and p.synonym['CF'].get('name'):
+            ncVar.standard_name=p.synonym['CF'].get('name')
+            if isinstance(p.synonym['CF'].get('unit'), str):
+                ncVar.units=p.synonym['CF']['unit']
+        ncVar.long_name=p.name
+        if not hasattr(ncVar, 'units'):
+            ncVar.units=p.unit if p.unit is not None else '1'
+
+    def createRaggedNetCDF(self):
+        """Create a CF discrete sampling geometry NetCDF file using the contiguous ragged array representation.
+
+        The observations of all events are stored one after another along the 'obs' dimension,
+        the variable rowSize holds the number of observations of each event (INSTANCE).
+        Unlike the SeaDataNet style, no event is padded to the length of the longest one.
+        """
+        self.logging.append({'INFO':'Trying to create a CF contiguous ragged array NetCDF file'})
+        self.netcdf = None
+        self.layout = PanInstanceLayout(self.pandataset.data)
+        data = self.pandataset.data
+        try:
+            self.netcdf = self.openNetCDF(len(data))
+            self.setMainVariables()
+            self.netcdf.Conventions='CF-1.8'
+            if self.pandataset.topotype=='time series':
+                featureType, instanceRole = 'timeSeries', 'timeseries_id'
+            else:
+                featureType, instanceRole = 'profile', 'profile_id'
+            self.netcdf.featureType=featureType
+            #labels are stored as UTF-8 bytes, the string dimension is their longest byte length
+            labels = [str(label).encode('utf-8') for label in self.layout.instances]
+            maxStrLen = max([len(label) for label in labels] + [1])
+            self.netcdf.createDimension('INSTANCE', len(labels))
+            self.netcdf.createDimension('obs', int(self.layout.counts.sum()))
+            self.netcdf.createDimension('STRING'+str(maxStrLen), maxStrLen)
+
+            events=self.createVariable('Event', 'S1', ('INSTANCE', 'STRING'+str(maxStrLen)))
+            events.long_name='Event label'
+            events.cf_role=instanceRole
+            #stringtochar would encode the labels as ASCII again, the bytes are split into characters directly
+            events[:]=np.array(labels, 'S'+str(maxStrLen)).view('S1').reshape(len(labels), maxStrLen)
+            rowSize=self.createVariable('rowSize', 'i4', ('INSTANCE',))
+            rowSize.long_name='number of observations for this '+featureType
+            rowSize.sample_dimension='obs'
+            rowSize[:]=self.layout.counts
+
+            coordinates = []
+            for ncvarName, axis, units in [('Latitude','Y','degrees_north'), ('Longitude','X','degrees_east')]:
+                if ncvarName in data.columns:
+                    ncVar=self.createVariable(ncvarName, 'f8', ('INSTANCE',))
+                    ncVar.standard_name=ncvarName.lower()
+                    ncVar.long_name=ncvarName
+                    ncVar.units=units
+                    ncVar.axis=axis
+                    ncVar[:]=np.ma.masked_invalid(self.layout.first(data[ncvarName].to_numpy(dtype=float)))
+                    coordinates.append(ncvarName)
+            if 'Date_Time' in data.columns:
+                timeDim = 'obs' if featureType=='timeSeries' else 'INSTANCE'
+                ncVar=self.createVariable('Date_Time', 'f8', (timeDim,))
+                ncVar.standard_name='time'
+                ncVar.long_name='time'
+                ncVar.units=self.time_units
+                ncVar.calendar='standard'
+                ncVar.axis='T'
+                times=self.layout.contiguous(self.dateValues(data['Date_Time']))
+                if timeDim=='INSTANCE':
+                    times=times[self.layout.starts]
+                ncVar[:]=np.ma.masked_invalid(times)
+                coordinates.append('Date_Time')
+            if 'Depth_water' in data.columns:
+                ncVar=self.createVariable('Depth_water', 'f4', ('obs',))
+                ncVar.standard_name='depth'
+                ncVar.long_name='Depth water'
+                ncVar.units='m'
+                ncVar.positive='down'
+                ncVar.axis='Z'
+                ncVar[:]=np.ma.masked_invalid(self.layout.contiguous(data['Depth_water'].to_numpy(dtype=float)))
+                coordinates.append('Depth_water')
+
+            for ncvarName, p in self.pandataset.params.items():
+                if ncvarName in coordinates or ncvarName=='Event' or ncvarName not in data.columns or p.type!='numeric':
+                    continue
+                try:
+                    values=data[ncvarName].to_numpy(dtype=float)
+                    if np.isnan(values).all():
+                        continue
+                    ncVar=self.createVariable(ncvarName, 'f4', ('obs',))
+                    self.setCFAttributes(ncVar, p)
+                    ncVar.coordinates=' '.join(coordinates)
+                    ncVar[:]=np.ma.masked_invalid(self.layout.contiguous(values))
+                except Exception as e:
+                    self.logging.append({'ERROR': 'NetCDF Variable creation failed for Param: ' + ncvarName + ', ERROR: ' + str(e)})
+                    self.PrintException()
+            self.file = self.closeNetCDF()
+            self.logging.append({'SUCCESS':'NetCDF creation successfully finished'})
+        except Exception as e:
+            self.discardNetCDF()
+            self.logging.append({'ERROR':'NetCDF creation failed'+str(e)})
+            self.PrintException()
+
     def createPANNetCDF(self):
         dim=dict()
         nc = None
@@ -330,6 +525,8 @@ class PanNetCDFExporter(PanExporter):
             self.cleanParameterNames()
             self.setMainVariables(nc)
             ##### PANGAEA STYLE ######
+            #checking topotype once for all events
+            pangeotype = self.pandataset.getGeometry()
             eventGroup= self.pandataset.data.groupby('Event')
             for eventName, eventFrame in eventGroup:
                 self.logging.append({'INFO':'Trying to create NetCDF Dimensions and Variables for Event: '+str(eventName)})
@@ -353,9 +550,6 @@ class PanNetCDFExporter(PanExporter):
                 if depNo >= 1:
                     depLen = len(eventFrame[depthColumn])
                 #datNo=len(eventFrame['Date_Time'].unique())
-                #checking topotype
-                #replace with panDataSet getGeometry
-                pangeotype = self.pandataset.getGeometry()
                 if pangeotype in ['trajectoryProfile','timeSeries','profile']:
                     try:                               
                         ng=nc.createGroup(eventName.replace('/','-'))                        
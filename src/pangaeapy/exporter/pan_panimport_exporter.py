@@ -1,10 +1,36 @@
+from io import StringIO
+import logging
+
 from pangaeapy.exporter.pan_exporter import PanExporter
 import os
 import json
+
+logger = logging.getLogger(__name__)
+
+
 class PanPanImportExporter(PanExporter):
+    """Writes a dataset in the PANGAEA import format: a JSON metaheader enclosed in /* */ followed by the
+    tab-separated data, whose first row holds the parameter ids. Event parameters are not exported.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(PanPanImportExporter, self).__init__(*args, **kwargs)
+        self.ignorecolumns = []
+        self.datacolumns = []
+        # number of data rows written at once
+        self.chunk_rows = 100000
+        self.date_format = '%Y-%m-%dT%H:%M:%S'
+
+    def get_file_path(self):
+        return os.path.join(self.filelocation,str('panimport_pangaea_'+str(self.pandataset.id)+'.txt'))
 
     def create_data_string(self):
-        return self.pandataset.data.loc[:, ~self.pandataset.data.columns.isin(self.ignorecolumns)].head()
+        """Return the tab-separated data including the header row of parameter ids."""
+        if not self.datacolumns:
+            self.create_json_header()
+        buffer = StringIO()
+        self.write_data(buffer)
+        return buffer.getvalue()
 
     def create_json_header(self):
         panmetadict = {}
@@ -15,7 +41,8 @@ class PanPanImportExporter(PanExporter):
         events = []
         eventmethodid = None
         for event in self.pandataset.events:
-            events.append({'id':int(event.id),'device':int(event.deviceid)})
+            events.append({'id':int(event.id) if event.id is not None else None,
+                           'device':int(event.deviceid) if event.deviceid is not None else None})
         if len(events) == 1:
             panmetadict["EventID"] = events[0]['id']
             eventmethodid = events[0]['device']
@@ -31,12 +58,13 @@ class PanPanImportExporter(PanExporter):
                 pass
             panmetadict["Authors"].append({'ID':author.id, 'InstitutionID':inst1, 'Institution2ID':inst2})
         self.ignorecolumns = []
+        self.datacolumns = []
         for paramk, param in self.pandataset.params.items():
             if param.source not in ['event'] or not param.id:
                 if not param.id and param.name=='Event label':
                     param.id = 500000
                 paramdict = {'ID':param.id}
-                print('Param ID', param.id)
+                logger.debug('Param ID %s', param.id)
 
                 if param.format:
                     paramdict['Format'] = param.format
@@ -51,12 +79,84 @@ class PanPanImportExporter(PanExporter):
                 if param.PI:
                     paramdict['PI_ID'] = param.PI.get('id')
                 panmetadict["Parameter"].append(paramdict)
+                if paramk in self.pandataset.data.columns:
+                    self.datacolumns.append(paramk)
             else:
                 self.ignorecolumns.append(paramk)
-        print(self.ignorecolumns)
-        return json.dumps(panmetadict)
+        logger.debug('Columns not exported: %s', self.ignorecolumns)
+        return json.dumps(panmetadict, indent=2)
+
+    def write_data(self, textfile):
+        """Write the header row of parameter ids and the data rows in parts of chunk_rows rows.
 
-    def create(self):
-        panimportstr = self.create_json_header()
-        print(self.create_data_string())
-        return panimportstr
+        Only the exported columns of each part are formatted, the data frame is not copied.
+        """
+        ids = [str(self.pandataset.params[column].id) for column in self.datacolumns]
+        textfile.write('\t'.join(ids) + '\n')
+        data = self.pandataset.data
+        for first in range(0, len(data), self.chunk_rows):
+            data.iloc[first:first + self.chunk_rows].to_csv(textfile, columns=self.datacolumns, sep='\t', header=False,
+                                                            index=False, lineterminator='\n',
+                                                            date_format=self.date_format)
+
+    def write(self, target):
+        """Write the metaheader and all data to a path or a text file object.
+
+        Parameters
+        ----------
+        target : str or file-like
+            The destination
+        """
+        header = self.create_json_header()
+        if isinstance(target, (str, os.PathLike)):
+            with open(target, 'w', encoding='utf-8', newline='') as textfile:
+                textfile.write('/*\n' + header + '\n*/\n')
+                self.write_data(textfile)
+        else:
+            target.write('/*\n' + header + '\n*/\n')
+            self.write_data(target)
+
+    def create(self, ondisk=False):
+        """Create the PanImport file.
+
+        Parameters
+        ----------
+        ondisk : bool
+            Write the file into filelocation instead of returning its content, for large datasets
+
+        Returns
+        -------
+            The content of the file, the path of the file written to disk or False on failure
+        """
+        ret = False
+        try:
+            if ondisk:
+                path = self.get_file_path()
+                self.write(path + '.part')
+                os.replace(path + '.part', path)
+                self.file = path
+            else:
+                buffer = StringIO()
+                self.write(buffer)
+                self.file = buffer.getvalue()
+            ret = self.file
+        except Exception as e:
+            self.logging.append({'ERROR': 'PanImport creation failed: '+str(e)})
+            if ondisk and os.path.exists(self.get_file_path() + '.part'):
+                os.remove(self.get_file_path() + '.part')
+        return ret
+
+    def save(self):
+        if isinstance(self.file, str) and os.path.exists(self.file):
+            #written to disk by create()
+            return True
+        if isinstance(self.file, str):
+            try:
+                with open(self.get_file_path(), 'w', encoding='utf-8', newline='') as f:
+                    f.write(self.file)
+                return True
+            except Exception as e:
+                self.logging.append({'ERROR': 'Could not save PanImport file: '+str(e)})
+        else:
+            self.logging.append({'ERROR':'Could not save, PanImport file was not created'})
+        return False
@@ -0,0 +1,155 @@
+from io import BytesIO
+import json
+import os
+
+from pangaeapy.exporter.pan_exporter import PanExporter
+from pangaeapy.mappings.pan_mapping_table import get_parameter_mapping
+
+
+class PanParquetExporter(PanExporter):
+    """Exports the data of a dataset as Apache Parquet file (requires pyarrow).
+
+    Numeric and datetime columns keep their types, string columns are dictionary encoded. The
+    parameters (id, name, unit, terms, ...) are stored as field metadata and the dataset and its
+    events as schema metadata under the key 'pangaea', so the file is self-describing.
+    """
+    def __init__(self, *args, **kwargs):
+        super(PanParquetExporter, self).__init__(*args, **kwargs)
+        # approximate uncompressed size of a row group, large enough for efficient scans
+        self.row_group_bytes = 128 * 1024 * 1024
+        self.compression = 'zstd'
+        self.qc_suffix = '_QC'
+
+    def get_file_path(self):
+        return os.path.join(self.filelocation,str('parquet_pangaea_'+str(self.pandataset.id)+'.parquet'))
+
+    def get_frame(self, qc=False):
+        """Return the data to export, with one QC flag column per flagged parameter if qc is True."""
+        data = self.pandataset.data
+        if qc and not self.pandataset.qcdata.empty:
+            qcdata = self.pandataset.qcdata.reindex(data.index).fillna(0).astype('int8')
+            data = data.join(qcdata.add_suffix(self.qc_suffix))
+        return data
+
+    def get_field_metadata(self, column):
+        """Return the metadata of the parameter of a column, or None if the column is no parameter."""
+        param = self.pandataset.params.get(column)
+        if param is None:
+            return None
+        metadata = {'pangaea:id': param.id, 'pangaea:name': param.name, 'pangaea:short_name': param.shortName,
+                    'pangaea:type': param.type, 'pangaea:unit': param.unit, 'pangaea:comment': param.comment,
+                    'pangaea:dataseries': param.dataseries, 'pangaea:colno': param.colno}
+        if param.terms:
+            metadata['pangaea:terms'] = json.dumps(param.terms, default=str)
+        if param.PI:
+            metadata['pangaea:pi'] = json.dumps(param.PI, default=str)
+        mapping = get_parameter_mapping(param.id)
+        if mapping is not None:
+            metadata['cf:standard_name'] = mapping.cf_name
+            metadata['sdn:p01'] = mapping.sdn_id
+        return {k: str(v) for k, v in metadata.items() if v is not None}
+
+    def get_dataset_metadata(self):
+        """Return the dataset and event metadata stored in the schema."""
+        events = []
+        for event in self.pandataset.events:
+            events.append({'label': event.label, 'id': event.id, 'latitude': event.latitude, 'longitude': event.longitude,
+                           'latitude2': event.latitude2, 'longitude2': event.longitude2, 'elevation': event.elevation,
+                           'datetime': event.datetime, 'datetime2': event.datetime2, 'location': event.location,
+                           'device': event.device, 'basis': getattr(event.basis, 'name', None),
+                           'campaign': getattr(event.campaign, 'name', None)})
+        licence = self.pandataset.licence
+        return {'id': self.pandataset.id, 'doi': self.pandataset.doi, 'title': self.pandataset.title,
+                'citation': self.pandataset.citation, 'date': self.pandataset.date,
+                'licence': {'label': licence.label, 'name': licence.name, 'URI': licence.URI} if licence else None,
+                'events': events}
+
+    def get_arrow_schema(self, frame):
+        """Return the Arrow schema of the frame with dictionary encoded strings and PANGAEA metadata."""
+        import pyarrow as pa
+        schema = pa.Schema.from_pandas(frame, preserve_index=False)
+        fields = []
+        for field in schema:
+            if pa.types.is_string(field.type) or pa.types.is_large_string(field.type):
+                field = field.with_type(pa.dictionary(pa.int32(), pa.string()))
+            metadata = self.get_field_metadata(field.name)
+            if metadata:
+                field = field.with_metadata(metadata)
+            fields.append(field)
+        metadata = dict(schema.metadata or {})
+        metadata[b'pangaea'] = json.dumps(self.get_dataset_metadata(), default=str).encode()
+        return pa.schema(fields, metadata=metadata)
+
+    def get_row_group_rows(self, frame):
+        """Return the number of rows per row group, estimated from row_group_bytes and the width of a row."""
+        return max(1024, self.row_group_bytes // max(1, 8 * len(frame.columns)))
+
+    def write(self, where, qc=False):
+        """Write the data to a path or binary file object, one row group at a time.
+
+        Parameters
+        ----------
+        where : str or file-like
+            The destination
+        qc : bool
+            Add the QC flags (qcdata) as columns with the suffix qc_suffix
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        frame = self.get_frame(qc)
+        schema = self.get_arrow_schema(frame)
+        rows = self.get_row_group_rows(frame)
+        with pq.ParquetWriter(where, schema, compression=self.compression) as writer:
+            for first in range(0, len(frame), rows):
+                writer.write_table(pa.Table.from_pandas(frame.iloc[first:first + rows], schema=schema,
+                                                        preserve_index=False))
+
+    def create(self, qc=False, ondisk=True):
+        """Create the Parquet file.
+
+        Parameters
+        ----------
+        qc : bool
+            Add the QC flags (qcdata) as columns
+        ondisk : bool
+            Write the file into filelocation, otherwise it is created in memory
+
+        Returns
+        -------
+            The path of the file, a BytesIO holding it or False on failure
+        """
+        ret = False
+        target = self.get_file_path() + '.part' if ondisk else BytesIO()
+        try:
+            self.write(target, qc)
+            if ondisk:
+                os.replace(target, self.get_file_path())
+                self.file = self.get_file_path()
+            else:
+                target.seek(0)
+                self.file = target
+            ret = self.file
+        except ImportError as e:
+            self.logging.append({'ERROR': 'Parquet export requires pyarrow: '+str(e)})
+        except Exception as e:
+            self.logging.append({'ERROR': 'Parquet file creation failed: '+str(e)})
+        if not ret and ondisk and os.path.exists(target):
+            os.remove(target)
+        return ret
+
+    def save(self):
+        if isinstance(self.file, str) and os.path.exists(self.file):
+            #written to disk by create()
+            self.logging.append({'SUCCESS': 'Saved Parquet file at: ' + self.file})
+            return True
+        if isinstance(self.file, BytesIO):
+            try:
+                with open(self.get_file_path(),'wb') as f:
+                    f.write(self.file.getbuffer())
+                self.logging.append({'SUCCESS': 'Saved Parquet file at: ' + self.get_file_path()})
+                return True
+            except Exception as e:
+                self.logging.append({'ERROR': 'Could not save Parquet file: '+str(e)})
+        else:
+            self.logging.append({'ERROR':'Could not save, Parquet file was not created'})
+        return False
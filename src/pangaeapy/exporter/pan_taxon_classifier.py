@@ -0,0 +1,137 @@
+from functools import lru_cache
+import re
+
+# phyla list from WoRMS
+PHYLA = frozenset([
+    'Acanthocephala', 'Acidobacteria', 'Acritarcha', 'Actinobacteria', 'Amoebozoa', 'Annelida',
+    'Anthocerotophyta', 'Apusomonada', 'Apusozoa', 'Aquificae', 'Arthropoda', 'Aschelminthes', 'Ascomycota',
+    'Bacillariophyta', 'Bacteria incertae sedis', 'Bacteroidetes', 'Basidiomycota', 'Bigyra', 'Brachiopoda',
+    'Bryophyta', 'Bryozoa', 'Caldiserica', 'Cephalorhyncha', 'Cercozoa', 'Chaetognatha', 'Charophyta',
+    'Chlamydiae', 'Chlorarachniophyta', 'Chlorobi', 'Chloroflexi', 'Chlorophyta', 'Chloroplastida',
+    'Choanoflagellata', 'Choanozoa', 'Chordata', 'Chromeridophyta', 'Chrysomonada', 'Chrysophyta',
+    'Chytridiomycota', 'Ciliophora', 'Cnidaria', 'Coelenterata', 'Craspediophyta', 'Craspedophyta',
+    'Crenarchaeota', 'Cryptophyta', 'Ctenophora', 'Cyanobacteria', 'Cycliophora', 'Deferribacteres',
+    'Deinococcus-Thermus', 'Deuteromycota', 'Dicyemida', 'Dinomastigota', 'Dinophyta', 'Discomitochondria',
+    'Echinodermata', 'Ectoprocta', 'Elusimicrobia', 'Entoprocta', 'Euglenophyta', 'Euglenozoa', 'Eumycota',
+    'Euryarchaeota', 'Fibrobacteres', 'Firmicutes', 'Flagellates', 'Foraminifera', 'Fungi Imperfecti',
+    'Fusobacteria', 'Gastrotricha', 'Gemmatimonadetes', 'Glaucophyta', 'Glomeromycota', 'Gnathifera',
+    'Gnathostomulida', 'Granuloreticulosa', 'Haplosporidia', 'Haptomonada', 'Haptophyta', 'Heliozoa',
+    'Hemichordata', 'Hemimastigophora', 'Heterokontophyta', 'Kinorhyncha', 'Korarchaeota', 'Labyrinthulata',
+    'Lentisphaerae', 'Lophophorata', 'Loricifera', 'Loukozoa', 'Marchantiophyta', 'Mesozoa', 'Metamonada',
+    'Microspora', 'Microsporidia', 'Mollusca', 'Myxospora', 'Myzozoa', 'Nanoarchaeota', 'Nemata', 'Nematoda',
+    'Nematomorpha', 'Nemertea', 'Nemertina', 'Nemertini', 'Nitrospirae', 'Ochrophyta', 'Oomycota',
+    'Orthonectida', 'Pentastomida', 'Percolozoa', 'Phaeophycota', 'Phaeophyta', 'Phoronida', 'Picozoa',
+    'Placozoa', 'Planctomycetes', 'Plantae incertae sedis', 'Platyhelminthes', 'Pogonophora', 'Porifera',
+    'Prasinodermatophyta', 'Prasinophyta', 'Priapulida', 'Proteobacteria', 'Prymnesiophyta', 'Pseudofungi',
+    'Pteridophyta', 'Radiozoa', 'Rhizopoda', 'Rhodelphidia', 'Rhodophycota', 'Rhodophyta', 'Rhynchocoela',
+    'Rotatoria', 'Rotifera', 'Sarcomastigophora', 'Sipunculida', 'Solenopora', 'Spirochaetes', 'Sulcozoa',
+    'Synergistetes', 'Tardigrada', 'Tenericutes', 'Thaumarchaeota', 'Thermodesulfobacteria', 'Thermotogae',
+    'Tracheophyta', 'Verrucomicrobia', 'Xanthophyta', 'Xenacoelomorpha', 'Zygomycota'
+])
+
+KINGDOMS = frozenset(['Animalia', 'Archaea', 'Bacteria', 'Chromista', 'Fungi', 'Plantae', 'Protozoa', 'Viruses'])
+#http://vocab.nerc.ac.uk/collection/S11/current/
+LIFESTAGES = ('adult', 'juvenile', 'larvae', 'eggs', 'nauplii', 'copepodites')
+#http://vocab.nerc.ac.uk/collection/S10/current/
+SEX = ('male', 'female', 'hermaphrodite')
+SYNONYMS = {'Coccolithophoridae': 'Coccolithophorida'}
+
+# counts (#) or percentages (%), optionally per volume, mass or area and per time e.g. #/m**3, %/10 cm**2/a
+UNIT_REGEX = re.compile(r'^([#%])(?:/((?:[0-9]+\s)?(?:[kdcm]?m{1,2}\*{2}[23]|m?l|k?g)))?(?:/(d|m|y|a|ka|day|week|month|year){1})?$')
+NAME_SEPARATOR = re.compile(r',\s?')
+
+
+class PanTaxonClassifier:
+    """Recognises taxon abundance parameters by their name, unit and biological classification.
+
+    All lookups are memoised, so that one classifier can be shared by the exports of many datasets,
+    which mostly use the same units, taxa and classifications.
+
+    Parameters
+    ----------
+    synonyms : dict
+        Taxon names to replace by their accepted name
+    cache_size : int
+        Maximum number of entries of each lookup cache
+    """
+    def __init__(self, synonyms=None, cache_size=65536):
+        self.synonyms = dict(SYNONYMS if synonyms is None else synonyms)
+        self.lifestages = LIFESTAGES
+        self.sex = SEX
+        self.attributes = frozenset(LIFESTAGES + SEX + ('total',))
+        self.check_unit = lru_cache(maxsize=cache_size)(self._check_unit)
+        self.split_name = lru_cache(maxsize=cache_size)(self._split_name)
+        self.classify = lru_cache(maxsize=cache_size)(self._classify)
+
+    @staticmethod
+    def _check_unit(unitexpr):
+        """Return (taxon related, dimension) of a unit, e.g. (True, 'individuals per volume') for '#/m**3'.
+
+        A missing unit denotes a relative abundance.
+        """
+        if not unitexpr:
+            return True, 'relative abundance'
+        if not isinstance(unitexpr, str):
+            return False, ''
+        umatch = UNIT_REGEX.search(unitexpr)
+        if not umatch:
+            return False, ''
+        dimension = 'individuals' if umatch[1] == '#' else 'percentage'
+        if umatch[2] is not None:
+            if 'l' in umatch[2] or '**3' in umatch[2]:
+                dimension += ' per volume'
+            elif 'g' in umatch[2]:
+                dimension += ' per mass'
+            else:
+                dimension += ' per area'
+        if umatch[3] is not None:
+            if umatch[2] is not None:
+                dimension += ' and time'
+            else:
+                dimension += ' per time'
+        return True, dimension
+
+    def _split_name(self, name):
+        """Return (taxon name, name to compare with the term, attribute) of a parameter name.
+
+        A life stage or sex appended to the name (e.g. 'Calanus finmarchicus, adult') is split off,
+        synonyms are replaced and ' sp.' / ' spp.' is removed from the name compared with the term.
+        """
+        name_parts = NAME_SEPARATOR.split(name)
+        taxon_candidate = str(name)
+        taxon_attribute = None
+        if len(name_parts) == 2:
+            if name_parts[1] in self.attributes:
+                taxon_candidate = name_parts[0]
+                taxon_attribute = name_parts[1]
+        taxon_candidate = self.synonyms.get(taxon_candidate, taxon_candidate)
+        test_taxon = taxon_candidate
+        if taxon_candidate.endswith(' sp.'):
+            test_taxon = taxon_candidate.replace(' sp.', '').strip()
+        if taxon_candidate.endswith(' spp.'):
+            test_taxon = taxon_candidate.replace(' spp.', '').strip()
+        return taxon_candidate, test_taxon.lower(), taxon_attribute
+
+    @staticmethod
+    def _classify(classification):
+        """Return (kingdom, phylum) of a biological classification or None if it names no kingdom.
+
+        Parameters
+        ----------
+        classification : tuple
+            The classification of a term, from the root to the taxon
+        """
+        kingdoms = [taxon for taxon in classification if taxon in KINGDOMS]
+        if not kingdoms:
+            return None
+        phylum = ''
+        for taxon in classification:
+            if taxon in PHYLA:
+                phylum = taxon
+        return kingdoms[0], phylum
+
+
+@lru_cache(maxsize=None)
+def get_taxon_classifier():
+    """Return the classifier shared by all DwC-A exports of this process."""
+    return PanTaxonClassifier()
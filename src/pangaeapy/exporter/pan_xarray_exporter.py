@@ -0,0 +1,130 @@
+import numpy as np
+import pandas as pd
+
+from pangaeapy.exporter.pan_exporter import PanExporter
+from pangaeapy.exporter.pan_layout import PanInstanceLayout
+
+# geometries (see PanDataSet.getGeometry) of several profiles or time series, which are arranged as
+# Event x MAXZ/MAXT/obs arrays, and the name of their second dimension
+STACKED_GEOMETRIES = {'timeSeriesStack': 'MAXT', 'timeSeriesProfile': 'obs', 'trajectoryProfile': 'MAXZ'}
+
+# geometries of CF discrete sampling geometries, used as featureType
+CF_FEATURE_TYPES = ['point', 'timeSeries', 'trajectory', 'profile', 'timeSeriesProfile', 'trajectoryProfile']
+
+
+class PanXarrayExporter(PanExporter):
+    """Converts the data of a dataset into an xarray Dataset (requires xarray).
+
+    The dimensions follow the geometry of the data (see PanDataSet.getGeometry). The rows of a single
+    time series or profile span the time or depth dimension, the rows of points and trajectories an 'obs'
+    dimension. In these cases the variables wrap the arrays of the data frame without copying them.
+    Several profiles or time series are arranged as Event x MAXZ/MAXT arrays padded like in the
+    SeaDataNet NetCDF export, which needs a copy. Variable names are the column names with '/' and
+    spaces replaced by '_', attributes follow CF, using the standard names of the parameter mapping table.
+    """
+    def __init__(self, *args, **kwargs):
+        super(PanXarrayExporter, self).__init__(*args, **kwargs)
+        self.layout = None
+        self.geometry = None
+
+    def get_geometry(self):
+        """Return the geometry of the data or None if it cannot be detected (e.g. without Latitude and Longitude)."""
+        data = self.pandataset.data
+        if data.empty or 'Latitude' not in data.columns or 'Longitude' not in data.columns:
+            return None
+        return self.pandataset.getGeometry()
+
+    def get_dims(self):
+        """Return the dimensions of the variables, the first one spanning the events if the rows are stacked."""
+        data = self.pandataset.data
+        t, z = self.pandataset.get_coordinate_columns()
+        stacked = 'Event' in data.columns and data['Event'].nunique() > 1
+        if self.geometry in STACKED_GEOMETRIES and stacked:
+            return ('Event', STACKED_GEOMETRIES[self.geometry])
+        if self.geometry in ['timeSeries', 'profile']:
+            maxtype = 'MAXT' if self.geometry == 'timeSeries' else 'MAXZ'
+            if stacked:
+                return ('Event', maxtype)
+            column = t if self.geometry == 'timeSeries' else z
+            if column is not None:
+                return (self.get_array_name(column),)
+        return ('obs',)
+
+    def is_instance_constant(self, values):
+        """Check if the values do not change within an event, e.g. the position of a profile."""
+        rows = pd.DataFrame({'instance': self.layout.codes, 'value': np.asarray(values)[self.layout.valid]})
+        return len(rows.drop_duplicates()) == self.layout.shape[0]
+
+    def get_variable(self, column, dims):
+        """Return the dimensions and values of the variable of a column."""
+        values = self.pandataset.data[column].to_numpy()
+        if len(dims) == 1:
+            # a view of the column, no copy for numeric and datetime columns
+            return dims, values
+        if column in ['Latitude', 'Longitude'] or column in self.pandataset.get_coordinate_columns():
+            if self.is_instance_constant(values):
+                return dims[:1], self.layout.first(values)
+        if values.dtype.kind in 'fc':
+            return dims, self.layout.pad(values)
+        if values.dtype.kind in 'iub':
+            return dims, self.layout.pad(values, dtype='f8')
+        if values.dtype.kind == 'M':
+            return dims, self.layout.pad(values, fill_value=np.datetime64('NaT'))
+        return dims, self.layout.pad(values.astype(object), fill_value=None)
+
+    def get_attributes(self, column):
+        """Return the attributes of the variable of a column."""
+        p = self.pandataset.params.get(column)
+        if p is None:
+            return {}
+        attrs = self.get_cf_attributes(p)
+        if p.type == 'datetime' or self.pandataset.data[column].dtype.kind == 'M':
+            # the encoding of datetimes is chosen by xarray
+            attrs.pop('units', None)
+        if p.id is not None:
+            attrs['pangaea_id'] = p.id
+        return attrs
+
+    def create(self):
+        """Create the xarray Dataset.
+
+        Returns
+        -------
+            xarray.Dataset or False on failure
+        """
+        ret = False
+        try:
+            import xarray as xr
+            data = self.pandataset.data
+            self.geometry = self.get_geometry()
+            dims = self.get_dims()
+            if len(dims) == 2:
+                self.layout = PanInstanceLayout(data)
+            t, z = self.pandataset.get_coordinate_columns()
+            coordinates = [column for column in ['Event', 'Latitude', 'Longitude', t, z] if column in data.columns]
+            variables = {}
+            coords = {}
+            for column in data.columns:
+                if column == 'Event' and len(dims) == 2:
+                    coords['Event'] = ('Event', np.array([str(label) for label in self.layout.instances], dtype=object),
+                                       self.get_attributes(column))
+                    continue
+                name = self.get_array_name(str(column))
+                variable = self.get_variable(column, dims) + (self.get_attributes(column),)
+                if column in coordinates:
+                    coords[name] = variable
+                else:
+                    variables[name] = variable
+            attrs = {'title': self.pandataset.title, 'id': self.pandataset.doi, 'Conventions': 'CF-1.8'}
+            if self.geometry in CF_FEATURE_TYPES:
+                attrs['featureType'] = self.geometry
+            if self.geometry is not None:
+                attrs['geometry'] = self.geometry
+            self.file = xr.Dataset(variables, coords=coords, attrs={k: v for k, v in attrs.items() if v is not None})
+            ret = self.file
+        except ImportError as e:
+            self.logging.append({'ERROR': 'xarray conversion requires xarray: ' + str(e)})
+        except Exception as e:
+            self.logging.append({'ERROR': 'xarray conversion failed: ' + str(e)})
+        return ret
+
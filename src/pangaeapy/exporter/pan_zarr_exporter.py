@@ -0,0 +1,166 @@
+from concurrent.futures import ThreadPoolExecutor
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from pangaeapy.exporter.pan_exporter import PanExporter
+from pangaeapy.exporter.pan_layout import PanInstanceLayout
+
+
+class PanZarrExporter(PanExporter):
+    """Exports profile and time series datasets as chunked, compressed Zarr store (requires zarr >= 3).
+
+    The arrays follow the SeaDataNet NetCDF layout: one row per event (INSTANCE) and the observations
+    of each event along MAXZ (profiles) or MAXT (time series), padded with NaN. Arrays are chunked
+    along INSTANCE with whole events per chunk and the chunks are written in parallel. Attributes
+    follow CF, using the standard names of the parameter mapping table.
+    """
+    def __init__(self, *args, **kwargs):
+        super(PanZarrExporter, self).__init__(*args, **kwargs)
+        self.time_units = 'days since 1970-01-01 00:00:00'
+        #number of values per chunk of an array
+        self.chunk_elements = 2 ** 18
+        self.complevel = 4
+        #number of threads writing chunks
+        self.workers = min(8, os.cpu_count() or 1)
+        self.layout = None
+
+    def get_file_path(self):
+        return os.path.join(self.filelocation,str('zarr_pangaea_'+str(self.pandataset.id)+'.zarr'))
+
+    def date_values(self, dates):
+        """Convert a datetime column to days since 1970, missing dates become NaN."""
+        return ((pd.to_datetime(dates) - pd.Timestamp('1970-01-01')) / pd.Timedelta(days=1)).to_numpy(dtype='f8')
+
+    def write_array(self, group, name, values, dims, attrs, executor):
+        """Create an array of the INSTANCE x MAXZ/MAXT layout (or of INSTANCE only) and write it chunk by chunk.
+
+        Parameters
+        ----------
+        group : zarr.Group
+            The store
+        name : str
+            Name of the array
+        values : np.ndarray
+            One value per row of the data, or per instance if dims is ('INSTANCE',)
+        dims : tuple
+            The dimension names
+        attrs : dict
+            The attributes of the array
+        executor : ThreadPoolExecutor
+            Writes the chunks in parallel
+        """
+        import zarr
+        if len(dims) == 1:
+            shape = (self.layout.shape[0],)
+            chunks = (max(1, min(shape[0], self.chunk_elements)),)
+        else:
+            shape = self.layout.shape
+            chunks = (max(1, min(shape[0], self.chunk_elements // max(1, shape[1]))), max(1, shape[1]))
+        fill_value = '' if values.dtype.kind in 'OUS' else np.nan
+        dtype = str if fill_value == '' else values.dtype
+        array = group.create_array(name, shape=shape, chunks=chunks, dtype=dtype, fill_value=fill_value,
+                                   dimension_names=dims, attributes=attrs,
+                                   compressors=zarr.codecs.BloscCodec(cname='zstd', clevel=self.complevel,
+                                                                      shuffle='shuffle'))
+        def write_block(start):
+            stop = min(start + chunks[0], shape[0])
+            if len(dims) == 1:
+                array[start:stop] = values[start:stop]
+            else:
+                array[start:stop] = self.layout.pad_block(values, start, stop, fill_value=fill_value)
+        list(executor.map(write_block, range(0, shape[0], chunks[0])))
+
+    def write(self, path):
+        import zarr
+        data = self.pandataset.data
+        self.layout = PanInstanceLayout(data)
+        if self.pandataset.topotype == 'time series':
+            featureType, maxtype, instanceRole = 'timeSeries', 'MAXT', 'timeseries_id'
+        else:
+            featureType, maxtype, instanceRole = 'profile', 'MAXZ', 'profile_id'
+        dims = ('INSTANCE', maxtype)
+        group = zarr.open_group(path, mode='w')
+        group.attrs.update({'title': self.pandataset.title, 'id': self.pandataset.doi, 'Conventions': 'CF-1.8',
+                            'featureType': featureType})
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            labels = np.array([str(label) for label in self.layout.instances], dtype=object)
+            self.write_array(group, 'Event', labels, ('INSTANCE',), {'long_name': 'Event label', 'cf_role': instanceRole},
+                             executor)
+            coordinates = ['Event']
+            for column, axis, units in [('Latitude', 'Y', 'degrees_north'), ('Longitude', 'X', 'degrees_east')]:
+                if column in data.columns:
+                    values = self.layout.first(data[column].to_numpy(dtype='f8'))
+                    self.write_array(group, column, values, ('INSTANCE',),
+                                     {'standard_name': column.lower(), 'long_name': column, 'units': units, 'axis': axis},
+                                     executor)
+                    coordinates.append(column)
+            if 'Date/Time' in data.columns:
+                attrs = {'standard_name': 'time', 'long_name': 'time', 'units': self.time_units, 'calendar': 'standard',
+                         'axis': 'T'}
+                values = self.date_values(data['Date/Time'])
+                if featureType == 'profile':
+                    self.write_array(group, 'Date_Time', self.layout.first(values), ('INSTANCE',), attrs, executor)
+                else:
+                    self.write_array(group, 'Date_Time', values, dims, attrs, executor)
+                coordinates.append('Date_Time')
+            if 'Depth water' in data.columns:
+                self.write_array(group, 'Depth_water', data['Depth water'].to_numpy(dtype='f4'), dims,
+                                 {'standard_name': 'depth', 'long_name': 'Depth water', 'units': 'm', 'positive': 'down',
+                                  'axis': 'Z'}, executor)
+                coordinates.append('Depth_water')
+            for column, p in self.pandataset.params.items():
+                if column in ['Event', 'Latitude', 'Longitude', 'Date/Time', 'Depth water'] or column not in data.columns \
+                        or p.type != 'numeric':
+                    continue
+                try:
+                    values = data[column].to_numpy(dtype='f4')
+                    if np.isnan(values).all():
+                        continue
+                    attrs = self.get_cf_attributes(p)
+                    attrs['coordinates'] = ' '.join(coordinates)
+                    self.write_array(group, self.get_array_name(column), values, dims, attrs, executor)
+                except Exception as e:
+                    self.logging.append({'ERROR': 'Zarr array creation failed for Param: ' + column + ', ERROR: ' + str(e)})
+
+    def create(self):
+        """Create the Zarr store in filelocation.
+
+        The store is written next to its final location and moved there once it is complete.
+
+        Returns
+        -------
+            The path of the store or False on failure
+        """
+        ret = False
+        if 'Event' not in self.pandataset.data.columns:
+            self.logging.append({'ERROR': 'Zarr creation failed: Event column is missing'})
+        elif self.pandataset.topotype not in ['time series', 'profile series', 'vertical profile']:
+            self.logging.append({'ERROR': 'Zarr creation failed: Invalid Topotype (has to be profile, timeseries or series of profiles) but is: '+str(self.pandataset.topotype)})
+        else:
+            path = self.get_file_path()
+            partpath = path + '.part'
+            try:
+                shutil.rmtree(partpath, ignore_errors=True)
+                self.write(partpath)
+                shutil.rmtree(path, ignore_errors=True)
+                os.replace(partpath, path)
+                self.file = path
+                ret = path
+                self.logging.append({'SUCCESS': 'Zarr store created at: ' + path})
+            except ImportError as e:
+                self.logging.append({'ERROR': 'Zarr export requires zarr: '+str(e)})
+            except Exception as e:
+                self.logging.append({'ERROR': 'Zarr creation failed: '+str(e)})
+            if not ret:
+                shutil.rmtree(partpath, ignore_errors=True)
+        return ret
+
+    def save(self):
+        if isinstance(self.file, str) and os.path.exists(self.file):
+            #written to disk by create()
+            return True
+        self.logging.append({'ERROR':'Could not save, Zarr store was not created'})
+        return False
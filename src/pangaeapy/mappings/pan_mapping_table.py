@@ -0,0 +1,68 @@
+from functools import lru_cache
+import json
+from pathlib import Path
+from types import MappingProxyType
+from typing import NamedTuple, Optional
+
+DEFAULT_MAPPING_FILE = Path(__file__).parent / "pan_mappings.json"
+
+
+class PanParameterMapping(NamedTuple):
+    """Names of a PANGAEA parameter in other vocabularies (CF, SeaDataNet, EMODnet)."""
+    id: int
+    name: Optional[str]
+    unit: Optional[str]
+    cf_name: Optional[str]
+    cf_unit: Optional[str]
+    sdn_id: Optional[str]
+    sdn_name: Optional[str]
+    sdn_uri: Optional[str]
+    sdn_unit: Optional[str]
+    sdn_unit_id: Optional[str]
+    emodnet_name: Optional[str]
+    emodnet_long_name: Optional[str]
+
+
+# columns of pan_mappings.json per field of PanParameterMapping
+FIELDS = {
+    "name": "PANGAEA Name",
+    "unit": "PANGAEA Unit",
+    "cf_name": "CF standard name",
+    "cf_unit": "CF unit",
+    "sdn_id": "SDN P01 ID",
+    "sdn_name": "SDN P01 Name",
+    "sdn_uri": "SDN P01 URI",
+    "sdn_unit": "SDN Unit Name",
+    "sdn_unit_id": "SDN Unit URN",
+    "emodnet_name": "EMODNET",
+    "emodnet_long_name": "EMODNET long name",
+}
+
+
+@lru_cache(maxsize=None)
+def load_mapping_table(mappingfile=DEFAULT_MAPPING_FILE):
+    """Load a parameter mapping file once per process.
+
+    Parameters
+    ----------
+    mappingfile : Path or str
+        JSON file mapping PANGAEA parameter ids to the columns listed in FIELDS
+
+    Returns
+    -------
+        Read-only mapping of integer parameter id to PanParameterMapping
+    """
+    with open(mappingfile, "r") as mappingjson:
+        mapping = json.load(mappingjson)
+    table = {}
+    for param_id, entry in mapping.items():
+        table[int(param_id)] = PanParameterMapping(int(param_id), **{field: entry.get(column) for field, column in FIELDS.items()})
+    return MappingProxyType(table)
+
+
+def get_parameter_mapping(param_id):
+    """Return the PanParameterMapping of a PANGAEA parameter id or None if the parameter is not mapped."""
+    try:
+        return load_mapping_table().get(int(param_id))
+    except (TypeError, ValueError):
+        return None
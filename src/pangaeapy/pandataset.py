@@ -1,5 +1,10 @@
 import asyncio
+import base64
+import copy
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
 import datetime
+import hashlib
 import io
 import json
 import logging
@@ -8,8 +13,10 @@ import pickle
 import re
 import sqlite3 as sl
 import textwrap
+import threading
 import time
 from urllib.parse import unquote, urlparse
+import uuid
 import zipfile
 
 import aiohttp
@@ -19,9 +26,16 @@ import pandas as pd
 import requests
 
 from pangaeapy._core import CURRENT_VERSION, get_request, get_xml_content
+from pangaeapy._zipstream import ZipStreamError, extract_stream
+from pangaeapy.pangeometry import get_geometry
+from pangaeapy.panindex import PanEventIndex
+from pangaeapy.panstore import PanBlobStore
 from pangaeapy.exporter.pan_dwca_exporter import PanDarwinCoreAchiveExporter
 from pangaeapy.exporter.pan_frictionless_exporter import PanFrictionlessExporter
 from pangaeapy.exporter.pan_netcdf_exporter import PanNetCDFExporter
+from pangaeapy.exporter.pan_parquet_exporter import PanParquetExporter
+from pangaeapy.exporter.pan_xarray_exporter import PanXarrayExporter
+from pangaeapy.exporter.pan_zarr_exporter import PanZarrExporter
 
 logger = logging.getLogger(__name__)
 
@@ -515,6 +529,8 @@ class PanDataSet:
         # allowed geocodes for netcdf generation which are used as xarray dimensions not needed in the moment
         self._geocodes = {1599: "Date_Time", 1600: "Latitude", 1601: "Longitude", 1619: "Depth water"}
         self.data = pd.DataFrame()
+        # (coordinate columns, hash of their values, number of events, geometry), see getGeometry
+        self._geometry = None
         self.qcdata = pd.DataFrame()
         self.citation = None
 
@@ -634,7 +650,15 @@ class PanDataSet:
             return ret
 
     def drop_pickle(self):
+        """
+        Deletes the pickle file of a PanDataSet object and removes its events from the event index of the cache
+
+        """
         self.get_pickle_path().unlink(missing_ok=True)
+        try:
+            PanEventIndex(self.cachedir).remove(self.id)
+        except Exception as e:
+            self.log(logging.WARNING, "Could not remove the events from the event index: " + str(e))
 
     def from_pickle(self):
         """
@@ -663,13 +687,11 @@ class PanDataSet:
 
     def to_pickle(self):
         """
-        Writes a PanDataSet object to a pickle file
+        Writes a PanDataSet object to a pickle file and adds its events to the event index of the cache (see PanEventIndex)
 
         """
         if not self.data.empty:
-            state = self.__dict__.copy()
-            del state["terms_conn"]
-            del state["_xml_root"]
+            state = self.__getstate__()
             pickle_path = self.get_pickle_path()
             try:
                 pickle_path.parent.mkdir(parents=True)
@@ -677,11 +699,58 @@ class PanDataSet:
                 pass
             with open(pickle_path, "wb") as f:
                 pickle.dump(state, f, 2)
+            try:
+                PanEventIndex(self.cachedir).add(self.id, self.events)
+            except Exception as e:
+                self.log(logging.WARNING, "Could not add the events to the event index: " + str(e))
             # self.logging.append({'INFO': 'Saved cache (pickle) file at: ' + str(self.get_pickle_path())})
             self.log(logging.INFO, "Saved cache (pickle) file at: " + str(self.get_pickle_path()))
         else:
             self.log(logging.WARNING, "Skipped saving cache (pickle) since the dataset contains no data")
 
+    def __getstate__(self):
+        # the terms database connection and the parsed metadata cannot be pickled, they are restored by __setstate__
+        state = self.__dict__.copy()
+        state.pop("terms_conn", None)
+        state.pop("_xml_root", None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._xml_root = ET.fromstring(self.metaxml.encode()) if self.metaxml else None
+        self.terms_conn = sl.connect(Path(self.cachedir, "terms.db"))
+
+    def export_view(self):
+        """
+        Returns a lightweight copy of the dataset for an export.
+        The copy shares the metadata with this dataset. Renaming or adding columns and parameters, changing values,
+        parameter synonyms or the list of default parameters of the copy does not change this dataset, so one loaded
+        dataset can be exported into several formats. With pandas >= 3.0 the data frames of the copy share the column
+        arrays with this dataset until they are changed (copy-on-write), older pandas versions copy them.
+        The copy starts with an empty logging list. PanExporter replaces it with the logging list of the dataset, so
+        that exports log to the dataset.
+
+        Returns
+        -------
+        PanDataSet
+        """
+        # without copy-on-write (pandas < 3.0) a shallow copy would pass changed values on to this dataset
+        deep = int(pd.__version__.split(".")[0]) < 3
+        view = object.__new__(type(self))
+        view.__dict__.update(self.__dict__)
+        view.data = self.data.copy(deep=deep)
+        view.qcdata = self.qcdata.copy(deep=deep)
+        view.params = {}
+        for key, param in self.params.items():
+            param = copy.copy(param)
+            param.synonym = dict(param.synonym)
+            view.params[key] = param
+        view.parameters = view.params
+        view.defaultparams = list(self.defaultparams)
+        view.events = list(self.events)
+        view.logging = []
+        return view
+
     def setID(self, id):
         """
         Initialize the ID of a data set in case it was not defined in the constructur
@@ -1402,53 +1471,37 @@ class PanDataSet:
         else:
             self.log(logging.ERROR, "No HTTP response object received for: " + str(self.id))
 
+    def get_coordinate_columns(self):
+        """Return the names of the time and depth columns of the data, None if a column is missing.
+
+        Columns are recognised by their original names (e.g. 'Date/Time', 'Depth water') as well as by the
+        names used in NetCDF exports (e.g. 'Date_Time', 'Depth_water').
+        """
+        columns = {re.sub(r"[/\s]", "_", str(column)): column for column in self.data.columns}
+        t = columns.get("Date_Time")
+        z = next((columns[name] for name in ["Depth_water", "Depth", "Depth_ice_snow", "Depth_soil"] if name in columns), None)
+        return t, z
+
     def getGeometry(self):
         """
         Sometimes the topotype attribute has not been set correctly during the curation process.
         This method returns the real geometry (topographic type) of the dataset based on the x,y,z and t information of the data frame content.
+        The result is cached until the values of the coordinate columns or the number of events change,
+        see get_geometry for the classification.
         Still a bit experimental..
         """
-        geotype = 0
-        zgroup = ["Latitude", "Longitude"]
-        tgroup = ["Latitude", "Longitude"]
-        locgrp = ["Latitude", "Longitude"]
-        p = pz = pt = len(self.data.groupby(locgrp))
-        t = z = None
-
-        if "Date_Time" in self.data.columns:
-            t = "Date_Time"
-        if "Depth_water" in self.data.columns:
-            z = "Depth_water"
-        elif "Depth" in self.data.columns:
-            z = "Depth"
-        elif "Depth_ice_snow" in self.data.columns:
-            z = "Depth_ice_snow"
-        elif "Depth_soil" in self.data.columns:
-            z = "Depth_soil"
-
-        if t is not None:
-            tgroup.append(t)
-            pt = len(self.data.groupby(tgroup))
-        if z is not None:
-            zgroup.append(z)
-            pz = len(self.data.groupby(zgroup))
-        if p == 1:
-            if pt == 1 and pz == 1:
-                geotype = "point"
-            elif pt >= 1:
-                if pz == 1 or len(self.events) == 1:
-                    geotype = "timeSeries"
-                else:
-                    geotype = "timeSeriesStack"
-            else:
-                geotype = "profile"
-        else:
-            if p == pz:
-                geotype = "trajectory"
-            elif pt > pz:
-                geotype = "timeSeriesProfile"
-            else:
-                geotype = "trajectoryProfile"
+        t, z = self.get_coordinate_columns()
+        columns = [column for column in ["Latitude", "Longitude", t, z] if column is not None]
+        # the geometry does not depend on the order of the rows, so the sum of the row hashes identifies the values
+        key = (tuple(columns), int(pd.util.hash_pandas_object(self.data[columns], index=False).sum()), len(self.events))
+        cached = getattr(self, "_geometry", None)
+        if cached is not None and cached[:3] == key:
+            return cached[3]
+        geotype = get_geometry(self.data["Latitude"], self.data["Longitude"],
+                               time=self.data[t] if t is not None else None,
+                               depth=self.data[z] if z is not None else None,
+                               events=len(self.events))
+        self._geometry = key + (geotype,)
         return geotype
 
     def getParamDict(self):
@@ -1485,10 +1538,10 @@ class PanDataSet:
             self.data.rename(columns={old_name: new_name}, inplace=True)
             self.qcdata.rename(columns={old_name: new_name}, inplace=True)
 
-    def to_netcdf(self, filelocation=None, save=True, type="sdn"):
+    def to_netcdf(self, filelocation=None, save=True, type="sdn", ondisk=None):
         """
-        This method creates a NetCDF file using PANGAEA data. It offers two different flavors: SeaDataNet NetCDF and an
-        experimental internal format using NetCDF 4 groups.
+        This method creates a NetCDF file using PANGAEA data. It offers three different flavors: SeaDataNet NetCDF,
+        CF discrete sampling geometries as contiguous ragged arrays and an experimental internal format using NetCDF 4 groups.
         Currently, the method only supports simple types such as timeseries and profiles.
         The method created files are named as follows: [PANGAEA ID]_[type].cf
 
@@ -1497,21 +1550,83 @@ class PanDataSet:
         filelocation : str
             Indicates the location (directory) where the NetCDF file will be saved
         type : str
-            This parameter sets the NetCDF profile type. Allowed values are 'sdn' (SeaDataNet) and 'pan' (PANGAEA style)
+            This parameter sets the NetCDF profile type. Allowed values are 'sdn' (SeaDataNet), 'ragged' (CF contiguous ragged array,
+            events are not padded to the length of the longest one) and 'pan' (PANGAEA style)
         save : Boolean
             If the file shall be saved on disk (filelocation or home directory/pan_export by default)
+        ondisk : Boolean
+            For 'sdn' and 'ragged': write a chunked and compressed NetCDF 4 file directly to filelocation instead of
+            creating it in memory, which limits the memory needed for large datasets. The path of the file is returned.
+            By default, only files estimated to be larger than PanNetCDFExporter.ondisk_threshold are written to disk.
         """
         ret = None
         netcdfexporter = PanNetCDFExporter(self, filelocation=filelocation)
         if type == "sdn":
             netcdfexporter.renameSDNDimVars()
             netcdfexporter.pandataset.addQCParamsAndColumns(qc_suffix="_SEADATANET_QC", excludeColumns=["LATITUDE", "LONGITUDE", "TIME"])
-        ret = netcdfexporter.create(style=type)
+        ret = netcdfexporter.create(style=type, ondisk=ondisk)
         if save:
             netcdfexporter.save()
         return ret
 
-    def to_frictionless(self, filelocation=None, save=True):
+    def to_zarr(self, filelocation=None):
+        """
+        This method creates a chunked and compressed Zarr store of a profile or time series dataset, which requires zarr.
+        The data are arranged like in the SeaDataNet NetCDF export: one row per event and the observations of each event
+        along the second dimension. Chunks hold whole events and can be read independently.
+        The method created stores are named as follows: zarr_pangaea_[PANGAEA ID].zarr
+
+        Parameters
+        ----------
+        filelocation : str
+            Indicates the location (directory) where the Zarr store will be saved
+
+        Returns
+        -------
+            The path of the store or False if it could not be created
+        """
+        zarr_exporter = PanZarrExporter(self, filelocation)
+        return zarr_exporter.create()
+
+    def to_xarray(self):
+        """
+        This method converts the data into an xarray Dataset, which requires xarray.
+        The dimensions are derived from the geometry of the data (see getGeometry): a single time series or profile
+        is indexed by its time or depth, points and trajectories by observation and several profiles or time series
+        are arranged as Event x MAXZ/MAXT arrays. Except for the latter, the variables share the arrays of the data
+        frame instead of copying them. Units, CF standard names and PANGAEA parameter ids are added as attributes.
+
+        Returns
+        -------
+            xarray.Dataset or False if the data could not be converted
+        """
+        xarray_exporter = PanXarrayExporter(self)
+        return xarray_exporter.create()
+
+    def to_parquet(self, filelocation=None, save=True, qc=False):
+        """
+        This method creates an Apache Parquet file of the data, which requires pyarrow.
+        Column types are preserved, string columns are dictionary encoded and the parameter (id, unit, terms) and
+        event metadata are embedded in the file's schema.
+        The method created files are named as follows: parquet_pangaea_[PANGAEA ID].parquet
+
+        Parameters
+        ----------
+        filelocation : str
+            Indicates the location (directory) where the Parquet file will be saved
+        save : Boolean
+            If the file shall be saved on disk (filelocation or home directory/pan_export by default), otherwise
+            it is created in memory and returned as BytesIO
+        qc : Boolean
+            Add the quality flags (qcdata) as columns with the suffix '_QC'
+        """
+        parquet_exporter = PanParquetExporter(self, filelocation)
+        ret = parquet_exporter.create(qc=qc, ondisk=save)
+        if save:
+            parquet_exporter.save()
+        return ret
+
+    def to_frictionless(self, filelocation=None, save=True, ondisk=False, parquet=False):
         """
         This method creates a frictionless data package (https://specs.frictionlessdata.io/data-package) file using PANGAEA metadata and data.
         A package will be saved as directory
@@ -1523,14 +1638,18 @@ class PanDataSet:
             Indicates the location (directory) where the frictionless file will be saved
         save : Boolean
             If the file shall be saved on disk (filelocation or home directory/pan_export by default)
+        ondisk : Boolean
+            Write the ZIP file directly to disk instead of creating it in memory. The path of the file is returned.
+        parquet : Boolean
+            Add the data as Parquet resource to the package, requires pyarrow
         """
         frictionless_exporter = PanFrictionlessExporter(self, filelocation)
-        ret = frictionless_exporter.create()
+        ret = frictionless_exporter.create(ondisk=ondisk, parquet=parquet)
         if save:
             frictionless_exporter.save()
         return ret
 
-    def to_dwca(self, save=True):
+    def to_dwca(self, save=True, ondisk=False, filelocation=None):
         """
         This method creates a Darwin Core Archive file using PANGAEA metadata and data.
         A package will be saved as directory
@@ -1542,19 +1661,64 @@ class PanDataSet:
             Indicates the location (directory) where the DwC-A file will be saved
         save : Boolean
             If the file shall be saved on disk (filelocation or home directory/pan_export by default)
+        ondisk : Boolean
+            Stream the archive directly to disk in parts instead of creating it in memory, which limits the memory
+            needed for datasets with many occurrences. The path of the file is returned.
         """
-        dwca_exporter = PanDarwinCoreAchiveExporter(self)
-        ret = dwca_exporter.create()
+        dwca_exporter = PanDarwinCoreAchiveExporter(self, filelocation)
+        ret = dwca_exporter.create(ondisk=ondisk)
         if save:
             dwca_exporter.save()
-        # print(dwca_exporter.logging)
-        self.logging.extend(dwca_exporter.logging)
         return ret
 
-    def download(self, indices: list = None, columns: list[str] = None):
+    def _get_harvester(self, indices=None, columns=None, **kwargs):
+        """Check the download arguments and return a PanDataHarvester for the selected binary data.
+
+        Returns None if the dataset does not contain binary data.
+        """
+        if self.data.empty:
+            raise ValueError(f"Dataset has no available data to download!\n"
+                             f"Check {self.doi} for more information on dataset.")
+
+        # possible names for binary column(s) in the data table of a data set
+        binary_columns = ["binary", "netcdf", "image", "video", "text", "url", "csv"]
+        # case-insensitive matching of any column starting with one of the possible binary column names
+        # (?!.*\() -> negative look ahead assertion to skip columns with "("
+        # such columns mostly contain additional information about the binary file (e.g. Binary (Size))
+        pattern = "(?i)^(" + "|".join(binary_columns) + r")(?!.*\()"
+        column_names = self.data.filter(regex=pattern).columns.tolist()
+
+        if not column_names:
+            return None
+        self.log(logging.INFO, f"Downloading files to {Path(self.cachedir, str(self.id))}")
+        self.columns = columns if columns else column_names
+        self.data_index = indices if indices else []
+
+        # double check input
+        if not all([x in column_names for x in self.columns]):
+            raise ValueError(f"Not all given columns ({self.columns}) are available!\n"
+                             f"Please select one or all of {column_names}.")
+        # raise error if an index is larger than the available row numbers
+        if any([x >= self.data.shape[0] for x in self.data_index]):
+            raise ValueError(f"Index out of range!\n"
+                             f"Possible index range: 0 - {self.data.shape[0]}.")
+
+        return PanDataHarvester(self, **kwargs)
+
+    def _save_csv(self):
+        self.log(logging.INFO, "Info: No binary data available.")
+        self.log(logging.INFO, f"The dataset will be saved as a CSV file to {self.cachedir}")
+
+        csv_path = Path(self.cachedir, f"{self.id}_data.csv")
+        self.data.to_csv(csv_path, index=False)
+        self.log(logging.INFO, f"Dataset saved to {csv_path}")
+        return [csv_path]
+
+    def download(self, indices: list = None, columns: list[str] = None, **kwargs):
         """Download binary data if available; otherwise, save dataframe as CSV.
 
         Downloads can be very large. Consider explicitly defining the pangaeapy cache when calling PanDataSet.
+        Binary files are stored in a subdirectory of the cache named after the dataset id.
 
         Parameters
         ----------
@@ -1562,48 +1726,291 @@ class PanDataSet:
             Row indices of the data to download (e.g. [1, 2, 6]).
         columns : list of strings
             Column names of the data to download (e.g. ["Binary", "netCDF"]).
+        **kwargs
+            Further options passed to PanDataHarvester (e.g. chunk_size or zip_mode).
 
         Returns
         -------
             List of downloaded or saved filenames
         """
+        harvester = self._get_harvester(indices, columns, **kwargs)
+        if harvester is None:
+            return self._save_csv()
+        return harvester.run_download()
 
-        if self.data.empty:
-            raise ValueError(f"Dataset has no available data to download!\n"
-                             f"Check {self.doi} for more information on dataset.")
+    async def download_async(self, indices: list = None, columns: list[str] = None, **kwargs):
+        """Awaitable version of download() for use in asynchronous code.
 
-        # possible names for binary column(s) in the data table of a data set
-        binary_columns = ["binary", "netcdf", "image", "video", "text", "url", "csv"]
-        # case-insensitive matching of any column starting with one of the possible binary column names
-        # (?!.*\() -> negative look ahead assertion to skip columns with "("
-        # such columns mostly contain additional information about the binary file (e.g. Binary (Size))
-        pattern = "(?i)^(" + "|".join(binary_columns) + r")(?!.*\()"
-        column_names = self.data.filter(regex=pattern).columns.tolist()
+        Parameters
+        ----------
+        indices : list
+            Row indices of the data to download (e.g. [1, 2, 6]).
+        columns : list of strings
+            Column names of the data to download (e.g. ["Binary", "netCDF"]).
+        **kwargs
+            Further options passed to PanDataHarvester (e.g. chunk_size or zip_mode).
 
-        if column_names:
-            self.log(logging.INFO, f"Downloading files to {self.cachedir}")
-            self.columns = columns if columns else column_names
-            self.data_index = indices if indices else []
-
-            # double check input
-            if not all([x in column_names for x in self.columns]):
-                raise ValueError(f"Not all given columns ({self.columns}) are available!\n"
-                                 f"Please select one or all of {column_names}.")
-            # raise error if an index is larger than the available row numbers
-            if any([x >= self.data.shape[0] for x in self.data_index]):
-                raise ValueError(f"Index out of range!\n"
-                                 f"Possible index range: 0 - {self.data.shape[0]}.")
-
-            harvester = PanDataHarvester(self)
-            return harvester.run_download()
-        else:
-            self.log(logging.INFO, "Info: No binary data available.")
-            self.log(logging.INFO, f"The dataset will be saved as a CSV file to {self.cachedir}")
+        Returns
+        -------
+            List of downloaded or saved filenames
+        """
+        harvester = self._get_harvester(indices, columns, **kwargs)
+        if harvester is None:
+            return await asyncio.to_thread(self._save_csv)
+        return await harvester.download_async()
+
+    def _member_harvester(self, index, column, **kwargs):
+        harvester = self._get_harvester([index], [column] if column else None, **kwargs)
+        if harvester is None:
+            raise ValueError(f"Dataset {self.id} does not contain binary data")
+        return harvester, column or harvester.columns[0]
+
+    def open(self, index: int, column: str = None, spill: bool = False, **kwargs):
+        """Open a binary file of the dataset for reading while it is transferred, without storing it first.
+
+        Useful to parse a file straight from the network, e.g.
+        ``pd.read_csv(ds.open(0, "URL file"))`` or ``netCDF4.Dataset("f", memory=ds.open(3).read())``.
+
+        Parameters
+        ----------
+        index : int
+            Row index of the file
+        column : str
+            Column name of the file, by default the first binary column
+        spill : bool
+            Also store the file in the cache, so that later calls to open() or download() read it from there.
+        **kwargs
+            Further options passed to PanDataHarvester (e.g. chunk_size).
+
+        Returns
+        -------
+            A binary, non-seekable file object
+        """
+        harvester, column = self._member_harvester(index, column, **kwargs)
+        return harvester.open(index, column, spill=spill)
+
+    async def iter_bytes(self, index: int, column: str = None, spill: bool = False, **kwargs):
+        """Asynchronous version of open(), yielding the content of a binary file in chunks.
+
+        Parameters
+        ----------
+        index : int
+            Row index of the file
+        column : str
+            Column name of the file, by default the first binary column
+        spill : bool
+            Also store the file in the cache.
+        **kwargs
+            Further options passed to PanDataHarvester (e.g. chunk_size).
+        """
+        harvester, column = self._member_harvester(index, column, **kwargs)
+        async for chunk in harvester.iter_bytes(index, column, spill=spill):
+            yield chunk
+
+
+class _BackgroundLoop:
+    """Event loop running in a daemon thread.
+
+    Coroutines are submitted to this loop when synchronous code is called from within a
+    running event loop, which cannot be used to run them.
+    """
+
+    _lock = threading.Lock()
+    _loop = None
+    _thread = None
+
+    @classmethod
+    def run(cls, coro):
+        """Run coro on the background loop and wait for its result.
+
+        Raises
+        ------
+        RuntimeError
+            if called from the background loop itself (e.g. from a progress_callback), where waiting would block
+            the loop forever
+        """
+        with cls._lock:
+            if cls._loop is None:
+                cls._loop = asyncio.new_event_loop()
+                cls._thread = threading.Thread(target=cls._loop.run_forever, name="pangaeapy-background-loop", daemon=True)
+                cls._thread.start()
+        if threading.current_thread() is cls._thread:
+            coro.close()
+            raise RuntimeError("Synchronous download called from the pangaeapy background event loop, "
+                               "use 'await download_async()' instead")
+        return asyncio.run_coroutine_threadsafe(coro, cls._loop).result()
+
+
+class TapeStagingError(Exception):
+    """Raised when a file is not available yet, because it is being retrieved from the tape archive."""
 
-            csv_path = Path(self.cachedir, f"{self.id}_data.csv")
-            self.data.to_csv(csv_path, index=False)
-            print(f"Dataset saved to {csv_path}")
-            return [csv_path]
+    def __init__(self, filename, retry_after=None):
+        super().__init__(f"{filename} is being retrieved from tape")
+        self.filename = filename
+        self.retry_after = retry_after
+
+
+class _RateLimiter:
+    """Limit the throughput of a number of downloads to rate bytes per second.
+
+    Every chunk reserves the time it takes to transfer it at the given rate.
+    Callers wait until their reserved time slot has started.
+    """
+
+    def __init__(self, rate):
+        self.rate = rate
+        self._next = 0.0
+        self._lock = threading.Lock()  # synchronous readers reserve from other threads
+
+    def reserve(self, size):
+        """Reserve the time slot of a chunk and return the seconds until it starts."""
+        with self._lock:
+            now = time.monotonic()
+            start = max(self._next, now)
+            self._next = start + size / self.rate
+        return start - now
+
+    async def acquire(self, size):
+        delay = self.reserve(size)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def wait(self, size):
+        """Blocking version of acquire for synchronous readers."""
+        delay = self.reserve(size)
+        if delay > 0:
+            time.sleep(delay)
+
+
+class _DownloadJob:
+    """A single file transfer scheduled by the PanDataHarvester."""
+
+    STATUSES = ("queued", "active", "staging", "done", "skipped", "failed")
+
+    def __init__(self, url, filename, refs=None):
+        self.url = url
+        self.filename = filename
+        self.refs = refs or []  # (row, column) of the data cells referencing the file
+        self.hash = None  # hash of the file content in the blob store
+        self.path = None
+        self.status = "queued"
+        self.staging_attempts = 0
+        self.retry_at = None
+        self.error = None
+        self.size = None  # total size announced by the server
+        self.bytes = 0  # bytes received
+        self.retries = 0
+        self.wait_time = 0.0  # seconds spent waiting on 429 and 503 responses
+        self.latency = None  # seconds until the response headers of the last request arrived
+        self.started = None
+        self.finished = None
+        self.last_progress = 0.0
+
+    @property
+    def elapsed(self):
+        """Seconds since the first request for this file until it was finished (or now)."""
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.monotonic()) - self.started
+
+    def as_dict(self):
+        return {"filename": self.filename, "url": self.url, "status": self.status, "path": self.path,
+                "size": self.size, "bytes": self.bytes, "elapsed": self.elapsed, "latency": self.latency,
+                "retries": self.retries, "staging_attempts": self.staging_attempts,
+                "wait_time": self.wait_time, "error": self.error}
+
+
+class _DownloadManifest:
+    """Record of the files completely downloaded by the PanDataHarvester.
+
+    Parameters
+    ----------
+    dbpath : Path
+        Location of the sqlite database holding the manifest
+    """
+
+    def __init__(self, dbpath):
+        self.dbpath = dbpath
+        with closing(sl.connect(self.dbpath)) as conn:
+            conn.execute("create table if not exists downloads (url text PRIMARY KEY, path text, size integer, entry_date datetime default current_timestamp)")
+            # validator (ETag or Last-Modified) of the response a .part file was started with
+            conn.execute("create table if not exists parts (path text PRIMARY KEY, validator text)")
+            conn.commit()
+
+    def lookup(self, url):
+        """Return (path, size) of the file downloaded from url or None."""
+        with closing(sl.connect(self.dbpath)) as conn:
+            row = conn.execute("select path, size from downloads where url=?", (url,)).fetchone()
+        return tuple(row) if row else None
+
+    def add(self, url, path, size):
+        with closing(sl.connect(self.dbpath)) as conn:
+            conn.execute("insert or replace into downloads (url, path, size) values (?,?,?)", (url, str(path), size))
+            conn.commit()
+
+    def part_validator(self, partpath):
+        """Return the validator of the response a .part file was started with or None."""
+        with closing(sl.connect(self.dbpath)) as conn:
+            row = conn.execute("select validator from parts where path=?", (str(partpath),)).fetchone()
+        return row[0] if row else None
+
+    def set_part_validator(self, partpath, validator):
+        """Record the validator of the response a .part file is started with, None removes the record."""
+        with closing(sl.connect(self.dbpath)) as conn:
+            if validator is None:
+                conn.execute("delete from parts where path=?", (str(partpath),))
+            else:
+                conn.execute("insert or replace into parts (path, validator) values (?,?)", (str(partpath), validator))
+            conn.commit()
+
+
+class _ResponseReader(io.RawIOBase):
+    """Read-only, non-seekable file object over the body of a streamed requests.Response.
+
+    If spill_path is given, the body is copied to this file while it is being read and
+    on_complete is called once the end of the body has been reached. The reads are throttled
+    by the optional rate_limiter.
+    """
+
+    def __init__(self, response, spill_path=None, on_complete=None, rate_limiter=None):
+        super().__init__()
+        self._response = response
+        self._raw = response.raw
+        self._raw.decode_content = True
+        self._spill_path = spill_path
+        self._spill = open(spill_path, "wb") if spill_path is not None else None
+        self._on_complete = on_complete
+        self._rate_limiter = rate_limiter
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        data = self._raw.read(len(b))
+        if not data:
+            self._finish()
+            return 0
+        if self._rate_limiter is not None:
+            self._rate_limiter.wait(len(data))
+        b[:len(data)] = data
+        if self._spill is not None:
+            self._spill.write(data)
+        return len(data)
+
+    def _finish(self):
+        if self._spill is not None and not self._spill.closed:
+            self._spill.close()
+            if self._on_complete is not None:
+                self._on_complete()
+
+    def close(self):
+        if not self.closed:
+            if self._spill is not None and not self._spill.closed:
+                # an incomplete copy cannot be resumed, it was not requested conditionally
+                self._spill.close()
+                Path(self._spill_path).unlink(missing_ok=True)
+            self._response.close()
+        super().close()
 
 
 class PanDataHarvester:
@@ -1614,203 +2021,866 @@ class PanDataHarvester:
     ----------
     dataset: PanDataSet
         The dataset, which initiates the PanDataHarvester
+    chunk_size: int
+        The number of bytes read from the network at once
+    zip_mode: str
+        How complete datasets downloaded as ZIP file are extracted. 'file' (default) stores the
+        archive temporarily and extracts it afterwards, 'stream' extracts the members while the
+        archive is downloaded, so only the extracted files occupy disk space.
+    extract_workers: int
+        Number of threads extracting a stored ZIP file in parallel
+    max_concurrent: int
+        Number of files downloaded at the same time
+    max_connections: int
+        Limit of simultaneously open connections, 0 means unlimited
+    max_connections_per_host: int
+        Limit of simultaneously open connections to the same host, 0 means unlimited
+    dns_cache_ttl: int
+        Seconds resolved host names are cached, 0 disables the cache
+    max_bytes_per_second: int
+        Optional cap of the total download bandwidth of this harvester
+    write_queue_size: int
+        Number of received chunks per file which may wait to be written to disk
+    progress_callback: callable
+        Called with a dict for every download event: 'skipped', 'started', 'progress'
+        (at most every progress_interval seconds per file), 'retry', 'staging', 'done' and 'failed'.
+        The dict contains the event name and the statistics of the file, see stats().
+        The events are also logged at DEBUG level by the 'pangaeapy.pandataset' logger.
+    progress_interval: float
+        Minimum number of seconds between two 'progress' events of a file
+    use_store: bool
+        Keep the downloaded files in the content-addressed PanBlobStore of the cache directory.
+        Files already downloaded for any dataset are then not transferred again and identical
+        files are stored only once; the returned paths are links into the store. Off by default,
+        since blobs are not removed when the datasets referencing them are deleted from the cache.
 
 
     This class bundles the download functionality of pangaeapy.
     When initiated via PanDataSet.download(), the selected files are downloaded asynchronously.
-    They are stored in the local cache in their original file format and under their original name.
+    They are stored in a directory named after the dataset id within the local cache in their
+    original file format and under their original name.
     The Harvester will check if the file already exists before downloading.
-    To use the download functionality in a jupyter notebook include
-
-    .. code-block:: python
-
-        import nest_asyncio
-        nest_asyncio.apply()
-
-    at the beginning of the notebook.
-
+    Files which are still being retrieved from the tape archive (HTTP 503) are parked in a retry
+    queue with an exponential backoff while the other files are downloaded; see queue_state().
+    run_download() can be called from synchronous code, also within a running event loop
+    (e.g. in a jupyter notebook) or from worker threads. Asynchronous code can await download_async().
 
     """
 
-    def __init__(self, dataset):
+    def __init__(self, dataset, chunk_size=1024 * 1024, zip_mode="file", extract_workers=4,
+                 max_concurrent=5, max_connections=20, max_connections_per_host=0,
+                 dns_cache_ttl=300, max_bytes_per_second=None, write_queue_size=8,
+                 progress_callback=None, progress_interval=1.0, use_store=False):
         self.id = dataset.id
         self.auth_token = dataset.auth_token
         self.data = dataset.data
         self.cachedir = dataset.cachedir
-        self.cachedir.mkdir(parents=True, exist_ok=True)
+        self.download_dir = Path(self.cachedir, str(self.id))  # keep files of different datasets apart
+        self.download_dir.mkdir(parents=True, exist_ok=True)
+        if zip_mode not in ("file", "stream"):
+            raise ValueError(f"Invalid zip_mode {zip_mode}, allowed values are 'file' and 'stream'")
+        self.chunk_size = chunk_size
+        self.zip_mode = zip_mode
+        self.extract_workers = extract_workers
         self.columns = dataset.columns  # list of column names
         self.data_index = dataset.data_index
-        self.semaphore = asyncio.Semaphore(5)  # Limit concurrent downloads
+        self.max_concurrent = max_concurrent  # Limit concurrent downloads
+        self.max_connections = max_connections
+        self.max_connections_per_host = max_connections_per_host
+        self.dns_cache_ttl = dns_cache_ttl
+        self.rate_limiter = _RateLimiter(max_bytes_per_second) if max_bytes_per_second else None
+        self.write_queue_size = write_queue_size
+        self.progress_callback = progress_callback
+        self.progress_interval = progress_interval
+        self._started = self._finished = None
+        self.staging_backoff = 30  # seconds before a file staged from tape is requested again, doubled per retry
+        self.max_staging_backoff = 600
+        self.max_staging_retries = 10
+        self.jobs = []
+        self._parked = set()  # tasks putting files staged from tape back into the queue
+        self.manifest = _DownloadManifest(Path(self.cachedir, "downloads.db"))
+        self.store = PanBlobStore(Path(self.cachedir, "store")) if use_store else None
+
+
+    def _list_references(self):
+        """Map the available binary data (filenames or URLs) to the data cells referencing them.
+
+        Empty cells and non-string values are skipped. The entries are ordered by their first occurrence.
 
+        Returns
+        -------
+            Dict of entry: list of (row number, column name)
+        """
+        if self.data_index:
+            rows = list(self.data_index)
+        else:
+            # If no index is supplied return all rows
+            rows = list(range(self.data.shape[0]))
+        selected = self.data.iloc[rows][self.columns]  # select rows and columns
+        references = {}
+        for row, values in zip(rows, selected.to_numpy().tolist()):
+            for column, value in zip(self.columns, values):
+                if isinstance(value, str) and value.strip():
+                    references.setdefault(value.strip(), []).append((row, column))
+        return references
 
     def _list_available_data(self):
-        """List available binary data (filenames) in the dataset.
+        """List available binary data (filenames or URLs) in the dataset.
+
+        Empty cells and non-string values are skipped and every entry is only listed once,
+        in order of its first occurrence.
 
         Returns
         -------
             List of filenames
         """
-        if self.data_index:
-            available_data = (self.data
-                              .iloc[self.data_index][self.columns]  # select rows and columns
-                              .to_numpy().flatten().tolist())  # extract values and reduce dimensions
-        else:
-            # If no index is supplied return all rows
-            available_data = self.data[self.columns].to_numpy().flatten().tolist()
-        return available_data
+        return list(self._list_references())
+
+    def _url_references(self):
+        """Map the download URLs to the data cells referencing them."""
+        references = {}
+        for entry, refs in self._list_references().items():
+            references.setdefault(self._get_download_url(entry)[0], []).extend(refs)
+        return references
+
+    def _member(self, index, column):
+        """Return the download URL and the local filename of the binary data in a data cell."""
+        value = self.data.iloc[index][column]
+        if not isinstance(value, str) or not value.strip():
+            raise ValueError(f"No binary data in row {index}, column {column}")
+        return self._get_download_url(value.strip())
+
+    def _cached_path(self, url, filename):
+        """Return the local copy of a completely downloaded file, or None."""
+        path = Path(self.download_dir, filename)
+        if self.store is not None:
+            digest = self.store.lookup_url(url)
+            if digest is not None:
+                return self.store.link(digest, path)
+        if path.exists() and self.manifest.lookup(url) == (str(path), path.stat().st_size):
+            return path
+        return None
+
+    def _spill_path(self, filename):
+        """Path of the private copy a streamed file is written to while it is read.
+
+        It is not the .part file of a download, which may hold a resumable partial download of the same file.
+        """
+        return Path(self.download_dir, f"{filename}.{uuid.uuid4().hex}.spill")
+
+    def _finish_spill(self, url, filename, size, refs, spill_path):
+        """Keep a completely streamed file in the cache, like a download."""
+        path = Path(self.download_dir, filename)
+        if not self._verify_file(spill_path, size):
+            logger.warning("Streamed copy of %s is incomplete, discarding it.", filename)
+            spill_path.unlink(missing_ok=True)
+            return
+        spill_path.replace(path)
+        self.manifest.add(url, path, path.stat().st_size)
+        if self.store is not None:
+            job = _DownloadJob(url, filename, refs)
+            job.path = path
+            self._add_to_store([job])
+
+    @staticmethod
+    def _streamed_size(headers):
+        """Size of a complete response body after content decoding, or None if unknown."""
+        if headers.get("content-encoding", "identity") != "identity":
+            return None
+        length = headers.get("content-length")
+        return int(length) if length is not None else None
 
-    async def _download_file(self, session, url, filename, max_retries=4):
-        """Download a single file asynchronously, handling 503 errors."""
-        filepath = Path(self.cachedir, filename)
+    def open(self, index, column, spill=False):
+        """Open the binary data of a data cell for reading, without downloading it first.
 
-        attempt = 0
-        async with self.semaphore:
-            while attempt < max_retries:
+        The file is read directly from the network. Files which have been downloaded before
+        are opened from the cache instead.
+
+        Parameters
+        ----------
+        index : int
+            Row number of the data cell
+        column : str
+            Column name of the data cell
+        spill : bool
+            Copy the file into the cache while it is read, so that it does not have to be
+            transferred again. The copy is only kept if the file is read to its end.
+
+        Returns
+        -------
+            A binary file object. Files read from the network are not seekable; formats which
+            need random access can be read from memory, e.g. netCDF4.Dataset("f", memory=f.read()).
+        """
+        url, filename = self._member(index, column)
+        path = self._cached_path(url, filename)
+        if path is not None:
+            return open(path, "rb")
+        response = requests.get(url, stream=True, headers={"Authorization": f"Bearer {self.auth_token}",
+                                                           "User-Agent": f"pangaeapy/{CURRENT_VERSION}"})
+        try:
+            if response.status_code == 503:
+                retry_after = response.headers.get("retry-after")
+                raise TapeStagingError(filename, int(retry_after) if retry_after and retry_after.isdigit() else None)
+            response.raise_for_status()
+        except Exception:
+            response.close()
+            raise
+        spill_path, on_complete = None, None
+        if spill:
+            spill_path = self._spill_path(filename)
+            size = self._streamed_size(response.headers)
+
+            def on_complete():
+                self._finish_spill(url, filename, size, [(index, column)], spill_path)
+        reader = _ResponseReader(response, spill_path, on_complete, self.rate_limiter)
+        return io.BufferedReader(reader, buffer_size=self.chunk_size)
+
+    async def iter_bytes(self, index, column, spill=False):
+        """Iterate asynchronously over the content of the binary data in a data cell.
+
+        See open() for the parameters. The chunks have at most chunk_size bytes.
+        """
+        url, filename = self._member(index, column)
+        path = self._cached_path(url, filename)
+        if path is not None:
+            with open(path, "rb") as f:
+                while chunk := await asyncio.to_thread(f.read, self.chunk_size):
+                    yield chunk
+            return
+        headers = {"Authorization": f"Bearer {self.auth_token}", "User-Agent": f"pangaeapy/{CURRENT_VERSION}"}
+        spill_path = self._spill_path(filename) if spill else None
+        async with aiohttp.ClientSession(headers=headers) as session:
+            async with session.get(url) as response:
+                if response.status == 503:
+                    retry_after = response.headers.get("retry-after")
+                    raise TapeStagingError(filename, int(retry_after) if retry_after and retry_after.isdigit() else None)
+                response.raise_for_status()
+                size = self._streamed_size(response.headers)
+                f = await asyncio.to_thread(open, spill_path, "wb") if spill else None
                 try:
-                    async with session.get(url) as response:
-                        size = int(response.headers.get('content-length', 0))
-                        if filepath.exists() and (filepath.stat().st_size >= size):
-                            print(f"File {filename} already exists, skipping.")
-                            return filepath
+                    async for chunk in response.content.iter_chunked(self.chunk_size):
+                        if self.rate_limiter is not None:
+                            await self.rate_limiter.acquire(len(chunk))
+                        if f is not None:
+                            await asyncio.to_thread(f.write, chunk)
+                        yield chunk
+                except BaseException:
+                    if f is not None:
+                        # an incomplete copy cannot be resumed, it was not requested conditionally
+                        f.close()
+                        spill_path.unlink(missing_ok=True)
+                    raise
+                if f is not None:
+                    f.close()
+        if spill:
+            await asyncio.to_thread(self._finish_spill, url, filename, size, [(index, column)], spill_path)
+
+    def _add_to_store(self, jobs):
+        """Move downloaded files into the blob store and record the data cells referencing them."""
+        members = []
+        for job in jobs:
+            if job.path is None or not Path(job.path).exists():
+                continue
+            if job.hash is None:
+                job.hash = self.store.add_file(job.path, job.url)
+            members.extend((self.id, row, column, job.url, job.hash) for row, column in job.refs)
+        self.store.add_members(members)
+
+    def _get_download_url(self, entry):
+        """Return the download URL and the local filename of a binary data entry."""
+        parsed_url = urlparse(entry)
+        if parsed_url.scheme in ("http", "https"):
+            url = entry
+            # extract filename from url and decode special characters
+            filename = PurePosixPath(unquote(parsed_url.path)).name
+        else:
+            url = f"https://download.pangaea.de/dataset/{self.id}/files/{entry}"
+            filename = PurePosixPath(entry).name
+        return url, filename
 
-                        if response.status == 429:
-                            wait_time = response.headers.get('retry-after', 0)
-                            wait_time = int(wait_time) if wait_time != 0 else 10
-                            print(f"Got response status 429 (Too many connections) while trying to download {filename}.\n"
-                                  f" Retrying in {wait_time} seconds.")
-                            await asyncio.sleep(wait_time)
-                            attempt += 1
-                            continue
-
-                        if response.status == 503:
-                            sleep = 30 * (attempt + 1)
-                            print(f"{filename} is being retrieved from tape. Retrying in {sleep} seconds...")
-                            await asyncio.sleep(sleep)  # Wait 2 minutes before retrying
-                            attempt += 1
-                            continue
-
-                        with open(filepath, "wb") as f:
-                            async for chunk in response.content.iter_any():
-                                f.write(chunk)
+    def _plan_downloads(self):
+        """Turn the available binary data into a list of unique download jobs.
 
-                    print(f"Downloaded {filename} successfully!")
-                    return filepath
+        Returns
+        -------
+            List of (url, filename) tuples
+        """
+        jobs = []
+        filenames = {}
+        for entry in self._list_available_data():
+            url, filename = self._get_download_url(entry)
+            if not filename:
+                logger.warning("Could not determine a filename for %s, skipping.", entry)
+                continue
+            if filename in filenames:
+                if filenames[filename] != url:
+                    logger.warning("%s and %s share the filename %s, skipping the former.", url, filenames[filename], filename)
+                continue
+            filenames[filename] = url
+            jobs.append((url, filename))
+        return jobs
+
+    async def _is_present(self, session, url, filepath):
+        """Check if a file has already been downloaded completely.
+
+        The local download manifest is consulted first. Files which are not listed there
+        (e.g. downloaded by an earlier pangaeapy version) are compared against the size
+        announced in the response to a HEAD request.
+        """
+        if not filepath.exists():
+            return False
+        size = filepath.stat().st_size
+        if self.manifest.lookup(url) == (str(filepath), size):
+            return True
+        async with self.check_semaphore:
+            try:
+                async with session.head(url, allow_redirects=True) as response:
+                    if response.status != 200:
+                        return False
+                    expected = self._expected_size(response)
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                return False
+        if expected is not None and size == expected:
+            self.manifest.add(url, filepath, size)
+            return True
+        return False
+
+    @staticmethod
+    def _part_path(filepath):
+        """Path of the temporary file an unfinished download is written to."""
+        return filepath.with_name(filepath.name + ".part")
+
+    @staticmethod
+    def _expected_size(response, offset=0):
+        """Total size of the remote file as announced by the server.
+
+        For partial responses (206) the total is taken from the ``Content-Range`` header,
+        otherwise it is the ``Content-Length`` of the full body. Returns None if unknown.
+        """
+        content_range = response.headers.get("content-range", "")
+        match = re.search(r"/(\d+)$", content_range)
+        if match:
+            return int(match.group(1))
+        length = response.headers.get("content-length")
+        if length is None:
+            return None
+        return int(length) + (offset if response.status == 206 else 0)
+
+    @staticmethod
+    def _verify_file(path, size=None, md5=None):
+        """Check a downloaded file against the expected size and (base64 encoded) MD5 digest."""
+        if size is not None and path.stat().st_size != size:
+            return False
+        if md5 is not None:
+            digest = hashlib.md5()
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(1024 * 1024), b""):
+                    digest.update(block)
+            if base64.b64encode(digest.digest()).decode() != md5:
+                return False
+        return True
+
+    async def _write_response(self, response, path, mode, job):
+        """Write the body of a response to path without blocking the event loop.
+
+        The chunks are handed to a writer task through a bounded queue, which writes them
+        in a worker thread while the next chunks are received.
+        """
+        queue = asyncio.Queue(maxsize=self.write_queue_size)
+        errors = []
+
+        async def writer(f):
+            while (chunk := await queue.get()) is not None:
+                if not errors:
+                    try:
+                        await asyncio.to_thread(f.write, chunk)
+                    except OSError as e:
+                        errors.append(e)
+
+        f = await asyncio.to_thread(open, path, mode)
+        write_task = asyncio.create_task(writer(f))
+        try:
+            async for chunk in response.content.iter_chunked(self.chunk_size):
+                if self.rate_limiter is not None:
+                    await self.rate_limiter.acquire(len(chunk))
+                await queue.put(chunk)
+                if errors:
+                    break
+                job.bytes += len(chunk)
+                if time.monotonic() - job.last_progress >= self.progress_interval:
+                    job.last_progress = time.monotonic()
+                    self._emit("progress", job)
+        finally:
+            # let the writer finish the chunks already received
+            await queue.put(None)
+            await write_task
+            await asyncio.to_thread(f.close)
+        if errors:
+            raise errors[0]
+
+    @staticmethod
+    def _validator(response):
+        """Return the validator of a response for If-Range: a strong ETag or else the Last-Modified date."""
+        etag = response.headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            return etag
+        return response.headers.get("last-modified")
+
+    async def _download_file(self, session, url, filename, max_retries=4, job=None):
+        """Download a single file asynchronously.
+
+        Transfer statistics are collected in job, if given.
+
+        The data is written to a ``.part`` file next to the target which is renamed once the
+        transfer is complete and its size (and MD5 digest, if sent by the server) has been verified.
+        If a ``.part`` file exists from an interrupted download, the transfer is resumed with
+        an HTTP Range request instead of starting from byte 0. The request is conditional (If-Range) on
+        the ETag or Last-Modified date of the response the ``.part`` file was started with, so that a
+        changed file is downloaded again instead of being appended to the old part.
+
+        Raises
+        ------
+        TapeStagingError
+            if the server answers with 503, i.e. the file is being retrieved from tape
+        """
+        if job is None:
+            job = _DownloadJob(url, filename)
+        if job.started is None:
+            job.started = time.monotonic()
+        filepath = Path(self.download_dir, filename)
+        partpath = self._part_path(filepath)
 
-                except aiohttp.ClientResponseError as e:
+        attempt = 0
+        while attempt < max_retries:
+            offset = partpath.stat().st_size if partpath.exists() else 0
+            headers = None
+            if offset:
+                headers = {"Range": f"bytes={offset}-"}
+                validator = self.manifest.part_validator(partpath)
+                if validator:
+                    headers["If-Range"] = validator
+            if attempt:
+                job.retries += 1
+            try:
+                request_time = time.monotonic()
+                async with session.get(url, headers=headers) as response:
+                    job.latency = time.monotonic() - request_time
+                    if response.status == 416:
+                        # the part file already holds (at least) the complete file
+                        size = self._expected_size(response, offset)
+                        if size is not None and self._verify_file(partpath, size):
+                            partpath.replace(filepath)
+                            self.manifest.add(url, filepath, size)
+                            self.manifest.set_part_validator(partpath, None)
+                            job.size = size
+                            logger.info("Downloaded %s successfully!", filename)
+                            return filepath
+                        partpath.unlink(missing_ok=True)
+                        attempt += 1
+                        continue
+
+                    size = self._expected_size(response, offset)
+                    if response.status == 429:
+                        # retry-after may also be an HTTP date, which is not waited for
+                        retry_after = response.headers.get("retry-after")
+                        wait_time = int(retry_after) if retry_after and retry_after.isdigit() else 10
+                        logger.warning("Got response status 429 (Too many connections) while trying to download %s. "
+                                       "Retrying in %s seconds.", filename, wait_time)
+                        self._emit("retry", job, status=429, delay=wait_time)
+                        job.wait_time += wait_time
+                        await asyncio.sleep(wait_time)
+                        attempt += 1
+                        continue
+
+                    if response.status == 503:
+                        retry_after = response.headers.get("retry-after")
+                        raise TapeStagingError(filename, int(retry_after) if retry_after and retry_after.isdigit() else None)
+
+                    response.raise_for_status()
+                    job.size = size
+                    if response.status == 206:
+                        mode = "ab"
+                        md5 = None
+                    else:
+                        # server ignored the range request or the file changed (If-Range), start from scratch
+                        mode = "wb"
+                        md5 = response.headers.get("content-md5")
+                        self.manifest.set_part_validator(partpath, self._validator(response))
+                    await self._write_response(response, partpath, mode, job)
+
+                if not await asyncio.to_thread(self._verify_file, partpath, size, md5):
+                    if size is None or partpath.stat().st_size >= size:
+                        # corrupt download, a resume would not help
+                        partpath.unlink(missing_ok=True)
                     attempt += 1
-                    if attempt == max_retries:
-                        raise e
-                    print(f"Error {e.status} encountered. Retrying ({attempt}/{max_retries})...")
+                    logger.warning("Verification of %s failed. Retrying (%d/%d)...", filename, attempt, max_retries)
+                    self._emit("retry", job, reason="verification")
+                    continue
+                partpath.replace(filepath)
+                self.manifest.add(url, filepath, filepath.stat().st_size)
+                self.manifest.set_part_validator(partpath, None)
+                logger.info("Downloaded %s successfully!", filename)
+                return filepath
+
+            except aiohttp.ClientResponseError as e:
+                attempt += 1
+                if attempt == max_retries:
+                    raise e
+                logger.warning("Error %s encountered. Retrying (%d/%d)...", e.status, attempt, max_retries)
+                self._emit("retry", job, status=e.status)
+            except (aiohttp.ClientPayloadError, aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                # interrupted transfer, keep the part file and resume with the next attempt
+                attempt += 1
+                logger.warning("Download of %s interrupted (%r). Resuming (%d/%d)...", filename, e, attempt, max_retries)
+                self._emit("retry", job, reason="interrupted")
+
+        logger.error("Exceeded maximum number of retries (%d). Cancel download of %s.", max_retries, filename)
+        return None
+
+    def _staging_delay(self, job, retry_after=None):
+        """Backoff before a file which is being staged from tape is requested again."""
+        if retry_after:
+            return retry_after
+        return min(self.staging_backoff * 2 ** (job.staging_attempts - 1), self.max_staging_backoff)
+
+    async def _requeue(self, queue, job, delay):
+        """Put a file parked for tape staging back into the download queue after delay seconds."""
+        await asyncio.sleep(delay)
+        job.wait_time += delay
+        job.status = "queued"
+        queue.put_nowait(job)
+        # the job was taken from the queue before it was parked
+        queue.task_done()
+
+    async def _download_worker(self, session, queue):
+        """Take jobs from the download queue until it is cancelled.
+
+        A file which is being retrieved from tape does not block the worker: the job is parked
+        with a backoff and the worker continues with the next file in the queue.
+        """
+        while True:
+            job = await queue.get()
+            job.status = "active"
+            self._emit("started", job)
+            try:
+                job.path = await self._download_file(session, job.url, job.filename, job=job)
+                job.status = "done" if job.path else "failed"
+            except TapeStagingError as e:
+                job.staging_attempts += 1
+                if job.staging_attempts > self.max_staging_retries:
+                    logger.error("%s was not staged from tape after %d retries. Cancel download.",
+                                 job.filename, self.max_staging_retries)
+                    job.status = "failed"
+                else:
+                    delay = self._staging_delay(job, e.retry_after)
+                    logger.info("%s is being retrieved from tape. Retrying in %s seconds...", job.filename, delay)
+                    job.status = "staging"
+                    job.retry_at = time.monotonic() + delay
+                    self._emit("staging", job, delay=delay)
+                    task = asyncio.create_task(self._requeue(queue, job, delay))
+                    self._parked.add(task)
+                    task.add_done_callback(self._parked.discard)
+                    continue
+            except Exception as e:
+                logger.error("Download of %s failed: %s", job.filename, e)
+                job.status = "failed"
+                job.error = e
+            job.finished = time.monotonic()
+            self._emit(job.status, job)
+            queue.task_done()
+
+    def _emit(self, event, job, **info):
+        """Report a download event to the logging system and the progress callback.
+
+        The event is logged at DEBUG level with the event dict attached to the log record as
+        attribute 'pangaeapy_download'.
+        """
+        info = {"event": event, **job.as_dict(), **info}
+        logger.debug("Download %s: %s", event, job.filename, extra={"pangaeapy_download": info})
+        if self.progress_callback is not None:
+            try:
+                self.progress_callback(info)
+            except Exception:
+                logger.exception("Download progress callback failed")
 
-            print(f"Exceeded maximum number of retries ({max_retries}). Cancel download.")
-            return None
+    def stats(self):
+        """Return statistics of the current or last download run.
 
+        Returns
+        -------
+        dict
+            files: the number of files per status, see queue_state(),
+            queue_depth: the number of files waiting for a free download slot,
+            bytes: the number of bytes received,
+            elapsed: the seconds since the download run was started,
+            throughput: the average number of bytes received per second,
+            wait_time: the total seconds files waited for 429 and 503 responses,
+            retries: the total number of repeated requests,
+            latency: the mean seconds until response headers arrived,
+            per_file: a list of dicts with the statistics of each file
+        """
+        state = self.queue_state()
+        del state["staging_files"]
+        received = sum(job.bytes for job in self.jobs)
+        if self._started is None:
+            elapsed = 0.0
+        else:
+            elapsed = (self._finished or time.monotonic()) - self._started
+        latencies = [job.latency for job in self.jobs if job.latency is not None]
+        return {"files": state,
+                "queue_depth": state["queued"],
+                "bytes": received,
+                "elapsed": elapsed,
+                "throughput": received / elapsed if elapsed else 0.0,
+                "wait_time": sum(job.wait_time for job in self.jobs),
+                "retries": sum(job.retries for job in self.jobs),
+                "latency": sum(latencies) / len(latencies) if latencies else None,
+                "per_file": [job.as_dict() for job in self.jobs]}
+
+    def queue_state(self):
+        """Return the current state of the download queue.
+
+        Returns
+        -------
+        dict
+            The number of files per status (queued, active, staging, done, skipped, failed) and
+            under the key 'staging_files' a list of the files waiting for tape staging with the
+            number of staging attempts and the seconds until they are requested again.
+        """
+        state = dict.fromkeys(_DownloadJob.STATUSES, 0)
+        staging_files = []
+        now = time.monotonic()
+        for job in self.jobs:
+            state[job.status] += 1
+            if job.status == "staging":
+                staging_files.append({"filename": job.filename,
+                                      "attempts": job.staging_attempts,
+                                      "retry_in": max(0.0, job.retry_at - now)})
+        state["staging_files"] = staging_files
+        return state
 
     async def download_files(self):
-        """Download all binary files asynchronously."""
-        binary_files = self._list_available_data()
-        dataset_id = self.id
+        """Download all binary files asynchronously.
 
-        async with aiohttp.ClientSession() as session:
+        Files which are already present in the cache are skipped before any transfer is scheduled.
+        The remaining files are distributed to max_concurrent workers. Files which are being
+        retrieved from the tape archive are parked in a retry queue, so that the workers can
+        continue downloading files which are ready.
+        """
+        references = self._url_references()
+        self.jobs = [_DownloadJob(url, filename, references.get(url)) for url, filename in self._plan_downloads()]
+        self._started, self._finished = time.monotonic(), None
+        if self.store is not None:
+            for job in self.jobs:
+                job.hash = self.store.lookup_url(job.url)
+                if job.hash is not None:
+                    # downloaded before, possibly for another dataset
+                    logger.info("File %s is already in the store, skipping.", job.filename)
+                    job.path = self.store.link(job.hash, Path(self.download_dir, job.filename))
+                    job.status = "skipped"
+                    self._emit("skipped", job)
+        pending = [job for job in self.jobs if job.status == "queued"]
+        # created here, since asyncio primitives are bound to the loop they are used in
+        self.check_semaphore = asyncio.Semaphore(self.max_connections or 20)  # Limit concurrent HEAD requests
+
+        connector = aiohttp.TCPConnector(limit=self.max_connections,
+                                         limit_per_host=self.max_connections_per_host,
+                                         use_dns_cache=bool(self.dns_cache_ttl),
+                                         ttl_dns_cache=self.dns_cache_ttl)
+        async with aiohttp.ClientSession(connector=connector) as session:
             session.headers.update({"Authorization": f"Bearer {self.auth_token}",
                                     "User-Agent": f"pangaeapy/{CURRENT_VERSION}"})
-            tasks = []
-            for filename in binary_files:
-                if filename.startswith("https:"):
-                    url = filename
-                    parsed_url = urlparse(url)
-                    # extract filename from url and decode special characters
-                    filename = PurePosixPath(unquote(parsed_url.path)).name
+            present = await asyncio.gather(
+                *(self._is_present(session, job.url, Path(self.download_dir, job.filename)) for job in pending)
+            )
+            queue = asyncio.Queue()
+            for job, is_present in zip(pending, present):
+                if is_present:
+                    logger.info("File %s already exists, skipping.", job.filename)
+                    job.path = Path(self.download_dir, job.filename)
+                    job.status = "skipped"
+                    self._emit("skipped", job)
                 else:
-                    url = f"https://download.pangaea.de/dataset/{dataset_id}/files/{filename}"
-
-                tasks.append(self._download_file(session, url, filename))
-
-            results = await asyncio.gather(*tasks)
-            downloaded_files = [result for result in results if result]
-
-        return downloaded_files
+                    queue.put_nowait(job)
 
+            workers = [asyncio.create_task(self._download_worker(session, queue))
+                       for _ in range(min(self.max_concurrent, queue.qsize()))]
+            try:
+                await queue.join()
+            finally:
+                for task in workers + list(self._parked):
+                    task.cancel()
+                await asyncio.gather(*workers, *self._parked, return_exceptions=True)
+                self._finished = time.monotonic()
+        if self.store is not None:
+            await asyncio.to_thread(self._add_to_store,
+                                    [job for job in self.jobs if job.status in ("done", "skipped")])
+        stats = self.stats()
+        logger.info("Downloaded %d bytes in %.1f s (%.0f bytes/s), %d files done, %d skipped, %d failed",
+                    stats["bytes"], stats["elapsed"], stats["throughput"],
+                    stats["files"]["done"], stats["files"]["skipped"], stats["files"]["failed"])
+
+        return [job.path for job in self.jobs if job.status in ("done", "skipped")]
+
+
+    def _is_whole_dataset(self):
+        """Check if the complete binary dataset is requested, which is downloaded via the ZIP link."""
+        # Data sets with a URL binary column do not have a zip download available
+        return (self.data_index == []) and (all(["URL" not in column for column in self.columns]))
 
     def run_download(self):
         """Start asynchronous file download for single file downloads or download
          the zip file and extract its contents if the whole data set is requested.
          This requires a valid auth_token (also called Bearer Token).
 
+         The method blocks until all downloads are finished. If it is called while an event loop
+         is running in the current thread (e.g. in a jupyter notebook), the downloads are run on a
+         background event loop. Inside asynchronous code use download_async() instead.
+
          Returns
          -------
             List of downloaded files
          """
-        if (self.data_index == []) and (all(["URL" not in column for column in self.columns])):
+        if self._is_whole_dataset():
             # User wants the whole binary data set
             # Download the data set via the ZIP link, which requires a valid auth_token
-            # Data sets with a URL binary column do not have a zip download available
-            downloaded_files = self.download_zip_file()
-        else:
-            try:
-                # Check if there's a running event loop
-                loop = asyncio.get_running_loop()
-                # If we reach here, a loop is running (e.g. in a jupyter notebook)
-                future = asyncio.ensure_future(self.download_files())
-                downloaded_files = loop.run_until_complete(future)
-            except RuntimeError as e:
-                # probably running download inside a jupyter notebook
-                if str(e) ==  "This event loop is already running":
-                    print("You are probably calling download() inside a jupyter notebook.\n"
-                          "Insert\nimport nest_asyncio\nnest_asyncio.apply()\n"
-                          "in a notebook cell before calling download().")
-                    raise
+            return self.download_zip_file()
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            # No running event loop, create a new one
+            return asyncio.run(self.download_files())
+        # A loop is running (e.g. in a jupyter notebook), which cannot be used from synchronous code
+        return _BackgroundLoop.run(self.download_files())
 
-                # No running event loop, create a new one
-                downloaded_files = asyncio.run(self.download_files())
+    async def download_async(self):
+        """Awaitable version of run_download().
 
-        return downloaded_files
+        Returns
+        -------
+            List of downloaded files
+        """
+        if self._is_whole_dataset():
+            return await asyncio.to_thread(self.download_zip_file)
+        return await self.download_files()
 
 
+    def _extract_zip_file(self, zip_path):
+        """Extract a downloaded ZIP file into the download directory.
+
+        With extract_workers > 1 the members are extracted in parallel, each thread reading
+        the archive through its own file handle.
+
+        Returns
+        -------
+            List of extracted files
+        """
+        with zipfile.ZipFile(zip_path, "r") as zip_file:
+            members = [name for name in zip_file.namelist() if not name.endswith("/")]
+            if self.extract_workers <= 1 or len(members) <= 1:
+                zip_file.extractall(self.download_dir)
+
+        if self.extract_workers > 1 and len(members) > 1:
+            def extract(names):
+                with zipfile.ZipFile(zip_path, "r") as zip_file:
+                    for name in names:
+                        zip_file.extract(name, self.download_dir)
+
+            batches = [members[i::self.extract_workers] for i in range(self.extract_workers)]
+            with ThreadPoolExecutor(max_workers=self.extract_workers) as executor:
+                # consume the results to raise exceptions of the worker threads
+                list(executor.map(extract, [batch for batch in batches if batch]))
+
+        return [Path(self.download_dir, name) for name in members]
+
     def download_zip_file(self):
         """Download a complete binary data set via the ZIP link.
         Requires a valid auth_token (also called Bearer Token), which can be found at https://www.pangaea.de/user/.
+
+        The files are extracted into a directory named after the dataset id within the cache directory.
+        With zip_mode 'stream' the members are extracted while the archive is being downloaded,
+        so the archive itself is never stored. With zip_mode 'file' the archive is stored
+        temporarily and extracted afterwards.
         """
         url = f"https://download.pangaea.de/dataset/{self.id}/allfiles.zip"
-        zip_path = Path(self.cachedir, "allfiles.zip")
-        extract_dir = Path(self.cachedir)
+        zip_path = Path(self.download_dir, "allfiles.zip")
         url_headers = {
             "Authorization": f"Bearer {self.auth_token}",
             "User-Agent": f"pangaeapy/{CURRENT_VERSION}"
         }
+        job = _DownloadJob(url, zip_path.name)
+        self.jobs = [job]
+        self._started, self._finished = time.monotonic(), None
+        job.started = self._started
+        job.status = "active"
+        self._emit("started", job)
         try:
             with requests.get(url, stream=True, headers=url_headers) as r:
+                job.latency = time.monotonic() - job.started
                 if r.status_code == 401:
-                    print(
+                    logger.error(
                         "401 Client Error: Unauthorized access.\n"
                         "Please provide a valid auth_token when opening the data set.\n"
                         "You can find your auth_token (Bearer Token) on your PANGAEA user page at https://www.pangaea.de/user/"
                     )
+                    job.status = "failed"
                     return []
                 r.raise_for_status()
+                if r.headers.get("Content-Length", "").isdigit():
+                    job.size = int(r.headers["Content-Length"])
+                chunks = self._count_chunks(r.iter_content(chunk_size=self.chunk_size), job)
 
-                # Stream download to disk
-                with open(zip_path, "wb") as f:
-                    for chunk in r.iter_content(chunk_size=8192):
-                        if chunk:
-                            f.write(chunk)
-
-            # Extract and collect filenames
-            with zipfile.ZipFile(zip_path, "r") as zip_file:
-                downloaded_files = [Path(self.cachedir, f) for f in zip_file.namelist()]
-                zip_file.extractall(extract_dir)
+                if self.zip_mode == "stream":
+                    paths = extract_stream(chunks, self.download_dir, chunk_size=self.chunk_size)
+                else:
+                    # Stream download to disk
+                    with open(zip_path, "wb") as f:
+                        for chunk in chunks:
+                            if chunk:
+                                f.write(chunk)
+                    paths = None
 
-            return downloaded_files
+            if paths is None:
+                # Extract and collect filenames
+                paths = self._extract_zip_file(zip_path)
+            if self.store is not None:
+                self._add_extracted_to_store(paths)
+            job.status = "done"
+            return paths
 
         except requests.exceptions.RequestException as e:
-            print(f"Download failed: {e}")
+            logger.error("Download failed: %s", e)
+            job.status, job.error = "failed", e
             return []
-        except zipfile.BadZipFile as e:
-            print(f"Extraction failed: {e}")
+        except (zipfile.BadZipFile, ZipStreamError) as e:
+            logger.error("Extraction failed: %s", e)
+            job.status, job.error = "failed", e
             return []
         finally:
+            job.finished = self._finished = time.monotonic()
+            self._emit(job.status, job)
             if zip_path.exists():
                 try:
                     zip_path.unlink()
                 except Exception as e:
-                    print(f"Failed to delete ZIP file: {e}")
+                    logger.warning("Failed to delete ZIP file: %s", e)
+
+    def _add_extracted_to_store(self, paths):
+        """Move the files extracted from a ZIP download into the blob store."""
+        references = self._url_references()
+        jobs = []
+        for path in paths:
+            url = self._get_download_url(Path(path).relative_to(self.download_dir).as_posix())[0]
+            job = _DownloadJob(url, Path(path).name, references.get(url))
+            job.path = path
+            jobs.append(job)
+        self._add_to_store(jobs)
+
+    def _count_chunks(self, chunks, job):
+        """Pass through the chunks of a synchronous download, recording progress in job."""
+        for chunk in chunks:
+            job.bytes += len(chunk)
+            if time.monotonic() - job.last_progress >= self.progress_interval:
+                job.last_progress = time.monotonic()
+                self._emit("progress", job)
+            yield chunk
@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+
+
+def _combine_codes(codes, values):
+    """Return codes of the distinct combinations of codes and values (-1 where either is missing) and their number."""
+    value_codes, uniques = pd.factorize(values)
+    valid = (codes >= 0) & (value_codes >= 0)
+    combined = np.full(len(codes), -1, dtype=np.intp)
+    # renumbered, so that the codes stay smaller than the number of rows
+    combined[valid], distinct = pd.factorize(codes[valid] * len(uniques) + value_codes[valid])
+    return combined, len(distinct)
+
+
+def get_geometry(latitude, longitude, time=None, depth=None, events=0):
+    """Classify the geometry (topographic type) of data from the number of distinct locations, times and depths.
+
+    Rows with a missing value are not counted, as in DataFrame.groupby(). Distinct combinations are found by
+    hashing (pd.factorize), the columns are neither sorted nor grouped.
+
+    Parameters
+    ----------
+    latitude : array-like
+        Latitude of each row
+    longitude : array-like
+        Longitude of each row
+    time : array-like
+        Date/Time of each row or None
+    depth : array-like
+        Depth of each row or None
+    events : int
+        Number of events, a single event at one location is a timeSeries, several a timeSeriesStack
+
+    Returns
+    -------
+    str
+        'point', 'profile', 'timeSeries', 'timeSeriesStack', 'trajectory', 'timeSeriesProfile' or 'trajectoryProfile'
+    """
+    location, p = _combine_codes(pd.factorize(np.asarray(latitude))[0], np.asarray(longitude))
+    pz = pt = p
+    if time is not None:
+        pt = _combine_codes(location, np.asarray(time))[1]
+    if depth is not None:
+        pz = _combine_codes(location, np.asarray(depth))[1]
+    if p == 1:
+        if pt == 1 and pz == 1:
+            geotype = "point"
+        elif pt > 1:
+            if pz == 1 or events == 1:
+                geotype = "timeSeries"
+            else:
+                geotype = "timeSeriesStack"
+        else:
+            geotype = "profile"
+    else:
+        if p == pz:
+            geotype = "trajectory"
+        elif pt > pz:
+            geotype = "timeSeriesProfile"
+        else:
+            geotype = "trajectoryProfile"
+    return geotype
@@ -0,0 +1,222 @@
+from contextlib import closing
+import logging
+from pathlib import Path
+import pickle
+import sqlite3 as sl
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# time bounds of events without a date, in days since 1970
+NO_TIME = (-1e30, 1e30)
+
+# columns of the events returned by PanEventIndex.query
+EVENT_COLUMNS = ["dataset_id", "label", "latitude", "longitude", "latitude2", "longitude2", "datetime", "datetime2"]
+
+
+def to_days(value):
+    """Convert a date to days since 1970, None if it is missing or not a date."""
+    try:
+        timestamp = pd.Timestamp(value)
+    except (TypeError, ValueError, OverflowError):
+        return None
+    if pd.isna(timestamp):
+        return None
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.tz_convert(None)
+    return (timestamp - pd.Timestamp("1970-01-01")) / pd.Timedelta(days=1)
+
+
+def split_lon(west, east):
+    """Return the longitude ranges of a box, two ranges if it crosses the antimeridian (west > east)."""
+    if west > east:
+        return [(west, 180.0), (-180.0, east)]
+    return [(west, east)]
+
+
+class PanEventIndex:
+    """Spatial and temporal index of the events of cached datasets.
+
+    The positions (latitude/longitude to latitude2/longitude2) and times (datetime to datetime2) of the events
+    are kept as boxes in an SQLite R*Tree next to the cache, so that events and datasets within a bounding box
+    or time window are found without loading the cached datasets. Tracks crossing the antimeridian are stored
+    as two boxes. The R*Tree narrows the events down, the dates are checked exactly. Events without position
+    or date are left out of queries by bounding box or time window respectively.
+    Datasets are added to the index when they are cached (PanDataSet.to_pickle), the index of an existing
+    cache can be built with update_from_cache().
+
+    Parameters
+    ----------
+    cachedir : Path
+        The cache directory, by default .pangaeapy_cache in the home directory. The index is kept in cachedir/events.db
+
+    Attributes
+    ----------
+    dbpath : Path
+        Location of the sqlite database holding the index
+    """
+    def __init__(self, cachedir=None):
+        if cachedir is None:
+            cachedir = Path(Path.home(), ".pangaeapy_cache")
+        self.cachedir = Path(cachedir)
+        self.cachedir.mkdir(parents=True, exist_ok=True)
+        self.dbpath = Path(self.cachedir, "events.db")
+        with closing(sl.connect(self.dbpath)) as conn:
+            conn.execute("create table if not exists events (id integer PRIMARY KEY, dataset_id integer, label text,"
+                         " latitude real, longitude real, latitude2 real, longitude2 real, datetime text, datetime2 text,"
+                         " starttime real, endtime real)")
+            conn.execute("create index if not exists events_dataset on events (dataset_id)")
+            # the R*Tree holds 32 bit floats, its boxes are rounded outwards. The boxes of an event have the ids
+            # 2 * event id and 2 * event id + 1
+            conn.execute("create virtual table if not exists event_boxes using rtree(id, minlat, maxlat, minlon, maxlon,"
+                         " mintime, maxtime)")
+            conn.commit()
+
+    @staticmethod
+    def get_boxes(event, start, end):
+        """Return the boxes (minlat, maxlat, minlon, maxlon, mintime, maxtime) covering an event."""
+        lats = [lat for lat in (event.latitude, event.latitude2) if lat is not None and not np.isnan(lat)]
+        lons = [lon for lon in (event.longitude, event.longitude2) if lon is not None and not np.isnan(lon)]
+        if start is None:
+            mintime, maxtime = NO_TIME
+        else:
+            mintime, maxtime = min(start, end), max(start, end)
+        minlat, maxlat = (min(lats), max(lats)) if lats else (-90.0, 90.0)
+        if not lons:
+            return [(minlat, maxlat, -180.0, 180.0, mintime, maxtime)]
+        west, east = min(lons), max(lons)
+        if east - west > 180:
+            # the shorter way between the points crosses the antimeridian
+            west, east = east, west
+        return [(minlat, maxlat, lonmin, lonmax, mintime, maxtime) for lonmin, lonmax in split_lon(west, east)]
+
+    def add(self, dataset_id, events):
+        """Add the events of a dataset to the index, replacing the events indexed before.
+
+        Parameters
+        ----------
+        dataset_id : int
+            The id of the dataset
+        events : list of PanEvent
+            The events of the dataset
+        """
+        rows, boxes = [], []
+        with closing(sl.connect(self.dbpath)) as conn:
+            self._remove(conn, dataset_id)
+            event_id = conn.execute("select coalesce(max(id), 0) from events").fetchone()[0]
+            for event in events or []:
+                event_id += 1
+                start, end = to_days(event.datetime), to_days(event.datetime2)
+                if end is None:
+                    end = start
+                rows.append((event_id, int(dataset_id), event.label, event.latitude, event.longitude, event.latitude2,
+                             event.longitude2, None if event.datetime is None else str(event.datetime),
+                             None if event.datetime2 is None else str(event.datetime2), start, end))
+                boxes += [(2 * event_id + part,) + box for part, box in enumerate(self.get_boxes(event, start, end))]
+            conn.executemany("insert into events (id, dataset_id, label, latitude, longitude, latitude2, longitude2,"
+                             " datetime, datetime2, starttime, endtime) values (?,?,?,?,?,?,?,?,?,?,?)", rows)
+            conn.executemany("insert into event_boxes (id, minlat, maxlat, minlon, maxlon, mintime, maxtime)"
+                             " values (?,?,?,?,?,?,?)", boxes)
+            conn.commit()
+        logger.debug("Indexed %s events of dataset %s", len(rows), dataset_id)
+
+    @staticmethod
+    def _remove(conn, dataset_id):
+        conn.execute("delete from event_boxes where id in (select 2 * id from events where dataset_id=?"
+                     " union all select 2 * id + 1 from events where dataset_id=?)", (int(dataset_id), int(dataset_id)))
+        conn.execute("delete from events where dataset_id=?", (int(dataset_id),))
+
+    def remove(self, dataset_id):
+        """Remove the events of a dataset from the index."""
+        with closing(sl.connect(self.dbpath)) as conn:
+            self._remove(conn, dataset_id)
+            conn.commit()
+
+    def update_from_cache(self):
+        """Index the events of all datasets cached as pickle files in the cache directory.
+
+        Returns
+        -------
+            The number of indexed datasets
+        """
+        count = 0
+        for pickle_path in self.cachedir.rglob("*_data.pik"):
+            try:
+                with open(pickle_path, "rb") as f:
+                    state = pickle.load(f)
+                self.add(state["id"], state.get("events"))
+                count += 1
+            except Exception as e:
+                logger.warning("Could not index cache file %s: %s", pickle_path, e)
+        return count
+
+    def _select(self, columns, bbox, start, end):
+        """Return the SQL and parameters selecting the given columns of the events matching the query."""
+        conditions, params = [], []
+        box_conditions, box_params = [], []
+        if start is not None or end is not None:
+            window = start, end
+            start = to_days(start) if start is not None else NO_TIME[0]
+            end = to_days(end) if end is not None else NO_TIME[1]
+            if start is None or end is None:
+                raise ValueError(f"Invalid time window {window}")
+            box_conditions.append("maxtime>=? and mintime<=?")
+            box_params += [start, end]
+            # the boxes narrow the events down, the exact dates decide
+            conditions.append("e.endtime>=? and e.starttime<=?")
+            params += [start, end]
+        lonranges = [()]
+        if bbox is not None:
+            minlon, minlat, maxlon, maxlat = bbox
+            box_conditions.append("maxlat>=? and minlat<=?")
+            box_params += [minlat, maxlat]
+            lonranges = split_lon(minlon, maxlon)
+            conditions.append("coalesce(e.latitude, e.latitude2) is not null"
+                              " and coalesce(e.longitude, e.longitude2) is not null")
+        if box_conditions:
+            selects, select_params = [], []
+            for lonrange in lonranges:
+                selects.append("select id / 2 from event_boxes where " + " and ".join(box_conditions)
+                               + (" and maxlon>=? and minlon<=?" if lonrange else ""))
+                select_params += box_params + list(lonrange)
+            conditions.insert(0, "e.id in (" + " union ".join(selects) + ")")
+            params = select_params + params
+        sql = "select " + columns + " from events e"
+        if conditions:
+            sql += " where " + " and ".join(conditions)
+        return sql, params
+
+    def query(self, bbox=None, start=None, end=None):
+        """Return the events within a bounding box and time window.
+
+        Parameters
+        ----------
+        bbox : tuple of floats, optional
+            The bounding box following the GeoJSON specs -- (minlon, minlat, maxlon, maxlat). Boxes crossing the
+            antimeridian have minlon > maxlon
+        start : datetime-like, optional
+            The begin of the time window, events ending before are left out
+        end : datetime-like, optional
+            The end of the time window, events starting after are left out
+
+        Returns
+        -------
+            pd.DataFrame of the matching events with the columns EVENT_COLUMNS
+        """
+        sql, params = self._select(", ".join("e." + column for column in EVENT_COLUMNS), bbox, start, end)
+        with closing(sl.connect(self.dbpath)) as conn:
+            rows = conn.execute(sql + " order by e.id", params).fetchall()
+        return pd.DataFrame(rows, columns=EVENT_COLUMNS)
+
+    def datasets(self, bbox=None, start=None, end=None):
+        """Return the sorted ids of the datasets with events within a bounding box and time window, see query()."""
+        sql, params = self._select("distinct e.dataset_id", bbox, start, end)
+        with closing(sl.connect(self.dbpath)) as conn:
+            rows = conn.execute(sql + " order by e.dataset_id", params).fetchall()
+        return [row[0] for row in rows]
+
+    def __len__(self):
+        with closing(sl.connect(self.dbpath)) as conn:
+            return conn.execute("select count(*) from events").fetchone()[0]
@@ -0,0 +1,153 @@
+import hashlib
+import logging
+import os
+from contextlib import closing
+from pathlib import Path
+import shutil
+import sqlite3 as sl
+import stat
+
+logger = logging.getLogger(__name__)
+
+
+class PanBlobStore:
+    """Content-addressed store of the binary files downloaded from PANGAEA.
+
+    Every distinct file content is kept once as a blob named after its SHA-256 hash.
+    A manifest records the URL each blob was downloaded from and which dataset cells
+    (dataset id, row, column) reference it, so that files shared by several datasets
+    are downloaded and stored only once. The files returned to the user are hard links
+    into the store (or symbolic links or copies where hard links are not supported).
+    Blobs are read-only, since changing a linked file would change it for all datasets.
+
+    Parameters
+    ----------
+    root : Path
+        Directory of the store, the blobs are kept in root/blobs and the manifest in root/store.db
+
+    Attributes
+    ----------
+    blobdir : Path
+        Directory of the blobs
+    dbpath : Path
+        Location of the sqlite database holding the manifest
+    """
+    def __init__(self, root):
+        self.root = Path(root)
+        self.blobdir = Path(self.root, "blobs")
+        self.blobdir.mkdir(parents=True, exist_ok=True)
+        self.dbpath = Path(self.root, "store.db")
+        with closing(sl.connect(self.dbpath)) as conn:
+            conn.execute("create table if not exists blobs (hash text PRIMARY KEY, size integer, entry_date datetime default current_timestamp)")
+            conn.execute("create table if not exists urls (url text PRIMARY KEY, hash text)")
+            conn.execute("create table if not exists members (dataset_id text, row integer, col text, url text, hash text,"
+                         " PRIMARY KEY (dataset_id, row, col))")
+            conn.execute("create index if not exists members_hash on members (hash)")
+            conn.commit()
+
+    @staticmethod
+    def hash_file(path, chunk_size=1024 * 1024):
+        """Return the hex SHA-256 digest of a file."""
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def blob_path(self, digest):
+        """Return the location of the blob with the given hash."""
+        return Path(self.blobdir, digest[:2], digest)
+
+    def lookup_url(self, url):
+        """Return the hash of the blob downloaded from url, or None if it is not in the store."""
+        with closing(sl.connect(self.dbpath)) as conn:
+            row = conn.execute("select hash from urls where url=?", (url,)).fetchone()
+        if row and self.blob_path(row[0]).exists():
+            return row[0]
+        return None
+
+    def add_file(self, path, url=None):
+        """Move a file into the store.
+
+        If a blob with the same content already exists, the file is dropped instead.
+        The file itself is replaced by a link to the blob.
+
+        Parameters
+        ----------
+        path : Path
+            The file to add
+        url : str
+            The URL the file was downloaded from, if known
+
+        Returns
+        -------
+            The hash of the file content
+        """
+        path = Path(path)
+        digest = self.hash_file(path)
+        blob = self.blob_path(digest)
+        if not blob.exists():
+            blob.parent.mkdir(exist_ok=True)
+            tmp = blob.with_name(blob.name + ".part")
+            try:
+                path.replace(tmp)
+            except OSError:  # store on another file system
+                shutil.copyfile(path, tmp)
+            os.chmod(tmp, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+            tmp.replace(blob)
+        else:
+            logger.debug("Content of %s is already stored as %s", path, digest)
+        with closing(sl.connect(self.dbpath)) as conn:
+            conn.execute("insert or ignore into blobs (hash, size) values (?,?)", (digest, blob.stat().st_size))
+            if url is not None:
+                conn.execute("insert or replace into urls (url, hash) values (?,?)", (url, digest))
+            conn.commit()
+        self.link(digest, path)
+        return digest
+
+    def link(self, digest, target):
+        """Make target refer to the blob with the given hash.
+
+        A hard link is created if possible, otherwise a symbolic link or, as last resort, a copy.
+        """
+        blob = self.blob_path(digest)
+        target = Path(target)
+        if target.exists() and os.path.samefile(blob, target):
+            return target
+        tmp = target.with_name(target.name + ".link")
+        tmp.unlink(missing_ok=True)
+        try:
+            os.link(blob, tmp)
+        except OSError:
+            try:
+                os.symlink(blob.resolve(), tmp)
+            except OSError:
+                shutil.copyfile(blob, tmp)
+        tmp.replace(target)
+        return target
+
+    def add_members(self, members):
+        """Record which dataset cells reference which blobs.
+
+        Parameters
+        ----------
+        members : iterable of tuples
+            (dataset_id, row, column, url, hash) for every cell
+        """
+        with closing(sl.connect(self.dbpath)) as conn:
+            conn.executemany("insert or replace into members (dataset_id, row, col, url, hash) values (?,?,?,?,?)",
+                             [(str(dataset_id), int(row), col, url, digest)
+                              for dataset_id, row, col, url, digest in members])
+            conn.commit()
+
+    def members(self, dataset_id):
+        """Return the cells of a dataset recorded in the store.
+
+        Returns
+        -------
+            List of (row, column, url, hash, blob path) tuples ordered by row and column
+        """
+        with closing(sl.connect(self.dbpath)) as conn:
+            rows = conn.execute("select row, col, url, hash from members where dataset_id=? order by row, col",
+                                (str(dataset_id),)).fetchall()
+        return [(row, col, url, digest, self.blob_path(digest)) for row, col, url, digest in rows]
@@ -5,13 +5,23 @@
 
 Test the PanDataSet class
 """
+import asyncio
 import io
+import os
+
+import aiohttp
+from aiohttp import web
+import numpy as np
 import pandas as pd
-from pangaeapy.pandataset import PanDataSet, PanDataHarvester
+from pangaeapy._zipstream import extract_stream
+from pangaeapy.pandataset import PanDataSet, PanDataHarvester, PanEvent, _BackgroundLoop
+from pangaeapy.pangeometry import get_geometry
 from pathlib import Path
 import pytest
 import re
+import time
 import zipfile
+import zlib
 
 
 # needed for the zip download test
@@ -58,12 +68,97 @@ def test_default_cachedir(mocker):
     mock_makedirs.assert_any_call(parents=True, exist_ok=True)
 
 
+@pytest.mark.parametrize(
+    "latitude, longitude, time, depth, expected",
+    [
+        ([1, 1], [2, 2], ["2020-01-01", "2020-01-01"], [5, 5], "point"),
+        ([1, 1, 1], [2, 2, 2], ["2020-01-01", "2020-01-01", "2020-01-01"], [0, 10, 20], "profile"),
+        ([1, 1, 1], [2, 2, 2], ["2020-01-01", "2020-01-02", "2020-01-03"], [5, 5, 5], "timeSeries"),
+        ([1, 2, 3], [2, 3, 4], ["2020-01-01", "2020-01-02", "2020-01-03"], [5, 5, 5], "trajectory"),
+    ],
+)
+def test_geometry_of_original_columns(mocker, tmp_path, latitude, longitude, time, depth, expected):
+    """The geometry is detected from the original 'Date/Time' and 'Depth water' columns"""
+    mocker.patch.object(PanDataSet, "setMetadata")
+    mocker.patch.object(PanDataSet, "setData")
+    ds = PanDataSet(999999, cachedir=tmp_path)
+    ds.events = [PanEvent("E1")]
+    ds.data = pd.DataFrame({"Latitude": latitude, "Longitude": longitude, "Date/Time": pd.to_datetime(time),
+                            "Depth water": depth})
+    assert ds.get_coordinate_columns() == ("Date/Time", "Depth water")
+    assert ds.getGeometry() == expected
+    ds.terms_conn.close()
+
+
 def test_custom_cachedir(tmp_path):
     ds = PanDataSet(968912, enable_cache=True, cachedir=tmp_path)
     assert ds.cachedir == tmp_path
     ds.terms_conn.close()  # explicitly close the sqlite database
 
 
+@pytest.mark.parametrize(
+    "latitude, longitude, time, depth, events, expected",
+    [
+        ([1, 1], [2, 2], [0, 0], [5, 5], 1, "point"),
+        ([1, 1, 1], [2, 2, 2], [0, 0, 0], [0, 10, 20], 1, "profile"),
+        ([1, 1, 1], [2, 2, 2], [0, 1, 2], [5, 5, 5], 1, "timeSeries"),
+        ([1, 1, 1, 1], [2, 2, 2, 2], [0, 1, 0, 1], [0, 0, 10, 10], 2, "timeSeriesStack"),
+        ([1, 2, 3], [2, 3, 4], [0, 1, 2], [5, 5, 5], 1, "trajectory"),
+        ([1, 1, 2, 2], [2, 2, 3, 3], [0, 0, 1, 1], [0, 10, 0, 10], 2, "trajectoryProfile"),
+        ([1, 1, 1, 1, 2, 2, 2, 2], [2, 2, 2, 2, 3, 3, 3, 3], [0, 1, 2, 0, 0, 1, 2, 3], [0, 0, 0, 10, 0, 0, 10, np.nan], 2,
+         "timeSeriesProfile"),
+    ],
+)
+def test_get_geometry(latitude, longitude, time, depth, events, expected):
+    assert get_geometry(latitude, longitude, time, depth, events) == expected
+
+
+def test_geometry_cached(mocker, tmp_path):
+    mocker.patch.object(PanDataSet, "setMetadata")
+    mocker.patch.object(PanDataSet, "setData")
+    ds = PanDataSet(999999, cachedir=tmp_path)
+    ds.events = [PanEvent("E1")]
+    ds.data = pd.DataFrame({"Latitude": [1.0, 1.0, np.nan], "Longitude": [2.0, 2.0, 2.0],
+                            "Date/Time": pd.to_datetime(["2020-01-01", "2020-01-01", "2020-01-02"]),
+                            "Depth water": [0.0, 10.0, 20.0]})
+    spy = mocker.spy(pd, "factorize")
+
+    assert ds.getGeometry() == "profile"
+    calls = spy.call_count
+    assert ds.getGeometry() == "profile"
+    assert spy.call_count == calls
+    # replacing the data resets the cache
+    ds.data = ds.data.assign(**{"Date/Time": pd.to_datetime(["2020-01-01", "2020-01-02", "2020-01-02"])})
+    assert ds.getGeometry() == "timeSeries"
+    ds.terms_conn.close()
+
+
+def test_geometry_cache_notices_changed_values(mocker, tmp_path):
+    mocker.patch.object(PanDataSet, "setMetadata")
+    mocker.patch.object(PanDataSet, "setData")
+    ds = PanDataSet(999999, cachedir=tmp_path)
+    ds.events = [PanEvent("E1")]
+    ds.data = pd.DataFrame({"Latitude": [1.0, 1.0], "Longitude": [2.0, 2.0],
+                            "Date/Time": pd.to_datetime(["2020-01-01", "2020-01-01"]), "Depth water": [1.0, 1.0]})
+
+    assert ds.getGeometry() == "point"
+    ds.data.loc[1, "Depth water"] = 5.0
+    assert ds.getGeometry() == "profile"
+    ds.terms_conn.close()
+
+
+def test_save_csv_logs_path(mocker, tmp_path, capsys):
+    mocker.patch.object(PanDataSet, "setMetadata")
+    mocker.patch.object(PanDataSet, "setData")
+    ds = PanDataSet(999999, cachedir=tmp_path)
+    ds.data = pd.DataFrame({"Latitude": [1.0], "Longitude": [2.0]})
+
+    assert ds._save_csv() == [tmp_path / "999999_data.csv"]
+    assert capsys.readouterr().out == ""
+    assert any(entry.get("INFO", "").startswith(f"Dataset saved to {tmp_path}") for entry in ds.logging)
+    ds.terms_conn.close()
+
+
 @pytest.mark.parametrize(
     "indices, columns, expected_exception",
     [
@@ -105,7 +200,7 @@ class TestPanDataHarvester:
         ids=["invalid_token", "valid_token"]
     )
     def test_download_zip_file(
-            self, mocker, mock_pandataset, requests_mock, capsys, filenames, auth_token, status_code, expected_error
+            self, mocker, mock_pandataset, requests_mock, caplog, filenames, auth_token, status_code, expected_error
     ):
         """Test the download of complete binary data sets via the zip download link"""
 
@@ -126,6 +221,9 @@ class TestPanDataHarvester:
             def extractall(self, path):
                 pass  # do nothing
 
+            def extract(self, member, path):
+                pass  # do nothing
+
         ds = mock_pandataset
         ds.auth_token = auth_token  # Set token for this test case
 
@@ -142,16 +240,505 @@ class TestPanDataHarvester:
         # initiate the harvester with the mock_pandataset
         harvester = PanDataHarvester(ds)
         result = harvester.run_download()
-        # capture console output
-        captured = capsys.readouterr()
+        # capture log output
 
         # handle the two test cases
         if expected_error:
-            assert expected_error in captured.out
+            assert expected_error in caplog.text
             assert result == []
         else:
             # Build expected filepaths
             expected_filepaths = [
-                ds.cachedir / f"{fname}" for fname in filenames
+                ds.cachedir / ds.id / f"{fname}" for fname in filenames
             ]
             assert result == expected_filepaths
+
+
+    @pytest.mark.parametrize("seekable", [True, False], ids=["sizes_in_header", "data_descriptors"])
+    def test_download_zip_file_streaming(self, mock_pandataset, requests_mock, seekable):
+        """Test the extraction of the zip file while it is downloaded"""
+
+        class Unseekable(io.RawIOBase):
+            # zipfile writes data descriptors when the target is not seekable
+            def __init__(self):
+                self.buffer = io.BytesIO()
+
+            def writable(self):
+                return True
+
+            def write(self, b):
+                return self.buffer.write(b)
+
+        members = {"a.txt": b"a" * 10000, "sub/b.bin": bytes(range(256)) * 50, "../evil.txt": b"evil"}
+        target = io.BytesIO() if seekable else Unseekable()
+        with zipfile.ZipFile(target, "w") as zf:
+            zf.writestr("sub/", b"")
+            zf.writestr("a.txt", members["a.txt"], compress_type=zipfile.ZIP_DEFLATED)
+            zf.writestr("sub/b.bin", members["sub/b.bin"], compress_type=zipfile.ZIP_STORED if seekable else zipfile.ZIP_DEFLATED)
+            zf.writestr("../evil.txt", members["../evil.txt"], compress_type=zipfile.ZIP_DEFLATED)
+        content = target.getvalue() if seekable else target.buffer.getvalue()
+        matcher = re.compile(r"https://download\.pangaea\.de/dataset/\d+/allfiles\.zip")
+        requests_mock.get(matcher, content=content)
+
+        harvester = PanDataHarvester(mock_pandataset, zip_mode="stream", chunk_size=1000)
+        result = harvester.download_zip_file()
+
+        download_dir = mock_pandataset.cachedir / mock_pandataset.id
+        assert result == [download_dir / "a.txt", download_dir / "sub" / "b.bin", download_dir / "evil.txt"]
+        assert [f.read_bytes() for f in result] == list(members.values())
+        assert not (download_dir / "allfiles.zip").exists()
+
+    def test_zip_stream_inflates_in_chunks(self, mocker, tmp_path):
+        """Highly compressed members are not inflated into memory at once"""
+        decompressobj = zlib.decompressobj
+        sizes = []
+
+        class Recording:
+            def __init__(self, *args):
+                self._decompressor = decompressobj(*args)
+
+            def __getattr__(self, name):
+                return getattr(self._decompressor, name)
+
+            def decompress(self, data, max_length=0):
+                data = self._decompressor.decompress(data, max_length)
+                sizes.append(len(data))
+                return data
+
+        mocker.patch("zlib.decompressobj", Recording)
+        content = io.BytesIO()
+        with zipfile.ZipFile(content, "w") as zf:
+            zf.writestr("zeros.bin", bytes(5_000_000), compress_type=zipfile.ZIP_DEFLATED)
+        content = content.getvalue()
+
+        result = extract_stream((content[i:i + 500] for i in range(0, len(content), 500)), tmp_path, chunk_size=1000)
+
+        assert result[0].read_bytes() == bytes(5_000_000)
+        assert max(sizes) == 1000
+
+
+@pytest.fixture
+def file_server(tmp_path):
+    """Serve the files of a temporary directory via a local aiohttp server.
+
+    Returns a function running a coroutine factory, which receives the base URL of the server.
+    Additional request handlers can be given as a dict of paths and handler functions.
+    """
+    served_dir = tmp_path / "served"
+    served_dir.mkdir()
+
+    def run(coro_factory, handlers=None):
+        async def main():
+            app = web.Application()
+            for path, handler in (handlers or {}).items():
+                app.router.add_get(path, handler)
+            app.router.add_static("/", served_dir)
+            runner = web.AppRunner(app)
+            await runner.setup()
+            site = web.TCPSite(runner, "127.0.0.1", 0)
+            await site.start()
+            port = runner.addresses[0][1]
+            try:
+                return await coro_factory(f"http://127.0.0.1:{port}")
+            finally:
+                await runner.cleanup()
+        return asyncio.run(main())
+
+    run.served_dir = served_dir
+    return run
+
+
+class TestResumableDownload:
+    """Test the resumption of interrupted downloads via HTTP range requests"""
+
+    @staticmethod
+    async def _download(harvester, url, filename):
+        async with aiohttp.ClientSession() as session:
+            return await harvester._download_file(session, url, filename)
+
+    def test_resume_part_file(self, mock_pandataset, file_server):
+        content = bytes(range(256)) * 1000
+        (file_server.served_dir / "big.bin").write_bytes(content)
+        harvester = PanDataHarvester(mock_pandataset)
+        # simulate an interrupted transfer
+        partpath = Path(harvester.download_dir, "big.bin.part")
+        partpath.write_bytes(content[:10000])
+
+        result = file_server(lambda base: self._download(harvester, f"{base}/big.bin", "big.bin"))
+
+        assert result == Path(harvester.download_dir, "big.bin")
+        assert result.read_bytes() == content
+        assert not partpath.exists()
+
+    def test_changed_file_is_not_resumed(self, mock_pandataset, file_server):
+        old, new = b"a" * 5000, b"b" * 5000
+        requests = []
+
+        async def handler(request):
+            # honours the range only if the file did not change since the part file was started
+            requests.append(dict(request.headers))
+            if "Range" in request.headers and request.headers.get("If-Range") == '"v2"':
+                offset = int(request.headers["Range"][6:-1])
+                return web.Response(status=206, body=new[offset:], headers={
+                    "ETag": '"v2"', "Content-Range": f"bytes {offset}-{len(new) - 1}/{len(new)}"})
+            return web.Response(body=new, headers={"ETag": '"v2"'})
+
+        harvester = PanDataHarvester(mock_pandataset)
+        partpath = Path(harvester.download_dir, "changed.bin.part")
+        partpath.write_bytes(old[:1000])
+        harvester.manifest.set_part_validator(partpath, '"v1"')
+
+        result = file_server(lambda base: self._download(harvester, f"{base}/changed.bin", "changed.bin"),
+                             handlers={"/changed.bin": handler})
+
+        assert requests[0]["If-Range"] == '"v1"'
+        assert result.read_bytes() == new
+        assert harvester.manifest.part_validator(partpath) is None
+
+    def test_complete_part_file_is_renamed(self, mock_pandataset, file_server):
+        content = b"complete content"
+        (file_server.served_dir / "small.bin").write_bytes(content)
+        harvester = PanDataHarvester(mock_pandataset)
+        partpath = Path(harvester.download_dir, "small.bin.part")
+        partpath.write_bytes(content)
+
+        result = file_server(lambda base: self._download(harvester, f"{base}/small.bin", "small.bin"))
+
+        assert result.read_bytes() == content
+        assert not partpath.exists()
+
+    def test_truncated_file_is_not_skipped(self, mock_pandataset, file_server):
+        content = b"x" * 5000
+        (file_server.served_dir / "data.bin").write_bytes(content)
+        harvester = PanDataHarvester(mock_pandataset)
+        Path(harvester.download_dir, "data.bin").write_bytes(content[:100])
+
+        result = file_server(lambda base: self._download(harvester, f"{base}/data.bin", "data.bin"))
+
+        assert result.read_bytes() == content
+
+
+class TestDownloadPlanning:
+    """Test the selection of files, which need to be transferred"""
+
+    def test_list_available_data_skips_nan_and_duplicates(self, mock_pandataset):
+        mock_pandataset.data = pd.DataFrame({"Binary": ["a.nc", None, "b.nc", "a.nc", float("nan"), ""]})
+        harvester = PanDataHarvester(mock_pandataset)
+        assert harvester._list_available_data() == ["a.nc", "b.nc"]
+
+    def test_existing_files_are_not_transferred(self, mocker, mock_pandataset, file_server):
+        for name in ["a.bin", "b.bin"]:
+            (file_server.served_dir / name).write_bytes(name.encode() * 100)
+
+        async def run(base):
+            mock_pandataset.data = pd.DataFrame({"URL": [f"{base}/a.bin", f"{base}/b.bin", f"{base}/a.bin"]})
+            mock_pandataset.columns = ["URL"]
+            harvester = PanDataHarvester(mock_pandataset)
+            # a.bin was downloaded before, b.bin was interrupted
+            Path(harvester.download_dir, "a.bin").write_bytes(b"a.bin" * 100)
+            Path(harvester.download_dir, "b.bin").write_bytes(b"b.bin")
+            spy = mocker.spy(harvester, "_download_file")
+            result = await harvester.download_files()
+            return harvester, spy, result
+
+        harvester, spy, result = file_server(run)
+
+        assert [call.args[2] for call in spy.call_args_list] == ["b.bin"]
+        assert result == [Path(harvester.download_dir, "a.bin"), Path(harvester.download_dir, "b.bin")]
+        assert result[1].read_bytes() == b"b.bin" * 100
+        # the transferred file is recorded in the manifest
+        assert harvester.manifest.lookup(f"{spy.call_args.args[1]}") == (str(result[1]), 500)
+
+
+class TestBlobStore:
+    """Test the deduplication of downloads in the content-addressed store"""
+
+    def test_store_is_optional(self, mock_pandataset):
+        harvester = PanDataHarvester(mock_pandataset)
+        assert harvester.store is None
+        assert not Path(mock_pandataset.cachedir, "store").exists()
+
+    def test_shared_files_are_stored_once(self, mocker, mock_pandataset, file_server):
+        for name in ["a.bin", "copy.bin"]:
+            (file_server.served_dir / name).write_bytes(b"same content")
+
+        async def run(base):
+            mock_pandataset.data = pd.DataFrame({"URL": [f"{base}/a.bin", f"{base}/copy.bin"]})
+            mock_pandataset.columns = ["URL"]
+            first = PanDataHarvester(mock_pandataset, use_store=True)
+            first_result = await first.download_files()
+            # another dataset referencing a.bin
+            mock_pandataset.id = "654321"
+            mock_pandataset.data = pd.DataFrame({"URL": [None, f"{base}/a.bin"]})
+            second = PanDataHarvester(mock_pandataset, use_store=True)
+            spy = mocker.spy(second, "_download_file")
+            second_result = await second.download_files()
+            return first, first_result, second_result, spy
+
+        harvester, first_result, second_result, spy = file_server(run)
+
+        spy.assert_not_called()
+        assert second_result == [Path(mock_pandataset.cachedir, "654321", "a.bin")]
+        assert second_result[0].read_bytes() == b"same content"
+        # identical files share one blob
+        blob = harvester.store.blob_path(harvester.store.hash_file(first_result[0]))
+        assert all(os.path.samefile(path, blob) for path in first_result + second_result)
+        assert len(list(harvester.store.blobdir.glob("*/*"))) == 1
+        assert [(row, col) for row, col, *_ in harvester.store.members("654321")] == [(1, "URL")]
+
+
+class TestStreamingOpen:
+    """Test reading binary files without downloading them first"""
+
+    def test_open_with_spill(self, mock_pandataset, file_server):
+        (file_server.served_dir / "a.csv").write_bytes(b"x,y\n" + b"1,2\n" * 1000)
+
+        async def run(base):
+            mock_pandataset.data = pd.DataFrame({"URL": [f"{base}/a.csv"]})
+            mock_pandataset.columns = ["URL"]
+            harvester = PanDataHarvester(mock_pandataset, chunk_size=1000)
+            with await asyncio.to_thread(harvester.open, 0, "URL", True) as f:
+                streamed = await asyncio.to_thread(pd.read_csv, f)
+            with harvester.open(0, "URL") as f:  # served from the cache without a request
+                cached = f.read()
+            return harvester, streamed, cached
+
+        harvester, streamed, cached = file_server(run)
+
+        assert streamed.shape == (1000, 2)
+        assert cached == b"x,y\n" + b"1,2\n" * 1000
+        assert harvester.manifest.lookup(harvester._member(0, "URL")[0]) is not None
+
+    def test_spill_keeps_partial_download(self, mock_pandataset, file_server):
+        """Spilling does not overwrite the .part file of a download, incomplete copies are discarded"""
+        (file_server.served_dir / "a.bin").write_bytes(b"a" * 10_000)
+
+        async def run(base):
+            mock_pandataset.data = pd.DataFrame({"URL": [f"{base}/a.bin"]})
+            mock_pandataset.columns = ["URL"]
+            harvester = PanDataHarvester(mock_pandataset, chunk_size=1000)
+            partpath = harvester._part_path(Path(harvester.download_dir, "a.bin"))
+            partpath.write_bytes(b"a" * 4000)
+            harvester.manifest.set_part_validator(partpath, '"v1"')
+            with await asyncio.to_thread(harvester.open, 0, "URL", True) as f:
+                await asyncio.to_thread(f.read, 1000)
+            incomplete = sorted(p.name for p in harvester.download_dir.iterdir())
+            with await asyncio.to_thread(harvester.open, 0, "URL", True) as f:
+                content = await asyncio.to_thread(f.read)
+            return harvester, partpath, incomplete, content
+
+        harvester, partpath, incomplete, content = file_server(run)
+
+        assert incomplete == ["a.bin.part"]
+        assert partpath.read_bytes() == b"a" * 4000
+        assert harvester.manifest.part_validator(partpath) == '"v1"'
+        assert content == Path(harvester.download_dir, "a.bin").read_bytes() == b"a" * 10_000
+
+    def test_open_is_rate_limited(self, mock_pandataset, file_server):
+        (file_server.served_dir / "a.bin").write_bytes(b"x" * 200_000)
+
+        async def run(base):
+            mock_pandataset.data = pd.DataFrame({"URL": [f"{base}/a.bin"]})
+            mock_pandataset.columns = ["URL"]
+            harvester = PanDataHarvester(mock_pandataset, chunk_size=20_000, max_bytes_per_second=1_000_000)
+            start = time.monotonic()
+            with await asyncio.to_thread(harvester.open, 0, "URL") as f:
+                content = await asyncio.to_thread(f.read)
+            return content, time.monotonic() - start
+
+        content, elapsed = file_server(run)
+
+        assert len(content) == 200_000
+        assert elapsed >= 0.15
+
+    def test_iter_bytes_without_spill(self, mock_pandataset, file_server):
+        (file_server.served_dir / "a.bin").write_bytes(bytes(range(256)) * 100)
+
+        async def run(base):
+            mock_pandataset.data = pd.DataFrame({"URL": [f"{base}/a.bin"]})
+            mock_pandataset.columns = ["URL"]
+            harvester = PanDataHarvester(mock_pandataset, chunk_size=1000)
+            chunks = [chunk async for chunk in harvester.iter_bytes(0, "URL")]
+            return harvester, chunks
+
+        harvester, chunks = file_server(run)
+
+        assert b"".join(chunks) == bytes(range(256)) * 100
+        assert max(len(chunk) for chunk in chunks) <= 1000
+        assert not any(harvester.download_dir.iterdir())
+
+
+class TestTapeStaging:
+    """Test the scheduling of files, which are being retrieved from tape"""
+
+    def test_staging_file_does_not_block_ready_files(self, mock_pandataset, file_server):
+        mock_pandataset.columns = ["URL"]
+        harvester = PanDataHarvester(mock_pandataset)
+        states = []
+
+        async def tape_handler(request):
+            # the queue state seen by the n-th request for tape.bin
+            states.append(harvester.queue_state())
+            if len(states) < 3:
+                return web.Response(status=503, text="Retrieving from tape")
+            return web.Response(body=b"from tape")
+
+        async def ready_handler(request):
+            states.append(harvester.queue_state())
+            return web.Response(body=b"ready")
+
+        async def run(base):
+            harvester.data = pd.DataFrame({"URL": [f"{base}/tape/tape.bin", f"{base}/ready.bin"]})
+            harvester.max_concurrent = 1
+            harvester.staging_backoff = 0.05
+            result = await harvester.download_files()
+            return harvester, result
+
+        harvester, result = file_server(run, handlers={"/tape/tape.bin": tape_handler, "/ready.bin": ready_handler})
+
+        assert [f.read_bytes() for f in result] == [b"from tape", b"ready"]
+        # the single download slot was free for ready.bin while tape.bin was staged
+        assert states[1]["staging_files"][0]["filename"] == "tape.bin"
+        assert states[1]["active"] == 1
+        assert states[2]["done"] == 1
+        assert harvester.queue_state()["done"] == 2
+
+    def test_staging_retries_are_limited(self, mock_pandataset, file_server):
+        async def tape_handler(request):
+            return web.Response(status=503)
+
+        async def run(base):
+            mock_pandataset.data = pd.DataFrame({"URL": [f"{base}/tape/tape.bin"]})
+            mock_pandataset.columns = ["URL"]
+            harvester = PanDataHarvester(mock_pandataset)
+            harvester.staging_backoff = 0.01
+            harvester.max_staging_retries = 2
+            return harvester, await harvester.download_files()
+
+        harvester, result = file_server(run, handlers={"/tape/tape.bin": tape_handler})
+
+        assert result == []
+        assert harvester.queue_state()["failed"] == 1
+
+
+def test_retry_after_date(mocker, mock_pandataset, file_server):
+    """A 429 response with an HTTP date as Retry-After is retried after the default delay"""
+    requests = []
+
+    async def busy_handler(request):
+        requests.append(request)
+        if len(requests) == 1:
+            return web.Response(status=429, headers={"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"})
+        return web.Response(body=b"content")
+
+    async def run(base):
+        mock_pandataset.data = pd.DataFrame({"URL": [f"{base}/busy.bin"]})
+        mock_pandataset.columns = ["URL"]
+        events = []
+        harvester = PanDataHarvester(mock_pandataset, progress_callback=events.append)
+        return await harvester.download_files(), events
+
+    sleep = mocker.patch("pangaeapy.pandataset.asyncio.sleep", mocker.AsyncMock())
+    result, events = file_server(run, handlers={"/busy.bin": busy_handler})
+
+    assert [f.read_bytes() for f in result] == [b"content"]
+    assert [event["delay"] for event in events if event["event"] == "retry"] == [10]
+    sleep.assert_any_await(10)
+
+
+def test_bandwidth_cap(mock_pandataset, file_server):
+    """The total throughput of a harvester is limited by max_bytes_per_second"""
+    for name in ["a.bin", "b.bin"]:
+        (file_server.served_dir / name).write_bytes(b"x" * 200_000)
+
+    async def run(base):
+        mock_pandataset.data = pd.DataFrame({"URL": [f"{base}/a.bin", f"{base}/b.bin"]})
+        mock_pandataset.columns = ["URL"]
+        harvester = PanDataHarvester(mock_pandataset, chunk_size=20_000, max_bytes_per_second=2_000_000)
+        start = time.monotonic()
+        result = await harvester.download_files()
+        return result, time.monotonic() - start
+
+    result, elapsed = file_server(run)
+
+    assert [f.stat().st_size for f in result] == [200_000, 200_000]
+    assert elapsed >= 0.15
+
+
+def test_download_stats(mock_pandataset, file_server):
+    """Progress events and statistics are reported for every file"""
+    (file_server.served_dir / "a.bin").write_bytes(b"x" * 50_000)
+    events = []
+
+    async def run(base):
+        mock_pandataset.data = pd.DataFrame({"URL": [f"{base}/a.bin", f"{base}/missing.bin"]})
+        mock_pandataset.columns = ["URL"]
+        harvester = PanDataHarvester(mock_pandataset, chunk_size=10_000, progress_callback=events.append,
+                                     progress_interval=0)
+        await harvester.download_files()
+        return harvester.stats()
+
+    stats = file_server(run)
+
+    assert stats["files"]["done"] == 1 and stats["files"]["failed"] == 1
+    assert stats["bytes"] == 50_000
+    assert stats["throughput"] > 0
+    assert stats["retries"] == 3
+    by_file = {entry["filename"]: entry for entry in stats["per_file"]}
+    assert by_file["a.bin"]["size"] == 50_000
+    assert by_file["missing.bin"]["status"] == "failed"
+    a_events = [e["event"] for e in events if e["filename"] == "a.bin"]
+    assert a_events[0] == "started" and a_events[-1] == "done"
+    assert "progress" in a_events
+
+
+class TestEventLoops:
+    """Test the download from synchronous and asynchronous code"""
+
+    def test_run_download_inside_running_loop(self, mocker, mock_pandataset):
+        mock_pandataset.data_index = [0]
+        harvester = PanDataHarvester(mock_pandataset)
+
+        async def download_files():
+            await asyncio.sleep(0)
+            return ["downloaded"]
+
+        mocker.patch.object(harvester, "download_files", side_effect=download_files)
+
+        async def main():
+            # synchronous call while the loop of this thread is running
+            return harvester.run_download()
+
+        assert asyncio.run(main()) == ["downloaded"]
+
+    def test_run_download_on_background_loop_raises(self, mocker, mock_pandataset):
+        mock_pandataset.data_index = [0]
+        harvester = PanDataHarvester(mock_pandataset)
+
+        async def download_files():
+            return ["downloaded"]
+
+        mocker.patch.object(harvester, "download_files", side_effect=download_files)
+
+        async def nested():
+            # e.g. a progress_callback calling the synchronous download
+            await asyncio.sleep(0)
+            return harvester.run_download()
+
+        async def main():
+            return _BackgroundLoop.run(nested())
+
+        with pytest.raises(RuntimeError, match="download_async"):
+            asyncio.run(main())
+
+    def test_download_async(self, mock_pandataset, file_server):
+        (file_server.served_dir / "a.bin").write_bytes(b"content")
+
+        async def run(base):
+            mock_pandataset.data = pd.DataFrame({"URL": [f"{base}/a.bin"]})
+            mock_pandataset.columns = ["URL"]
+            harvester = PanDataHarvester(mock_pandataset)
+            return await harvester.download_async()
+
+        result = file_server(run)
+        assert result[0].read_bytes() == b"content"
@@ -0,0 +1,82 @@
+"""
+Test the PanEventIndex class
+"""
+import pandas as pd
+import pytest
+
+from pangaeapy.pandataset import PanDataSet, PanEvent
+from pangaeapy.panindex import PanEventIndex
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = PanEventIndex(tmp_path)
+    index.add(1, [PanEvent("A", latitude=10.0, longitude=20.0, datetime="2000-01-01T12:00:00"),
+                  PanEvent("B", latitude=-10.0, longitude=20.0, datetime="2010-06-01")])
+    # a track crossing the antimeridian and an event without position and date
+    index.add(2, [PanEvent("C", latitude=0.0, longitude=179.0, latitude2=1.0, longitude2=-179.0,
+                           datetime="2005-01-01", datetime2="2005-02-01"),
+                  PanEvent("D")])
+    return index
+
+
+def test_query_bbox(index):
+    assert index.query(bbox=(15, 5, 25, 15))["label"].tolist() == ["A"]
+    assert index.datasets(bbox=(15, -15, 25, 15)) == [1]
+    # the track is found on both sides of the antimeridian, but not in between
+    assert index.query(bbox=(-179.5, -1, -179, 2))["label"].tolist() == ["C"]
+    assert index.query(bbox=(179.5, -1, 179.9, 2))["label"].tolist() == ["C"]
+    assert index.query(bbox=(-170, -1, 170, 2)).empty
+    # a box crossing the antimeridian
+    assert index.datasets(bbox=(170, -5, -170, 5)) == [2]
+
+
+def test_query_time(index):
+    assert index.query(start="2000-01-01", end="2000-01-02")["label"].tolist() == ["A"]
+    assert index.query(start="2005-01-15", end=pd.Timestamp("2005-01-16"))["label"].tolist() == ["C"]
+    assert index.datasets(start="2004-12-31") == [1, 2]
+    assert index.query(bbox=(0, -20, 30, 20), end="2009-12-31")["label"].tolist() == ["A"]
+    with pytest.raises(ValueError):
+        index.query(start="no date")
+
+
+def test_add_replaces_events(index):
+    assert len(index) == 4
+    index.add(1, [PanEvent("E", latitude=50.0, longitude=8.0)])
+    assert len(index) == 3
+    assert index.query(bbox=(15, 5, 25, 15)).empty
+    index.remove(2)
+    assert index.query()["label"].tolist() == ["E"]
+
+
+def test_pickled_dataset_is_indexed(mocker, tmp_path):
+    mocker.patch.object(PanDataSet, "setMetadata")
+    mocker.patch.object(PanDataSet, "setData")
+    ds = PanDataSet(999999, cachedir=tmp_path)
+    ds.events = [PanEvent("PS1/1", latitude=70.0, longitude=-10.0, datetime="2020-07-01T00:00:00")]
+    ds.data = pd.DataFrame({"Event": ["PS1/1"], "Temp": [1.0]})
+    ds.to_pickle()
+    ds.terms_conn.close()
+
+    assert PanEventIndex(tmp_path).datasets(bbox=(-20, 60, 0, 80), start="2020-01-01") == [999999]
+    # an index of the cache can be built from the pickle files
+    (tmp_path / "events.db").unlink()
+    index = PanEventIndex(tmp_path)
+    assert index.update_from_cache() == 1
+    assert index.query()["label"].tolist() == ["PS1/1"]
+
+
+def test_dropped_pickle_is_removed(mocker, tmp_path):
+    mocker.patch.object(PanDataSet, "setMetadata")
+    mocker.patch.object(PanDataSet, "setData")
+    ds = PanDataSet(999999, cachedir=tmp_path)
+    ds.events = [PanEvent("PS1/1", latitude=70.0, longitude=-10.0)]
+    ds.data = pd.DataFrame({"Event": ["PS1/1"], "Temp": [1.0]})
+    ds.to_pickle()
+    assert PanEventIndex(tmp_path).datasets() == [999999]
+
+    ds.drop_pickle()
+    ds.terms_conn.close()
+
+    assert not ds.get_pickle_path().exists()
+    assert PanEventIndex(tmp_path).datasets() == []
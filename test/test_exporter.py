@@ -0,0 +1,464 @@
+#!/usr/bin/env python
+"""
+Test the exporters and their helpers
+"""
+import io
+import json
+import pickle
+import zipfile
+
+import lxml.etree as ET
+import netCDF4
+import numpy as np
+import pandas as pd
+import pytest
+
+from pangaeapy.exporter.pan_batch_exporter import PanBatchExporter
+from pangaeapy.exporter.pan_dwca_exporter import PanDarwinCoreAchiveExporter
+from pangaeapy.exporter.pan_frictionless_exporter import PanFrictionlessExporter
+from pangaeapy.exporter.pan_layout import PanInstanceLayout
+from pangaeapy.exporter.pan_netcdf_exporter import PanNetCDFExporter
+from pangaeapy.exporter.pan_panimport_exporter import PanPanImportExporter
+from pangaeapy.exporter.pan_parquet_exporter import PanParquetExporter
+from pangaeapy.exporter.pan_zarr_exporter import PanZarrExporter
+from pangaeapy.exporter.pan_taxon_classifier import PanTaxonClassifier
+from pangaeapy.mappings.pan_mapping_table import load_mapping_table
+from pangaeapy.pandataset import PanAuthor, PanDataSet, PanEvent, PanParam
+
+
+@pytest.fixture
+def profile_dataset(mocker):
+    """A small profile series with events of different length"""
+    dataset = mocker.Mock()
+    dataset.id = 999999
+    dataset.title = "Synthetic profiles"
+    dataset.doi = "https://doi.org/10.1594/PANGAEA.999999"
+    dataset.date = "2020-01-01T00:00:00"
+    dataset.topotype = "profile series"
+    dataset.authors = [PanAuthor("Doe", "Jane")]
+    dataset.citation = "Doe, J (2020): Synthetic profiles"
+    dataset.licence = None
+    dataset.events = []
+    dataset.qcdata = pd.DataFrame()
+    dataset.logging = []
+    rows = []
+    for i, length in enumerate([3, 1, 5]):
+        for d in range(length):
+            rows.append({"Event": f"PS1/{i}", "Latitude": 10.0 + i, "Longitude": -170.0 + i,
+                         "Date/Time": pd.Timestamp("2020-01-01") + pd.Timedelta(days=i),
+                         "Depth water": 10.0 * d, "Temp": 5.0 + i + d / 10})
+    dataset.data = pd.DataFrame(rows)
+    dataset.data.loc[2, "Temp"] = np.nan
+    dataset.params = {
+        "Event": PanParam(0, "Event", "Event", "text", "geocode"),
+        "Latitude": PanParam(1600, "Latitude", "Latitude", "numeric", "geocode"),
+        "Longitude": PanParam(1601, "Longitude", "Longitude", "numeric", "geocode"),
+        "Date/Time": PanParam(1599, "Date/Time", "Date/Time", "datetime", "geocode"),
+        "Depth water": PanParam(1619, "Depth water", "Depth water", "numeric", "geocode", "m"),
+        "Temp": PanParam(717, "Temperature, water", "Temp", "numeric", "data", "deg C"),
+    }
+    return dataset
+
+
+@pytest.fixture
+def loaded_dataset(mocker, tmp_path, profile_dataset):
+    """A PanDataSet holding the profiles, created without network access"""
+    mocker.patch.object(PanDataSet, "setMetadata")
+    mocker.patch.object(PanDataSet, "setData")
+    dataset = PanDataSet(999999, cachedir=tmp_path / "cache")
+    dataset.metaxml = ('<md:MetaData xmlns:md="http://www.pangaea.de/MetaData"><md:citation>'
+                       '<md:title>Synthetic profiles</md:title><md:dateTime>2020-01-01T00:00:00</md:dateTime>'
+                       '<md:URI>https://doi.org/10.1594/PANGAEA.999999</md:URI></md:citation>'
+                       '<md:extent><md:topoType>profile series</md:topoType></md:extent></md:MetaData>')
+    dataset._xml_root = ET.fromstring(dataset.metaxml.encode())
+    dataset.authors = profile_dataset.authors
+    dataset.events = [PanEvent(f"PS1/{i}", latitude=10.0 + i, longitude=-170.0 + i, elevation=-100.0) for i in range(3)]
+    dataset.data = profile_dataset.data
+    dataset.params = profile_dataset.params
+    dataset.parameters = dataset.params
+    dataset.logging = []
+    yield dataset
+    dataset.terms_conn.close()
+
+
+@pytest.fixture
+def taxon_dataset(mocker):
+    """Abundances of two taxa and one non-taxon parameter"""
+    dataset = mocker.Mock()
+    dataset.id = 999999
+    dataset.doi = "https://doi.org/10.1594/PANGAEA.999999"
+    dataset.title = "Zooplankton abundance"
+    dataset.lastupdate = "2020-01-01T00:00:00"
+    dataset.logging = []
+    dataset.metaxml = None
+    dataset.defaultparams = ["Latitude", "Longitude", "Event", "Elevation", "Date/Time"]
+    dataset.data = pd.DataFrame({
+        "Event": ["E0", "E1", "E0", "E1"],
+        "Latitude": [50.0, 50.5, 51.0, 51.5],
+        "Longitude": [8.0, 8.5, 9.0, 9.5],
+        "Date/Time": pd.date_range("2020-01-01", periods=4, freq="D"),
+        "Depth water": [0.0, 5.0, 10.0, 15.0],
+        "Calanus finmarchicus, adult": [1.0, 0.0, np.nan, 3.0],
+        "Oithona": [-1.0, 4.0, 5.0, np.nan],
+        "Temp": [1.0, 2.0, 3.0, 4.0],
+    })
+    classification = ["Biological Classification", "Animalia", "Arthropoda"]
+    dataset.params = {
+        "Event": PanParam(0, "Event", "Event", "string", "data"),
+        "Calanus finmarchicus, adult": PanParam(
+            5001, "Calanus finmarchicus, adult", "C. fin", "numeric", "data", "#/m**3",
+            terms=[{"name": "Calanus finmarchicus", "classification": classification}],
+            PI={"name": "Doe, Jane"}, dataseries=11, colno=6),
+        "Oithona": PanParam(5002, "Oithona", "Oith", "numeric", "data", "%",
+                            terms=[{"name": "Oithona", "classification": classification}], dataseries=12, colno=7),
+        "Temp": PanParam(717, "Temperature, water", "Temp", "numeric", "data", "deg C",
+                         terms=[{"name": "Temperature", "classification": []}]),
+    }
+    return dataset
+
+
+def test_instance_layout_matches_padded_frames():
+    """The layout places every row like padding each event frame to the maximum number of rows"""
+    rng = np.random.default_rng(0)
+    data = pd.DataFrame({"Event": rng.choice(["b", "a", "c", None], size=50), "x": rng.normal(size=50)})
+    data.loc[3, "x"] = np.nan
+    maxr = data.groupby("Event").size().max()
+    padded = pd.concat([d.reset_index(drop=True).reindex(range(maxr)) for _, d in data.groupby("Event")],
+                       ignore_index=True)
+
+    layout = PanInstanceLayout(data)
+
+    assert layout.shape == (3, maxr)
+    assert list(layout.instances) == ["a", "b", "c"]
+    expected = padded["x"].to_numpy().reshape(layout.shape)
+    assert np.array_equal(layout.pad(data["x"].to_numpy()), expected, equal_nan=True)
+    masked = layout.pad_masked(data["x"].to_numpy())
+    assert np.array_equal(masked.mask, np.isnan(expected))
+    # the contiguous order groups the rows by event without padding
+    expected = data.dropna(subset=["Event"]).sort_values("Event", kind="stable")["x"].to_numpy()
+    assert np.array_equal(layout.contiguous(data["x"].to_numpy()), expected, equal_nan=True)
+
+
+def test_parameter_synonyms_from_shared_mapping(mocker, tmp_path, profile_dataset):
+    """The mapping file is read once and shared by all exporters"""
+    spy = mocker.spy(json, "load")
+    for _ in range(2):
+        PanNetCDFExporter(profile_dataset, filelocation=str(tmp_path)).setParameterSynonyms()
+
+    assert spy.call_count <= 1
+    assert load_mapping_table()[717].sdn_id == "SDN:P01::TEMPPR01"
+    temp = profile_dataset.params["Temp"]
+    assert temp.synonym["CF"] == {"name": "sea_water_temperature", "id": None, "uri": None, "unit": "Celsius",
+                                  "unit_id": None}
+    assert temp.synonym["SD"]["id"] == "SDN:P01::TEMPPR01"
+    assert temp.synonym["EMODNET"]["name"] == "TEMP"
+
+
+def test_ragged_netcdf(tmp_path, profile_dataset):
+    exporter = PanNetCDFExporter(profile_dataset, filelocation=str(tmp_path))
+
+    result = exporter.create(style="ragged")
+
+    assert not [entry for entry in profile_dataset.logging if "ERROR" in entry]
+    nc = netCDF4.Dataset("ragged.nc", memory=bytes(result))
+    assert nc.featureType == "profile"
+    assert nc.dimensions["obs"].size == 9
+    assert list(nc["rowSize"][:]) == [3, 1, 5]
+    assert nc["rowSize"].sample_dimension == "obs"
+    assert list(nc["Latitude"][:]) == [10.0, 11.0, 12.0]
+    temp = nc["Temp"][:]
+    assert temp.mask.tolist() == [False, False, True] + [False] * 6
+    assert np.allclose(temp.compressed(), profile_dataset.data["Temp"].dropna(), atol=1e-6)
+
+
+def test_ragged_netcdf_non_ascii_labels(tmp_path, profile_dataset):
+    profile_dataset.data["Event"] = profile_dataset.data["Event"].str.replace("PS1", "Pâmiut-Ø")
+    exporter = PanNetCDFExporter(profile_dataset, filelocation=str(tmp_path))
+
+    result = exporter.create(style="ragged")
+
+    assert not [entry for entry in profile_dataset.logging if "ERROR" in entry]
+    nc = netCDF4.Dataset("ragged.nc", memory=bytes(result))
+    assert nc["Event"].shape == (3, len("Pâmiut-Ø/0".encode("utf-8")))
+    labels = [b"".join(row).decode("utf-8") for row in nc["Event"][:].tolist()]
+    assert labels == ["Pâmiut-Ø/0", "Pâmiut-Ø/1", "Pâmiut-Ø/2"]
+
+
+def test_ragged_netcdf_on_disk(tmp_path, profile_dataset):
+    exporter = PanNetCDFExporter(profile_dataset, filelocation=str(tmp_path))
+
+    result = exporter.create(style="ragged", ondisk=True)
+
+    assert result == str(tmp_path / "netcdf_ragged_999999.nc")
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["netcdf_ragged_999999.nc"]
+    assert exporter.save()
+    with netCDF4.Dataset(result) as nc:
+        assert nc.file_format == "NETCDF4"
+        assert nc["Temp"].filters()["zlib"] and nc["Temp"].filters()["shuffle"]
+        assert nc["Temp"].chunking() == [9]
+        assert list(nc["rowSize"][:]) == [3, 1, 5]
+
+
+def test_dwca_occurrences(taxon_dataset):
+    """Only positive quantities become occurrences, ordered by taxon column and row"""
+    exporter = PanDarwinCoreAchiveExporter(taxon_dataset, filelocation="/tmp")
+    taxoncolumns = exporter.get_taxon_columns()
+
+    table = pd.read_csv(io.StringIO(exporter.get_dwca_data(taxoncolumns)), sep="|", dtype=str)
+
+    assert list(taxoncolumns) == ["Calanus finmarchicus, adult", "Oithona"]
+    assert table["id"].tolist() == ["1_6", "4_6", "2_7", "3_7"]
+    assert table["catalogNumber"].tolist() == ["11_1", "11_4", "12_2", "12_3"]
+    assert table["scientificName"].tolist() == ["Calanus finmarchicus"] * 2 + ["Oithona"] * 2
+    assert table["organismQuantity"].tolist() == ["1.0", "3.0", "4.0", "5.0"]
+    assert table["organismQuantityType"].tolist() == ["individuals per volume"] * 2 + ["percentage"] * 2
+    assert table["recordedBy"].fillna("").tolist() == ["Doe, Jane", "Doe, Jane", "", ""]
+    assert table["lifeStage"].fillna("").tolist() == ["adult", "adult", "", ""]
+    assert table["eventDate"].tolist()[:2] == ["2020-01-01T00:00:00", "2020-01-04T00:00:00"]
+    # the dataset is left untouched
+    assert taxon_dataset.defaultparams == ["Latitude", "Longitude", "Event", "Elevation", "Date/Time"]
+
+
+@pytest.mark.parametrize("unit,expected", [
+    ("#/m**3", (True, "individuals per volume")),
+    ("%/10 cm**2/a", (True, "percentage per area and time")),
+    ("#/g", (True, "individuals per mass")),
+    ("#/day", (True, "individuals per time")),
+    (None, (True, "relative abundance")),
+    ("mg/l", (False, "")),
+])
+def test_taxon_classifier_units(unit, expected):
+    assert PanTaxonClassifier().check_unit(unit) == expected
+
+
+def test_taxon_classifier_shared_by_exports(taxon_dataset):
+    """Units, names and classifications are resolved once for all exports of a process"""
+    exporters = [PanDarwinCoreAchiveExporter(taxon_dataset, filelocation="/tmp") for _ in range(2)]
+    classifier = exporters[0].classifier
+    classifier.classify.cache_clear()
+
+    columns = [exporter.get_taxon_columns() for exporter in exporters]
+
+    assert exporters[1].classifier is classifier
+    assert columns[0] == columns[1]
+    assert classifier.classify.cache_info().misses == 1
+    assert classifier.classify.cache_info().hits == 3
+    assert classifier.split_name("Calanus finmarchicus, adult") == ("Calanus finmarchicus", "calanus finmarchicus", "adult")
+    assert classifier.classify(("Biological Classification", "Bacteria")) == ("Bacteria", "")
+    assert classifier.classify(("Chemistry",)) is None
+
+
+def test_dwca_streamed_to_disk(tmp_path, taxon_dataset):
+    """The archive written in parts holds the same table as the one created in memory"""
+    taxon_dataset.metaxml = ('<md:MetaData xmlns:md="http://www.pangaea.de/MetaData">'
+                             '<md:citation><md:title>Zooplankton abundance</md:title></md:citation></md:MetaData>')
+    taxon_dataset.citation = "Doe, J (2020): Zooplankton abundance"
+    in_memory = PanDarwinCoreAchiveExporter(taxon_dataset, filelocation=str(tmp_path)).create()
+    exporter = PanDarwinCoreAchiveExporter(taxon_dataset, filelocation=str(tmp_path))
+    exporter.chunk_rows = 1  # one taxon column per part
+
+    result = exporter.create(ondisk=True)
+
+    assert result == str(tmp_path / "dwca_pangaea_999999.zip")
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["dwca_pangaea_999999.zip"]
+    assert exporter.save()
+    with zipfile.ZipFile(result) as streamed, zipfile.ZipFile(in_memory) as expected:
+        assert sorted(streamed.namelist()) == ["999999_data.tab", "eml.xml", "meta.xml"]
+        for name in expected.namelist():
+            assert streamed.read(name) == expected.read(name)
+
+
+@pytest.mark.parametrize("ondisk", [False, True])
+def test_frictionless_package(tmp_path, profile_dataset, ondisk):
+    pytest.importorskip("pyarrow")
+    profile_dataset.isCollection = False
+    profile_dataset.loginstatus = "unrestricted"
+    profile_dataset.abstract = None
+    exporter = PanFrictionlessExporter(profile_dataset, filelocation=str(tmp_path))
+    exporter.chunk_rows = 4
+
+    result = exporter.create(ondisk=ondisk, parquet=True)
+
+    assert not [entry for entry in profile_dataset.logging if "ERROR" in entry]
+    assert exporter.save()
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["frictionless_pangaea_999999.zip"]
+    with zipfile.ZipFile(result) as package:
+        descriptor = json.loads(package.read("999999_metadata.json"))
+        table = pd.read_csv(package.open("999999_data.csv"))
+        parquet = pd.read_parquet(io.BytesIO(package.read("999999_data.parquet")))
+    fields = descriptor["resources"][0]["schema"]["fields"]
+    assert [field["name"] for field in fields] == list(profile_dataset.data.columns)
+    assert fields[-1] == {"name": "Temp", "title": "Temperature, water", "type": "number", "unit": "deg C"}
+    assert [resource["path"] for resource in descriptor["resources"]] == ["999999_data.csv", "999999_data.parquet"]
+    assert table["Date/Time"][0] == "2020-01-01T00:00:00Z"
+    assert np.allclose(table["Temp"], profile_dataset.data["Temp"], equal_nan=True)
+    pd.testing.assert_frame_equal(parquet.astype({"Event": str}), profile_dataset.data, check_dtype=False)
+
+
+def test_parquet_with_metadata(tmp_path, profile_dataset):
+    pq = pytest.importorskip("pyarrow.parquet")
+    profile_dataset.events = [PanEvent(f"PS1/{i}", latitude=10.0 + i, longitude=-170.0 + i) for i in range(3)]
+    profile_dataset.qcdata = pd.DataFrame({"Temp": [1.0, 2.0]}, index=[0, 4])
+    exporter = PanParquetExporter(profile_dataset, filelocation=str(tmp_path))
+
+    result = exporter.create(qc=True)
+
+    assert result == str(tmp_path / "parquet_pangaea_999999.parquet")
+    assert exporter.save()
+    schema = pq.read_schema(result)
+    assert str(schema.field("Event").type) == "dictionary<values=string, indices=int32, ordered=0>"
+    assert str(schema.field("Date/Time").type).startswith("timestamp")
+    temp = schema.field("Temp").metadata
+    assert temp[b"pangaea:id"] == b"717"
+    assert temp[b"pangaea:unit"] == b"deg C"
+    assert temp[b"sdn:p01"] == b"SDN:P01::TEMPPR01"
+    dataset = json.loads(schema.metadata[b"pangaea"])
+    assert dataset["doi"] == profile_dataset.doi
+    assert [event["label"] for event in dataset["events"]] == ["PS1/0", "PS1/1", "PS1/2"]
+    table = pd.read_parquet(result)
+    assert table["Temp_QC"].tolist() == [1, 0, 0, 0, 2, 0, 0, 0, 0]
+    pd.testing.assert_frame_equal(table[profile_dataset.data.columns].astype({"Event": str}), profile_dataset.data,
+                                  check_dtype=False)
+
+
+def test_zarr_store(tmp_path, profile_dataset):
+    zarr = pytest.importorskip("zarr", minversion="3")
+    exporter = PanZarrExporter(profile_dataset, filelocation=str(tmp_path))
+    exporter.chunk_elements = 10  # two events per chunk
+
+    result = exporter.create()
+
+    assert result == str(tmp_path / "zarr_pangaea_999999.zarr")
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["zarr_pangaea_999999.zarr"]
+    store = zarr.open_group(result, mode="r")
+    temp = store["Temp"]
+    assert temp.shape == (3, 5)
+    assert temp.chunks == (2, 5)
+    assert temp.metadata.dimension_names == ("INSTANCE", "MAXZ")
+    assert temp.attrs["standard_name"] == "sea_water_temperature"
+    expected = PanInstanceLayout(profile_dataset.data).pad(profile_dataset.data["Temp"].to_numpy(dtype="f4"))
+    assert np.array_equal(temp[:], expected, equal_nan=True)
+    assert store["Event"][:].tolist() == ["PS1/0", "PS1/1", "PS1/2"]
+    assert store["Date_Time"][:].tolist() == [18262.0, 18263.0, 18264.0]
+    # the dataset is not renamed
+    assert "Date/Time" in profile_dataset.data.columns
+
+
+def test_xarray_profiles(loaded_dataset):
+    pytest.importorskip("xarray")
+
+    ds = loaded_dataset.to_xarray()
+
+    assert ds.attrs["featureType"] == "trajectoryProfile"
+    assert ds["Temp"].dims == ("Event", "MAXZ")
+    assert ds["Temp"].attrs["standard_name"] == "sea_water_temperature"
+    assert ds["Temp"].attrs["pangaea_id"] == 717
+    expected = PanInstanceLayout(loaded_dataset.data).pad(loaded_dataset.data["Temp"].to_numpy())
+    assert np.array_equal(ds["Temp"].values, expected, equal_nan=True)
+    assert ds["Event"].values.tolist() == ["PS1/0", "PS1/1", "PS1/2"]
+    # the position and time of each profile
+    assert ds["Latitude"].dims == ("Event",)
+    assert ds["Date_Time"].dims == ("Event",)
+    assert ds["Depth_water"].dims == ("Event", "MAXZ")
+
+
+def test_xarray_single_profile_shares_data(loaded_dataset):
+    pytest.importorskip("xarray")
+    data = loaded_dataset.data
+    loaded_dataset.data = data[data["Event"] == "PS1/2"].reset_index(drop=True)
+
+    ds = loaded_dataset.to_xarray()
+
+    assert ds.attrs["featureType"] == "profile"
+    assert ds["Temp"].dims == ("Depth_water",)
+    assert ds.indexes["Depth_water"].tolist() == [0.0, 10.0, 20.0, 30.0, 40.0]
+    assert np.shares_memory(ds["Temp"].values, loaded_dataset.data["Temp"].to_numpy())
+
+
+def test_dataset_pickles(loaded_dataset):
+    restored = pickle.loads(pickle.dumps(loaded_dataset))
+
+    assert restored.title == "Synthetic profiles"
+    assert restored.topotype == "profile series"
+    pd.testing.assert_frame_equal(restored.data, loaded_dataset.data)
+    assert restored.terms_conn.execute("select count(*) from terms").fetchone() == (0,)
+    restored.terms_conn.close()
+
+
+def test_exports_leave_dataset_unchanged(tmp_path, loaded_dataset):
+    """One loaded dataset can be exported repeatedly and into several formats"""
+    columns = list(loaded_dataset.data.columns)
+    params = dict(loaded_dataset.params)
+    data = loaded_dataset.data.copy()
+    loaded_dataset.defaultparams = ["Latitude", "Longitude", "Event", "Date/Time"]
+
+    for style in ["sdn", "sdn", "ragged"]:
+        assert loaded_dataset.to_netcdf(filelocation=str(tmp_path), type=style, ondisk=True)
+    loaded_dataset.to_dwca(save=False, filelocation=str(tmp_path))
+
+    assert list(loaded_dataset.data.columns) == columns
+    pd.testing.assert_frame_equal(loaded_dataset.data, data)
+    assert loaded_dataset.params == params
+    assert loaded_dataset.params["Date/Time"].name == "Date/Time"
+    assert loaded_dataset.params["Temp"].synonym["CF"] is None
+    assert loaded_dataset.defaultparams == ["Latitude", "Longitude", "Event", "Date/Time"]
+    # the exports log to the dataset, once per message
+    successes = [entry for entry in loaded_dataset.logging if "SUCCESS" in entry]
+    assert len(successes) == 6
+
+
+@pytest.mark.parametrize("version, shared", [("2.2.2", False), ("3.0.0", True)])
+def test_export_view_copies_values(mocker, loaded_dataset, version, shared):
+    """Without copy-on-write (pandas < 3.0) the view gets its own column arrays"""
+    mocker.patch.object(pd, "__version__", version)
+    view = loaded_dataset.export_view()
+
+    assert np.shares_memory(view.data["Temp"].to_numpy(), loaded_dataset.data["Temp"].to_numpy()) == shared
+    view.data.loc[0, "Temp"] = 99.0
+    assert loaded_dataset.data.loc[0, "Temp"] != 99.0
+    assert view.logging == [] and view.logging is not loaded_dataset.logging
+
+
+@pytest.mark.parametrize("max_workers", [0, 2])
+def test_batch_export(tmp_path, loaded_dataset, max_workers):
+    pytest.importorskip("pyarrow")
+    exporter = PanBatchExporter(["netcdf_ragged", "parquet"], filelocation=str(tmp_path / "out"),
+                                max_workers=max_workers, dataset_kwargs={"cachedir": tmp_path / "cache"})
+
+    results = exporter.run([loaded_dataset, "no-dataset"])
+
+    assert [(r.dataset, r.format, r.ok) for r in results] == [
+        (999999, "netcdf_ragged", True), (999999, "parquet", True),
+        ("no-dataset", "netcdf_ragged", False), ("no-dataset", "parquet", False)]
+    assert sorted(p.name for p in (tmp_path / "out").iterdir()) == ["netcdf_ragged_999999.nc",
+                                                                   "parquet_pangaea_999999.parquet"]
+    assert all(r.seconds > 0 for r in results[:2])
+    assert results[2].errors
+    assert "Date/Time" in loaded_dataset.data.columns
+
+
+def test_batch_export_rejects_unknown_format(tmp_path):
+    with pytest.raises(ValueError):
+        PanBatchExporter(["csv"], filelocation=str(tmp_path))
+
+
+def test_panimport_streams_all_rows(tmp_path, profile_dataset):
+    profile_dataset.params["Latitude"].source = "event"
+    profile_dataset.params["Longitude"].source = "event"
+    exporter = PanPanImportExporter(profile_dataset, filelocation=str(tmp_path))
+    exporter.chunk_rows = 2
+
+    path = exporter.create(ondisk=True)
+
+    assert path == str(tmp_path / "panimport_pangaea_999999.txt")
+    content = open(path, encoding="utf-8").read()
+    header, body = content.split("*/\n")
+    header = json.loads(header.removeprefix("/*\n"))
+    assert [param["ID"] for param in header["Parameter"]] == [0, 1599, 1619, 717]
+    assert exporter.ignorecolumns == ["Latitude", "Longitude"]
+    table = pd.read_csv(io.StringIO(body), sep="\t")
+    assert list(table.columns) == ["0", "1599", "1619", "717"]
+    assert len(table) == len(profile_dataset.data)
+    assert table["1599"][0] == "2020-01-01T00:00:00"
+    assert np.allclose(table["717"], profile_dataset.data["Temp"], equal_nan=True)
+    assert exporter.create() == content